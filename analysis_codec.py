@@ -0,0 +1,300 @@
+# Codificación Binaria Compacta del Análisis
+#
+# Descripción:
+# Formato versionado para guardar 'analysis/latest' como un solo campo de bytes en
+# lugar de mapas anidados y listas de objetos pequeños. Cada estadística se guarda
+# como un arreglo de tamaño fijo (conteos de 39 números, matriz de transición
+# 40x40, pares principales, etc.), todos empaquetados y comprimidos con zlib.
+# Este módulo es el único codificador/decodificador que usan los scripts de
+# Python; 'public/index.html' implementa el mismo formato para el navegador.
+#
+# Estructura (versión 1):
+#   b"MRA" + versión (1 byte) + zlib(payload)
+#   payload = longitud del manifiesto (uint32 LE) + manifiesto JSON + arreglos
+#   El manifiesto lista [nombre, dtype, forma, offset] de cada arreglo (offsets
+#   alineados a 8 bytes dentro del payload) y los escalares en "meta".
+
+import hashlib
+import json
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"MRA"
+FORMAT_VERSION = 1
+_ALIGNMENT = 8
+
+# Listas de objetos {etiqueta, valor} de cada sección. Se guardan como dos arreglos
+# en el mismo orden de la lista (el orden importa: las reglas usan el top-N).
+# Las etiquetas de texto se codifican como enteros para poder empaquetarlas.
+_TABLE_FIELDS = {
+    "frequencies": ("number", "frequency"),
+    "adicionalFrequencies": ("number", "frequency"),
+    "lags": ("number", "lag"),
+    "oddEvenDistribution": ("dist", "count"),
+    "tensDistribution": ("dist", "count"),
+    "consecutiveDistribution": ("pairs", "count"),
+    "endingDistribution": ("ending", "count"),
+}
+
+# Tablas {fila: [números]} con las transiciones de Markov más frecuentes; la fila
+# es un número ("7") o un par ("7-21"). Se guardan como dos matrices uint8: las
+# filas (k x orden) y los números (k x N, con 0 de relleno).
+_TOP_TRANSITION_FIELDS = {"markovTop": 1, "markovSecondOrder": 2}
+
+
+def _encode_label(field, value):
+    if field == "oddEvenDistribution":
+        return int(value.split("P")[0])
+    if field == "tensDistribution":
+        code = 0
+        for part in value.split("-"):
+            code = code * 7 + int(part)
+        return code
+    return value
+
+
+def _decode_label(field, value):
+    if field == "oddEvenDistribution":
+        return f"{value}P-{6 - value}I"
+    if field == "tensDistribution":
+        digits = []
+        for _ in range(4):
+            value, digit = divmod(value, 7)
+            digits.append(str(digit))
+        return "-".join(reversed(digits))
+    return value
+
+
+def _as_array(rows):
+    """Arreglo int32 si todos los valores son enteros, float64 en otro caso."""
+    array = np.array(rows, dtype=np.float64)
+    if array.size and np.all(array == np.round(array)):
+        return array.astype(np.int32)
+    return array
+
+
+def _pack_section(section, prefix, arrays, meta):
+    for field, (label_key, value_key) in _TABLE_FIELDS.items():
+        if field in section:
+            items = section[field]
+            arrays[f"{prefix}{field}/labels"] = np.array(
+                [_encode_label(field, item[label_key]) for item in items],
+                dtype=np.int32,
+            )
+            arrays[f"{prefix}{field}/values"] = _as_array(
+                [item[value_key] for item in items]
+            )
+
+    if "topPairs" in section:
+        arrays[prefix + "topPairs"] = np.array(
+            [(*item["pair"], item["count"]) for item in section["topPairs"]],
+            dtype=np.int32,
+        ).reshape(-1, 3)
+    if "topPairsSet_list" in section:
+        arrays[prefix + "topPairsSet_list"] = np.array(
+            [
+                sorted(json.loads(p) if isinstance(p, str) else p)
+                for p in section["topPairsSet_list"]
+            ],
+            dtype=np.uint8,
+        ).reshape(-1, 2)
+    if "topEndings_list" in section:
+        arrays[prefix + "topEndings_list"] = np.array(
+            section["topEndings_list"], dtype=np.uint8
+        )
+    if "markovTransitions" in section:
+        rows = [
+            (int(prev), int(curr), count)
+            for prev, counters in section["markovTransitions"].items()
+            for curr, count in counters.items()
+        ]
+        values = _as_array([r[2] for r in rows])
+        matrix = np.zeros((40, 40), dtype=values.dtype)
+        for (prev, curr, _), count in zip(rows, values):
+            matrix[prev, curr] = count
+        arrays[prefix + "markovTransitions"] = matrix
+    for field, order in _TOP_TRANSITION_FIELDS.items():
+        if field in section:
+            table = section[field]
+            width = max((len(row) for row in table.values()), default=0)
+            arrays[f"{prefix}{field}/rows"] = np.array(
+                [[int(x) for x in label.split("-")] for label in table],
+                dtype=np.uint8,
+            ).reshape(len(table), order)
+            arrays[f"{prefix}{field}/next"] = np.array(
+                [row + [0] * (width - len(row)) for row in table.values()],
+                dtype=np.uint8,
+            ).reshape(len(table), width)
+    if "sumAnalysis" in section:
+        meta[prefix + "sumAnalysis"] = {
+            k: float(v) for k, v in section["sumAnalysis"].items()
+        }
+
+
+def encode_analysis(analysis):
+    """Codifica el análisis (incluyendo 'windows') en bytes compactos."""
+    arrays, meta = {}, {}
+    _pack_section(analysis, "", arrays, meta)
+    windows = analysis.get("windows", {})
+    for name, section in windows.items():
+        _pack_section(section, f"windows/{name}/", arrays, meta)
+    meta["windows"] = list(windows)
+
+    entries, blobs, offset = [], [], 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        entries.append([name, array.dtype.str, list(array.shape), offset])
+        data = array.tobytes()
+        padding = -len(data) % _ALIGNMENT
+        blobs.append(data + b"\0" * padding)
+        offset += len(data) + padding
+
+    manifest = json.dumps({"arrays": entries, "meta": meta}, separators=(",", ":"))
+    manifest = manifest.encode("utf-8")
+    # Relleno con espacios para que el bloque de arreglos empiece alineado.
+    manifest += b" " * (-(4 + len(manifest)) % _ALIGNMENT)
+    payload = struct.pack("<I", len(manifest)) + manifest + b"".join(blobs)
+    return MAGIC + bytes([FORMAT_VERSION]) + zlib.compress(payload, 9)
+
+
+def decode_arrays(data):
+    """
+    Decodifica los bytes en (arreglos, meta) sin reconstruir objetos de Python:
+    cada arreglo es una vista de solo lectura sobre el payload descomprimido.
+    """
+    data = bytes(data)
+    if data[:3] != MAGIC:
+        raise ValueError("El análisis empaquetado no tiene el encabezado esperado.")
+    version = data[3]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versión de formato no soportada: {version}.")
+    payload = zlib.decompress(data[4:])
+    (manifest_length,) = struct.unpack_from("<I", payload, 0)
+    manifest = json.loads(payload[4 : 4 + manifest_length])
+    base = 4 + manifest_length
+    arrays = {}
+    for name, dtype, shape, offset in manifest["arrays"]:
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(
+            payload, dtype=dtype, count=count, offset=base + offset
+        ).reshape(shape)
+    return arrays, manifest["meta"]
+
+
+def _unpack_section(arrays, meta, prefix):
+    section = {}
+    for field, (label_key, value_key) in _TABLE_FIELDS.items():
+        if f"{prefix}{field}/labels" in arrays:
+            labels = arrays[f"{prefix}{field}/labels"].tolist()
+            values = arrays[f"{prefix}{field}/values"].tolist()
+            section[field] = [
+                {label_key: _decode_label(field, label), value_key: value}
+                for label, value in zip(labels, values)
+            ]
+    if prefix + "topPairs" in arrays:
+        section["topPairs"] = [
+            {"pair": [a, b], "count": count}
+            for a, b, count in arrays[prefix + "topPairs"].tolist()
+        ]
+    if prefix + "topPairsSet_list" in arrays:
+        section["topPairsSet_list"] = [
+            json.dumps(pair) for pair in arrays[prefix + "topPairsSet_list"].tolist()
+        ]
+    if prefix + "topEndings_list" in arrays:
+        section["topEndings_list"] = arrays[prefix + "topEndings_list"].tolist()
+    if prefix + "markovTransitions" in arrays:
+        rows = arrays[prefix + "markovTransitions"].tolist()
+        section["markovTransitions"] = {
+            str(prev): {str(curr): v for curr, v in enumerate(row) if v}
+            for prev, row in enumerate(rows)
+            if any(row)
+        }
+    for field in _TOP_TRANSITION_FIELDS:
+        if f"{prefix}{field}/rows" in arrays:
+            rows = arrays[f"{prefix}{field}/rows"].tolist()
+            nexts = arrays[f"{prefix}{field}/next"].tolist()
+            section[field] = {
+                "-".join(str(x) for x in row): [c for c in top if c]
+                for row, top in zip(rows, nexts)
+            }
+    if prefix + "sumAnalysis" in meta:
+        section["sumAnalysis"] = dict(meta[prefix + "sumAnalysis"])
+    return section
+
+
+class PackedSection:
+    """
+    Una sección del análisis empaquetado (el histórico completo o una ventana) leída
+    directamente de los arreglos de 'decode_arrays'. 'get' entrega cada campo en la
+    forma compacta que reciben las reglas de 'rule_registry.py' (etiquetas en orden,
+    pares [a, b], matrices como listas), sin reconstruir las listas de objetos.
+    """
+
+    def __init__(self, arrays, meta, prefix=""):
+        self.arrays = arrays
+        self.meta = meta
+        self.prefix = prefix
+        names = [name[len(prefix) :] for name in arrays if name.startswith(prefix)]
+        names += [name[len(prefix) :] for name in meta if name.startswith(prefix)]
+        self.fields = {
+            name.split("/")[0] for name in names if not name.startswith("windows/")
+        }
+
+    def __contains__(self, field):
+        return field in self.fields
+
+    def get(self, field, default=None):
+        if field not in self.fields:
+            return default
+        name = self.prefix + field
+        if field in _TABLE_FIELDS:
+            return self.arrays[f"{name}/labels"].tolist()
+        if field in _TOP_TRANSITION_FIELDS:
+            top = [[] for _ in range(40)] if _TOP_TRANSITION_FIELDS[field] == 1 else {}
+            rows = self.arrays[f"{name}/rows"].tolist()
+            for row, nexts in zip(rows, self.arrays[f"{name}/next"].tolist()):
+                key = row[0] if len(row) == 1 else "-".join(str(x) for x in row)
+                top[key] = [c for c in nexts if c]
+            return top
+        if name in self.meta:
+            return dict(self.meta[name])
+        return self.arrays[name].tolist()
+
+
+class PackedAnalysis(PackedSection):
+    """
+    Análisis empaquetado listo para 'rule_registry.prepare_tables': el histórico
+    completo más sus ventanas en 'get("windows")'. 'digest' identifica los bytes
+    de origen (huella de los checkpoints).
+    """
+
+    def __init__(self, data):
+        arrays, meta = decode_arrays(data)
+        super().__init__(arrays, meta)
+        self.digest = hashlib.sha256(bytes(data)).hexdigest()
+        self.windows = {
+            name: PackedSection(arrays, meta, f"windows/{name}/")
+            for name in meta.get("windows", [])
+        }
+
+    def get(self, field, default=None):
+        if field == "windows":
+            return self.windows
+        return super().get(field, default)
+
+
+def decode_analysis(data):
+    """
+    Decodifica los bytes al mismo diccionario que antes se guardaba como mapas en
+    'analysis/latest' (con 'windows'). Se conserva por compatibilidad: la
+    calificación usa 'PackedAnalysis', que no reconstruye el diccionario.
+    """
+    arrays, meta = decode_arrays(data)
+    analysis = _unpack_section(arrays, meta, "")
+    analysis["windows"] = {
+        name: _unpack_section(arrays, meta, f"windows/{name}/")
+        for name in meta.get("windows", [])
+    }
+    return analysis
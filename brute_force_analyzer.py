@@ -8,14 +8,28 @@
 #
 # Autor: Gemini (Google AI) - Actualizado y Optimizado
 
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
+import sys
 import json
-from itertools import combinations
+import hashlib
+import math
+from concurrent.futures import ProcessPoolExecutor
 
 import time
-from collections import Counter
+
+import numpy as np
+
+import analysis_codec
+import rule_registry
+import scoring_backends
+import scoring_engine as se
+
+# Opcional: 'melate.py bruteforce --offline' lee el análisis de un archivo local.
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+except ImportError:
+    firebase_admin = None
 
 # --- CONFIGURACIÓN ---
 FIREBASE_DATABASE_URL = os.environ.get(
@@ -24,14 +38,50 @@ FIREBASE_DATABASE_URL = os.environ.get(
 APP_ID = os.environ.get("APP_ID", "1:852396148354:web:fc430c9d8ffdb19ce1d69b")
 CREDENTIALS_FILE = "analizadormelateretro-firebase-adminsdk-fbsvc-4129f33301.json"
 
+# --- PARÁMETROS DE LA CORRIDA ---
+TOP_K = 30
+# Combinaciones evaluadas por bloque del recorrido completo.
+CHUNK_SIZE = 250000
+# Cada cuánto se guarda el checkpoint (posición + top-K acumulado) en Firestore.
+CHECKPOINT_SECONDS = 60
+# Cada cuánto se publica el top-K provisional mientras la corrida avanza.
+PROVISIONAL_SECONDS = 600
+# Pools del generador de la app web: para cada nivel de confianza mínimo del
+# selector se publica una muestra uniforme de combinaciones que lo cumplen, más las
+# POOL_SIZE mejores como respaldo cuando un nivel no tiene suficientes.
+POOL_THRESHOLDS = [90, 80, 60, 0]
+POOL_SIZE = 2000
+# Agregados de la confianza por número y por par ('analysis/numberAggregates'):
+# media y máximo sobre todo el espacio y apariciones en el mejor 1% del ranking.
+AGGREGATE_TOP_FRACTION = 0.01
+AGGREGATE_TOP_SIZE = math.ceil(se.TOTAL_COMBINATIONS * AGGREGATE_TOP_FRACTION)
+# Tamaño del top acumulado en el recorrido: cubre el ranking publicado, el respaldo
+# del generador y el top de los agregados.
+RANKING_SIZE = max(TOP_K, POOL_SIZE, AGGREGATE_TOP_SIZE)
+# Modo multi-perfil: bloques más chicos porque cada uno genera (bloque x P) puntajes.
+PROFILE_CHUNK_SIZE = 50000
+# Modo 6+1: boletos por tarea paralela; cada bloque genera (bloque x 40) puntajes,
+# así que la memoria por proceso queda acotada sin importar el tamaño del espacio.
+ADICIONAL_CHUNK_SIZE = 50000
+ADICIONAL_WORKERS = int(os.environ.get("ADICIONAL_WORKERS", os.cpu_count() or 1))
+
 # Globales para almacenar los datos de análisis y pesos
 analysis = {}
 strategy_weights = {}
 last_draw = None  # Solo necesitamos el último sorteo
+# Ventana de estadísticas que usa cada regla (p. ej. {"prediccion_markov": "last100"}).
+# Las reglas sin entrada usan el histórico completo.
+rule_windows = {}
+# Tablas de la ruta escalar: (análisis, último sorteo, ventanas, tablas).
+_rating_cache = None
+# Tablas y pesos del modo 6+1 en cada proceso de trabajo.
+_adicional_context = None
 
 
 def get_db_client():
     """Inicializa la app de Firebase y devuelve el cliente de Firestore."""
+    if firebase_admin is None:
+        raise ImportError("firebase_admin no está instalado; usa el modo --offline.")
     if not firebase_admin._apps:
         if "FIREBASE_CREDENTIALS" in os.environ:
             creds_json = json.loads(os.environ["FIREBASE_CREDENTIALS"])
@@ -52,7 +102,7 @@ def fetch_data(db):
     """
     Obtiene el análisis pre-calculado, los pesos y el último sorteo.
     """
-    global strategy_weights, analysis, last_draw
+    global strategy_weights, analysis, last_draw, rule_windows
     print("Obteniendo datos optimizados desde Firestore...")
 
     # 1. Obtener el análisis pre-calculado
@@ -65,12 +115,8 @@ def fetch_data(db):
             "El documento de análisis pre-calculado no existe. Ejecuta 'precompute_analysis.py' primero."
         )
     analysis = analysis_doc.to_dict()
-
-    # Re-hidratar sets que fueron guardados como listas
-    if analysis.get("topEndings_list"):
-        analysis["top_endings"] = set(analysis["topEndings_list"])
-    if analysis.get("topPairsSet_list"):
-        analysis["top_pairs_set"] = {tuple(p) for p in analysis["topPairsSet_list"]}
+    if "packed" in analysis:
+        analysis = analysis_codec.PackedAnalysis(analysis["packed"])
 
     # 2. Obtener el último sorteo
     results_ref = db.collection(f"artifacts/{APP_ID}/public/data/results")
@@ -88,183 +134,222 @@ def fetch_data(db):
     )
     weights_doc = weights_ref.get()
     if weights_doc.exists:
-        strategy_weights = weights_doc.to_dict()
+        strategy_weights = rule_registry.complete_weights(weights_doc.to_dict())
     else:
-        strategy_weights = {
-            "suma_rango": 15,
-            "dist_par_impar": 15,
-            "mix_frecuencia": 10,
-            "mix_atraso": 10,
-            "decenas_distribucion": 10,
-            "pares_frecuentes": 10,
-            "prediccion_markov": 15,
-            "consecutivos": 10,
-            "terminaciones": 5,
-        }
+        strategy_weights = dict(rule_registry.DEFAULT_WEIGHTS)
+
+    # 4. Obtener la ventana de estadísticas de cada regla (opcional)
+    windows_doc = (
+        db.collection(f"artifacts/{APP_ID}/public/data/config")
+        .document("ruleWindows")
+        .get()
+    )
+    rule_windows = windows_doc.to_dict() if windows_doc.exists else {}
 
     print("✅ Datos optimizados cargados correctamente.")
 
 
+def rating_tables():
+    """
+    Tablas de las reglas para la ruta escalar. Se preparan una sola vez por
+    análisis, último sorteo y ventanas, y se reutilizan en cada llamada.
+    """
+    global _rating_cache
+    if (
+        _rating_cache is None
+        or _rating_cache[0] is not analysis
+        or _rating_cache[1] is not last_draw
+        or _rating_cache[2] != rule_windows
+    ):
+        tables = rule_registry.prepare_tables(analysis, last_draw, rule_windows)
+        _rating_cache = (analysis, last_draw, dict(rule_windows), tables)
+    return _rating_cache[3]
+
+
 def rate_combination(combo):
-    """Califica una combinación dada con la lógica de 9 reglas usando el análisis pre-calculado."""
-    score = 0.0
-    max_score = sum(strategy_weights.values())
-    if max_score == 0:
-        return 0
-    combo = sorted(combo)
-
-    # 1. Suma en Rango
-    mean, std = analysis["sumAnalysis"]["mean"], analysis["sumAnalysis"]["std"]
-    if abs(sum(combo) - mean) < (0.75 * std):
-        score += strategy_weights.get("suma_rango", 0)
-    elif abs(sum(combo) - mean) < (1.5 * std):
-        score += strategy_weights.get("suma_rango", 0) / 2
-
-    # 2. Distribución Par/Impar
-    evens = sum(1 for n in combo if n % 2 == 0)
-    dist_str = f"{evens}P-{6 - evens}I"
-    top_odd_even = [item["dist"] for item in analysis["oddEvenDistribution"][:3]]
-    if dist_str in top_odd_even:
-        dist_index = top_odd_even.index(dist_str)
-        if dist_index == 0:
-            score += strategy_weights.get("dist_par_impar", 0)
-        else:
-            score += strategy_weights.get("dist_par_impar", 0) * 0.5
-
-    # 3. Mix de Frecuencia
-    freqs = analysis["frequencies"]
-    hot_numbers = set(f["number"] for f in freqs[:13])
-    cold_numbers = set(f["number"] for f in freqs[-13:])
-    cold_count = sum(1 for n in combo if n in cold_numbers)
-    hot_count = sum(1 for n in combo if n in hot_numbers)
-    medium_count = 6 - cold_count - hot_count
-    frec_balance_score = (
-        1 - (abs(cold_count - 2) + abs(hot_count - 2) + abs(medium_count - 2)) / 8.0
-    )
-    score += frec_balance_score * strategy_weights.get("mix_frecuencia", 0)
-
-    # 4. Mix de Atraso (Granular)
-    lags = analysis["lags"]
-    high_lag = set(lag_item["number"] for lag_item in lags[:13])
-    low_lag = set(lag_item["number"] for lag_item in lags[-13:])
-    high_lag_count = sum(1 for n in combo if n in high_lag)
-    low_lag_count = sum(1 for n in combo if n in low_lag)
-    medium_lag_count = 6 - high_lag_count - low_lag_count
-    lag_balance_score = (
-        1
-        - (abs(high_lag_count - 2) + abs(medium_lag_count - 2) + abs(low_lag_count - 2))
-        / 8.0
-    )
-    score += lag_balance_score * strategy_weights.get("mix_atraso", 0)
-
-    # 5. Distribución de Decenas
-    def get_tens_dist_str(c):
-        tens = [0, 0, 0, 0]
-        for n in c:
-            if n <= 9:
-                tens[0] += 1
-            elif n <= 19:
-                tens[1] += 1
-            elif n <= 29:
-                tens[2] += 1
-            else:
-                tens[3] += 1
-        return "-".join(map(str, sorted(tens, reverse=True)))
-
-    tens_dist_str = get_tens_dist_str(combo)
-    top_tens = [item["dist"] for item in analysis["tensDistribution"][:3]]
-    if tens_dist_str in top_tens:
-        tens_index = top_tens.index(tens_dist_str)
-        if tens_index == 0:
-            score += strategy_weights.get("decenas_distribucion", 0)
-        else:
-            score += strategy_weights.get("decenas_distribucion", 0) * 0.5
+    """
+    Califica una combinación con las reglas del registro usando el análisis
+    pre-calculado (ruta escalar de referencia del motor vectorizado).
+    """
+    return rule_registry.rate_combination(combo, rating_tables(), strategy_weights)
 
-    # 6. Pares Frecuentes
-    pair_hits = sum(
-        1
-        for pair in combinations(combo, 2)
-        if pair in analysis.get("top_pairs_set", set())
-    )
-    score += (pair_hits / 6.0) * strategy_weights.get("pares_frecuentes", 0)
 
-    # 7. Predicción Markov
-    last_draw_nums = {
-        last_draw.get(f"F{j}")
-        for j in range(1, 8)
-        if last_draw.get(f"F{j}") is not None
-    }
-    predicted_hits = 0
-    markov_trans = analysis.get("markovTransitions", {})
-    for prev_num in last_draw_nums:
-        if str(prev_num) in markov_trans:
-            top_transitions = {
-                int(item[0])
-                for item in Counter(markov_trans[str(prev_num)]).most_common(5)
-            }
-            predicted_hits += sum(1 for n in combo if n in top_transitions)
-    score += (predicted_hits / (6.0 * 5.0)) * strategy_weights.get(
-        "prediccion_markov", 0
-    )
+def run_fingerprint():
+    """
+    Huella de las entradas de la corrida (análisis, último sorteo, pesos y
+    ventanas). Un checkpoint solo se reanuda si la huella coincide.
+    """
 
-    # 8. Consecutivos
-    consecutive_pairs = sum(
-        1 for i in range(len(combo) - 1) if combo[i + 1] - combo[i] == 1
+    def default(value):
+        if isinstance(value, set):
+            return sorted(value)
+        if isinstance(value, analysis_codec.PackedAnalysis):
+            return value.digest
+        return str(value)
+
+    payload = json.dumps(
+        [analysis, last_draw, strategy_weights, rule_windows],
+        sort_keys=True,
+        default=default,
     )
-    top_consecutive = [
-        item["pairs"] for item in analysis["consecutiveDistribution"][:2]
-    ]
-    if consecutive_pairs in top_consecutive:
-        score += strategy_weights.get("consecutivos", 0)
-
-    # 9. Terminaciones
-    ending_hits = sum(
-        1 for n in combo if (n % 10) in analysis.get("top_endings", set())
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def checkpoint_ref(db):
+    return db.collection(f"artifacts/{APP_ID}/public/data/config").document(
+        "bruteForceCheckpoint"
     )
-    score += (ending_hits / 6.0) * strategy_weights.get("terminaciones", 0)
 
-    return (score / max_score) * 100
 
+def load_checkpoint(db, fingerprint):
+    """
+    Devuelve (posición, índices top, confianzas top, pools, conteos por nivel,
+    sumas por par) o None si no aplica.
+    """
+    doc = checkpoint_ref(db).get()
+    if not doc.exists:
+        return None
+    data = doc.to_dict()
+    if data.get("fingerprint") != fingerprint:
+        print("ℹ️  Se encontró un checkpoint de otras entradas; se ignora.")
+        return None
+    if "pairSums" not in data:
+        print("ℹ️  El checkpoint no tiene los agregados por par; se ignora.")
+        return None
+    pools = {
+        t: np.frombuffer(data["pools"][str(t)], dtype="<i8").astype(np.int64)
+        for t in POOL_THRESHOLDS
+    }
+    pool_counts = {t: int(data["poolCounts"][str(t)]) for t in POOL_THRESHOLDS}
+    return (
+        int(data["position"]),
+        np.frombuffer(data["topIndex"], dtype="<i8").astype(np.int64),
+        np.frombuffer(data["topConfidence"], dtype="<f8").astype(np.float64),
+        pools,
+        pool_counts,
+        np.frombuffer(data["pairSums"], dtype="<f8")
+        .astype(np.float64)
+        .reshape(se.MAX_NUMBER + 1, se.MAX_NUMBER + 1),
+    )
 
-def main_brute_force():
-    """Función principal para el análisis de fuerza bruta."""
-    db = get_db_client()
-    try:
-        fetch_data(db)
-    except (FileNotFoundError, ValueError) as e:
-        print(f"❌ ERROR: {e}")
-        return
 
-    sorteo_sugerido_para = last_draw["sorteo"] + 1
+def save_checkpoint(
+    db, fingerprint, position, top_index, top_conf, pools, counts, pair_sums
+):
+    checkpoint_ref(db).set(
+        {
+            "fingerprint": fingerprint,
+            "position": int(position),
+            # Arreglos como bytes: compactos y sin entradas de índice en Firestore.
+            "topIndex": top_index.astype("<i8").tobytes(),
+            "topConfidence": top_conf.astype("<f8").tobytes(),
+            "pools": {
+                str(t): pools[t].astype("<i8").tobytes() for t in POOL_THRESHOLDS
+            },
+            "poolCounts": {str(t): counts[t] for t in POOL_THRESHOLDS},
+            "pairSums": pair_sums.astype("<f8").tobytes(),
+            "timestamp": firestore.SERVER_TIMESTAMP,
+        }
+    )
 
-    print("\n--- Iniciando Análisis de Fuerza Bruta (Optimizado) ---")
-    print(f"Calculando ranking para el sorteo: {sorteo_sugerido_para}.")
-    print("Esto puede tardar varios minutos...")
 
-    all_possible_combos = combinations(range(1, 40), 6)
+def pool_keys(index, seed):
+    """
+    Clave pseudoaleatoria fija para cada índice de combinación (mezcla tipo
+    splitmix64). Quedarse con las POOL_SIZE claves menores da una muestra uniforme
+    que se puede acumular por bloques y reanudar sin guardar estado del generador.
+    """
+    offset = np.uint64((seed * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+    x = index.astype(np.uint64) + offset
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def merge_pool(pool_index, index, seed):
+    """Une la muestra acumulada de un nivel con los candidatos de un bloque."""
+    all_index = np.concatenate([pool_index, index])
+    if len(all_index) <= POOL_SIZE:
+        return all_index
+    keys = pool_keys(all_index, seed)
+    return all_index[np.argpartition(keys, POOL_SIZE)[:POOL_SIZE]]
+
+
+def pack_pool(combos, confidences):
+    """Combinaciones como 6 bytes cada una y confianzas como uint16 (x100)."""
+    order = np.argsort(-confidences, kind="stable")
+    return {
+        "combinations": np.ascontiguousarray(combos[order], dtype=np.uint8).tobytes(),
+        "confidences": np.round(confidences[order] * 100).astype("<u2").tobytes(),
+        "size": int(len(order)),
+    }
 
-    rated_combos = []
-    total_combos = 3262623
-    start_time = time.time()
 
-    for i, combo in enumerate(all_possible_combos):
-        confidence = rate_combination(combo)
-        rated_combos.append({"combination": list(combo), "confidence": confidence})
+def publish_pools(db, sorteo_sugerido_para, all_combos, tables, pools, counts, top):
+    """Guarda los pools del generador en 'analysis/generatorPools'."""
 
-        if (i + 1) % 100000 == 0:
-            elapsed = time.time() - start_time
-            progress = (i + 1) / total_combos * 100
-            print(
-                f"Procesadas {i+1}/{total_combos} combinaciones ({progress:.2f}%)... ({elapsed:.2f}s)"
-            )
+    def packed(index):
+        combos = all_combos[np.sort(index)]
+        confidences = se.confidence(
+            se.rule_numerators(combos, tables), strategy_weights
+        )
+        return pack_pool(combos, confidences)
+
+    document = {
+        "sorteo_sugerido_para": sorteo_sugerido_para,
+        "strategyWeights": strategy_weights,
+        "thresholds": POOL_THRESHOLDS,
+        "pools": {
+            str(t): {**packed(pools[t]), "available": counts[t]}
+            for t in POOL_THRESHOLDS
+        },
+        "top": packed(top),
+        "timestamp": firestore.SERVER_TIMESTAMP,
+    }
+    db.collection(f"artifacts/{APP_ID}/public/data/analysis").document(
+        "generatorPools"
+    ).set(document)
 
-    print("\nAnálisis completado. Ordenando resultados...")
-    rated_combos.sort(key=lambda x: x["confidence"], reverse=True)
 
-    top_30 = rated_combos[:30]
+def publish_aggregates(db, sorteo_sugerido_para, aggregates):
+    """
+    Guarda en 'analysis/numberAggregates' la media, el máximo y las apariciones en
+    el top de la confianza por número (ordenados por apariciones y luego por
+    media) y por par (arreglos empaquetados en el orden lexicográfico de los pares).
+    """
+    order = np.lexsort(
+        (aggregates["numbers"], -aggregates["number_mean"], -aggregates["number_top"])
+    )
+    document = {
+        "sorteo_sugerido_para": sorteo_sugerido_para,
+        "strategyWeights": strategy_weights,
+        "topFraction": AGGREGATE_TOP_FRACTION,
+        "topSize": AGGREGATE_TOP_SIZE,
+        "numbers": [
+            {
+                "number": int(aggregates["numbers"][i]),
+                "mean": float(aggregates["number_mean"][i]),
+                "max": float(aggregates["number_max"][i]),
+                "topCount": int(aggregates["number_top"][i]),
+                "rank": rank + 1,
+            }
+            for rank, i in enumerate(order)
+        ],
+        "pairs": {
+            "size": int(len(aggregates["pairs"])),
+            "mean": aggregates["pair_mean"].astype("<f4").tobytes(),
+            "max": aggregates["pair_max"].astype("<f4").tobytes(),
+            "topCount": aggregates["pair_top"].astype("<u4").tobytes(),
+        },
+        "timestamp": firestore.SERVER_TIMESTAMP,
+    }
+    db.collection(f"artifacts/{APP_ID}/public/data/analysis").document(
+        "numberAggregates"
+    ).set(document)
 
-    print("Subiendo las 30 mejores combinaciones a Firestore...")
 
+def publish_top(db, sorteo_sugerido_para, combos, confidences, provisional=False):
+    """Reemplaza las sugerencias guardadas para el sorteo con el top dado."""
     batch = db.batch()
     collection_ref = db.collection(
         f"artifacts/{APP_ID}/public/data/bruteForceSuggestions"
@@ -278,30 +363,416 @@ def main_brute_force():
     for doc in docs_to_delete:
         batch.delete(doc.reference)
         deleted_count += 1
-    if deleted_count > 0:
+    if deleted_count > 0 and not provisional:
         print(
             f"Se eliminaron {deleted_count} sugerencias antiguas para el sorteo {sorteo_sugerido_para}."
         )
 
-    for i, item in enumerate(top_30):
+    for i, (combo, confidence) in enumerate(zip(combos, confidences)):
         doc_ref = collection_ref.document()
         item_to_save = {
             "sorteo_sugerido_para": sorteo_sugerido_para,
-            "confidence": item["confidence"],
-            "combination": json.dumps(item["combination"]),
+            "confidence": float(confidence),
+            "combination": json.dumps([int(n) for n in combo]),
             "rank": i + 1,
+            "provisional": provisional,
             "timestamp": firestore.SERVER_TIMESTAMP,
         }
         batch.set(doc_ref, item_to_save)
 
     batch.commit()
 
+
+def delete_provisional(db):
+    """
+    Borra las sugerencias provisionales que dejó una corrida interrumpida. Se
+    llama al empezar sin checkpoint: el top provisional de esa corrida ya no se
+    va a completar y no debe contarse como sugerencia real.
+    """
+    collection_ref = db.collection(
+        f"artifacts/{APP_ID}/public/data/bruteForceSuggestions"
+    )
+    docs = list(collection_ref.where("provisional", "==", True).stream())
+    # Firestore admite hasta 500 operaciones por lote.
+    for start in range(0, len(docs), 500):
+        batch = db.batch()
+        for doc in docs[start : start + 500]:
+            batch.delete(doc.reference)
+        batch.commit()
+    if docs:
+        print(f"Se eliminaron {len(docs)} sugerencias provisionales abandonadas.")
+
+
+def rank_all_combinations(k=TOP_K):
+    """
+    Top-k de todas las combinaciones con el análisis, los pesos y las ventanas ya
+    cargados, sin checkpoints ni publicación (modo sin conexión de 'melate.py').
+    """
+    all_possible_combos = se.all_combinations()
+    backend = scoring_backends.select_backend(
+        analysis, last_draw, strategy_weights, rule_windows
+    )
+    top_index = np.zeros(0, dtype=np.int64)
+    top_conf = np.zeros(0, dtype=np.float64)
+    for position in range(0, len(all_possible_combos), CHUNK_SIZE):
+        end = min(position + CHUNK_SIZE, len(all_possible_combos))
+        confidence = backend.confidence(
+            all_possible_combos[position:end], slice(position, end)
+        )
+        chunk_top = se.top_k(confidence, k)
+        top_index, top_conf = se.merge_top_k(
+            top_index, top_conf, chunk_top + position, confidence[chunk_top], k
+        )
+    return all_possible_combos[top_index], top_conf
+
+
+def main_brute_force():
+    """Función principal para el análisis de fuerza bruta."""
+    db = get_db_client()
+    try:
+        fetch_data(db)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ ERROR: {e}")
+        return
+
+    sorteo_sugerido_para = last_draw["sorteo"] + 1
+
+    print("\n--- Iniciando Análisis de Fuerza Bruta (Optimizado) ---")
+    print(f"Calculando ranking para el sorteo: {sorteo_sugerido_para}.")
+
+    # Las reglas se evalúan por bloques sobre la matriz de todas las combinaciones
+    # (mismo orden que itertools.combinations) con el backend más rápido
+    # disponible (kernel compilado o motor vectorizado), verificado contra
+    # 'rate_combination' al iniciar.
+    all_possible_combos = se.all_combinations()
+    total_combos = len(all_possible_combos)
+    tables = se.build_tables(analysis, last_draw, rule_windows)
+    backend = scoring_backends.select_backend(
+        analysis, last_draw, strategy_weights, rule_windows, tables
+    )
+
+    fingerprint = run_fingerprint()
+    position = 0
+    top_index = np.zeros(0, dtype=np.int64)
+    top_conf = np.zeros(0, dtype=np.float64)
+    pools = {t: np.zeros(0, dtype=np.int64) for t in POOL_THRESHOLDS}
+    pool_counts = {t: 0 for t in POOL_THRESHOLDS}
+    pair_sums = np.zeros((se.MAX_NUMBER + 1, se.MAX_NUMBER + 1), dtype=np.float64)
+    checkpoint = load_checkpoint(db, fingerprint)
+    if checkpoint:
+        position, top_index, top_conf, pools, pool_counts, pair_sums = checkpoint
+        print(f"Reanudando desde el checkpoint: {position}/{total_combos}.")
+    else:
+        delete_provisional(db)
+
+    start_time = time.time()
+    last_checkpoint = last_provisional = start_time
+    while position < total_combos:
+        end = min(position + CHUNK_SIZE, total_combos)
+        confidence = backend.confidence(
+            all_possible_combos[position:end], slice(position, end)
+        )
+        # El top se acumula con RANKING_SIZE elementos: los primeros TOP_K son el
+        # ranking publicado, los primeros POOL_SIZE el respaldo del generador y
+        # todos juntos el top de los agregados. Con el top lleno solo son
+        # candidatas las combinaciones que alcanzan su último valor.
+        if len(top_conf) == RANKING_SIZE:
+            candidates = np.flatnonzero(confidence >= top_conf[-1])
+        else:
+            candidates = se.top_k(confidence, RANKING_SIZE)
+        top_index, top_conf = se.merge_top_k(
+            top_index,
+            top_conf,
+            candidates + position,
+            confidence[candidates],
+            RANKING_SIZE,
+        )
+        pair_sums += se.pair_confidence_sums(
+            all_possible_combos[position:end], confidence
+        )
+        for threshold in POOL_THRESHOLDS:
+            candidates = np.flatnonzero(confidence >= threshold) + position
+            pool_counts[threshold] += len(candidates)
+            pools[threshold] = merge_pool(
+                pools[threshold], candidates, sorteo_sugerido_para
+            )
+        position = end
+
+        elapsed = time.time() - start_time
+        progress = position / total_combos * 100
+        print(
+            f"Procesadas {position}/{total_combos} combinaciones ({progress:.2f}%)... ({elapsed:.2f}s)"
+        )
+
+        now = time.time()
+        if position < total_combos and now - last_checkpoint >= CHECKPOINT_SECONDS:
+            save_checkpoint(
+                db,
+                fingerprint,
+                position,
+                top_index,
+                top_conf,
+                pools,
+                pool_counts,
+                pair_sums,
+            )
+            last_checkpoint = now
+            if now - last_provisional >= PROVISIONAL_SECONDS:
+                publish_top(
+                    db,
+                    sorteo_sugerido_para,
+                    all_possible_combos[top_index[:TOP_K]],
+                    top_conf[:TOP_K],
+                    provisional=True,
+                )
+                last_provisional = now
+                print("Top provisional publicado.")
+
+    print(
+        f"\nAnálisis completado. Subiendo las {TOP_K} mejores combinaciones a Firestore..."
+    )
+    publish_top(
+        db,
+        sorteo_sugerido_para,
+        all_possible_combos[top_index[:TOP_K]],
+        top_conf[:TOP_K],
+    )
+    publish_pools(
+        db,
+        sorteo_sugerido_para,
+        all_possible_combos,
+        tables,
+        pools,
+        pool_counts,
+        top_index[:POOL_SIZE],
+    )
+    print("✅ Pools del generador guardados en 'analysis/generatorPools'.")
+    aggregates = se.confidence_aggregates(
+        pair_sums,
+        all_possible_combos[top_index[:AGGREGATE_TOP_SIZE]],
+        top_conf[:AGGREGATE_TOP_SIZE],
+        lambda fixed: backend.confidence(se.completions(fixed)),
+    )
+    publish_aggregates(db, sorteo_sugerido_para, aggregates)
+    print("✅ Agregados por número y por par guardados en 'analysis/numberAggregates'.")
+    checkpoint_ref(db).delete()
+
     print(
-        f"✅ ¡Éxito! El Top 30 para el sorteo {sorteo_sugerido_para} ha sido guardado en Firestore."
+        f"✅ ¡Éxito! El Top {TOP_K} para el sorteo {sorteo_sugerido_para} ha sido guardado en Firestore."
     )
     total_time = time.time() - start_time
     print(f"Tiempo total del proceso: {total_time/60:.2f} minutos.")
 
 
+def fetch_profiles(db):
+    """
+    Perfiles de pesos de 'weightProfiles' (id del documento -> pesos). Como en
+    'config/strategyWeights', una regla omitida en el perfil pesa 0.
+    """
+    docs = db.collection(f"artifacts/{APP_ID}/public/data/weightProfiles").stream()
+    return {doc.id: rule_registry.complete_weights(doc.to_dict()) for doc in docs}
+
+
+def publish_profile_rankings(db, sorteo_sugerido_para, profiles, results, combos):
+    """Guarda el top de cada perfil en 'profileSuggestions/{perfil}'."""
+    collection_ref = db.collection(f"artifacts/{APP_ID}/public/data/profileSuggestions")
+    ids = list(profiles)
+    # Un lote de Firestore admite hasta 500 escrituras.
+    for start in range(0, len(ids), 500):
+        batch = db.batch()
+        for profile_id in ids[start : start + 500]:
+            top_index, top_conf = results[profile_id]
+            batch.set(
+                collection_ref.document(profile_id),
+                {
+                    "sorteo_sugerido_para": sorteo_sugerido_para,
+                    "strategyWeights": profiles[profile_id],
+                    "top": [
+                        {
+                            "combination": json.dumps([int(n) for n in combos[i]]),
+                            "confidence": float(c),
+                            "rank": rank,
+                        }
+                        for rank, (i, c) in enumerate(zip(top_index, top_conf), 1)
+                    ],
+                    "timestamp": firestore.SERVER_TIMESTAMP,
+                },
+            )
+        batch.commit()
+
+
+def main_profiles():
+    """
+    Ranking multi-perfil: calcula los numeradores de las reglas una sola vez por
+    bloque y obtiene el top de cada perfil de 'weightProfiles' en la misma pasada.
+    """
+    db = get_db_client()
+    try:
+        fetch_data(db)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ ERROR: {e}")
+        return
+    profiles = fetch_profiles(db)
+    if not profiles:
+        print("ℹ️  No hay perfiles en 'weightProfiles'. No se requiere acción.")
+        return
+
+    sorteo_sugerido_para = last_draw["sorteo"] + 1
+    print("\n--- Iniciando Ranking Multi-Perfil ---")
+    print(f"Perfiles: {len(profiles)}. Sorteo: {sorteo_sugerido_para}.")
+
+    all_possible_combos = se.all_combinations()
+    total_combos = len(all_possible_combos)
+    tables = se.build_tables(analysis, last_draw, rule_windows)
+    ranker = se.ProfileRanker(list(profiles.values()), TOP_K)
+
+    start_time = time.time()
+    for position in range(0, total_combos, PROFILE_CHUNK_SIZE):
+        chunk = slice(position, position + PROFILE_CHUNK_SIZE)
+        numerators = se.rule_numerators(all_possible_combos[chunk], tables, chunk)
+        ranker.update(numerators, position)
+    print(f"Ranking calculado en {time.time() - start_time:.2f}s.")
+
+    results = dict(zip(profiles, ranker.results()))
+    publish_profile_rankings(
+        db, sorteo_sugerido_para, profiles, results, all_possible_combos
+    )
+    print(
+        f"✅ ¡Éxito! Top {TOP_K} de {len(profiles)} perfiles guardado en 'profileSuggestions'."
+    )
+
+
+def fetch_adicional_weights(db):
+    """Pesos de las reglas del adicional ('config/adicionalWeights', opcional)."""
+    weights_doc = (
+        db.collection(f"artifacts/{APP_ID}/public/data/config")
+        .document("adicionalWeights")
+        .get()
+    )
+    return {
+        **rule_registry.DEFAULT_ADICIONAL_WEIGHTS,
+        **(weights_doc.to_dict() if weights_doc.exists else {}),
+    }
+
+
+def _init_adicional_worker(context):
+    global _adicional_context
+    _adicional_context = context
+
+
+def _rank_adicional_chunk(start):
+    """
+    Top-K de un bloque de boletos con cada candidato a adicional. Cada
+    estructura 6+1 se identifica con la clave índice_del_boleto * 40 + adicional,
+    que sigue el orden de enumeración y sirve para desempatar. El bloque se
+    obtiene por índice, sin que cada proceso construya las 3.26M combinaciones.
+    """
+    tables, adicional_tables, weights, adicional_weights = _adicional_context
+    stop = min(start + ADICIONAL_CHUNK_SIZE, se.TOTAL_COMBINATIONS)
+    combos = se.combinations_at(np.arange(start, stop))
+    numerators = se.rule_numerators(combos, tables)
+    conf = se.six_plus_one_confidence(
+        combos, numerators, adicional_tables, weights, adicional_weights
+    ).ravel()
+    best = se.top_k(conf, TOP_K)
+    return best + start * (se.MAX_NUMBER + 1), conf[best]
+
+
+def publish_adicional_top(
+    db, sorteo_sugerido_para, combos, adicionales, confidences, adicional_weights
+):
+    """Reemplaza las sugerencias 6+1 guardadas para el sorteo con el top dado."""
+    batch = db.batch()
+    collection_ref = db.collection(
+        f"artifacts/{APP_ID}/public/data/adicionalSuggestions"
+    )
+    for doc in collection_ref.where(
+        "sorteo_sugerido_para", "==", sorteo_sugerido_para
+    ).stream():
+        batch.delete(doc.reference)
+
+    for i, (combo, adicional, confidence) in enumerate(
+        zip(combos, adicionales, confidences)
+    ):
+        batch.set(
+            collection_ref.document(),
+            {
+                "sorteo_sugerido_para": sorteo_sugerido_para,
+                "confidence": float(confidence),
+                "combination": json.dumps([int(n) for n in combo]),
+                "adicional": int(adicional),
+                "rank": i + 1,
+                "strategyWeights": strategy_weights,
+                "adicionalWeights": adicional_weights,
+                "timestamp": firestore.SERVER_TIMESTAMP,
+            },
+        )
+    batch.commit()
+
+
+def main_adicional():
+    """
+    Ranking 6+1 para los premios que incluyen el número adicional: cada boleto
+    de 6 números con cada número restante como adicional (las 15.4M
+    combinaciones de 7 números, con cada uno de sus 7 números como adicional).
+    Los bloques se califican en paralelo y cada proceso solo devuelve su top.
+    """
+    db = get_db_client()
+    try:
+        fetch_data(db)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ ERROR: {e}")
+        return
+    adicional_weights = fetch_adicional_weights(db)
+
+    sorteo_sugerido_para = last_draw["sorteo"] + 1
+    print("\n--- Iniciando Ranking 6+1 (con Número Adicional) ---")
+    print(f"Calculando ranking para el sorteo: {sorteo_sugerido_para}.")
+
+    context = (
+        se.build_tables(analysis, last_draw, rule_windows),
+        se.build_adicional_tables(analysis, last_draw, rule_windows),
+        strategy_weights,
+        adicional_weights,
+    )
+    starts = range(0, se.TOTAL_COMBINATIONS, ADICIONAL_CHUNK_SIZE)
+    top_keys = np.zeros(0, dtype=np.int64)
+    top_conf = np.zeros(0, dtype=np.float64)
+
+    start_time = time.time()
+    with ProcessPoolExecutor(
+        max_workers=ADICIONAL_WORKERS,
+        initializer=_init_adicional_worker,
+        initargs=(context,),
+    ) as executor:
+        results = executor.map(_rank_adicional_chunk, starts)
+        for done, (keys, conf) in enumerate(results, 1):
+            top_keys, top_conf = se.merge_top_k(top_keys, top_conf, keys, conf, TOP_K)
+            if done % 10 == 0 or done == len(starts):
+                print(
+                    f"Bloques procesados: {done}/{len(starts)}... "
+                    f"({time.time() - start_time:.2f}s)"
+                )
+
+    combo_index, adicionales = np.divmod(top_keys, se.MAX_NUMBER + 1)
+    publish_adicional_top(
+        db,
+        sorteo_sugerido_para,
+        se.combinations_at(combo_index),
+        adicionales,
+        top_conf,
+        adicional_weights,
+    )
+    print(
+        f"✅ ¡Éxito! Top {TOP_K} 6+1 para el sorteo {sorteo_sugerido_para} "
+        f"guardado en 'adicionalSuggestions'."
+    )
+
+
 if __name__ == "__main__":
-    main_brute_force()
+    if "--profiles" in sys.argv[1:]:
+        main_profiles()
+    elif "--adicional" in sys.argv[1:]:
+        main_adicional()
+    else:
+        main_brute_force()
@@ -9,11 +9,17 @@
 
 import requests
 from bs4 import BeautifulSoup
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
 import json  # Importar json para manejar el secreto
 
+# Firebase solo se necesita para escribir en Firestore; el modo sin conexión de
+# 'melate.py' guarda el resultado en la caché local del historial.
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+except ImportError:
+    firebase_admin = None
+
 # --- CONFIGURACIÓN ---
 # Estos valores se leerán desde las variables de entorno si están disponibles (para GitHub Actions)
 # o desde estas variables si se ejecuta localmente.
@@ -29,40 +35,11 @@ CREDENTIALS_FILE = "analizadormelateretro-firebase-adminsdk-fbsvc-4129f33301.jso
 URL_DE_RESULTADOS = "https://www.loterianacional.gob.mx/MelateRetro/Resultados"
 
 
-def main():
+def fetch_latest_result():
     """
-    Función principal que orquesta el proceso de scraping y actualización.
+    Extrae de la página oficial el último resultado publicado, con el mismo
+    formato que los documentos de 'results'. Devuelve None si algo falla.
     """
-    print("--- Iniciando Script de Actualización de Melate Retro ---")
-
-    # --- 1. Conexión a Firebase ---
-    try:
-        if "FIREBASE_CREDENTIALS" in os.environ:
-            # En GitHub Actions, lee las credenciales desde el secreto
-            print("Leyendo credenciales desde el secreto de GitHub...")
-            creds_json = json.loads(os.environ["FIREBASE_CREDENTIALS"])
-            cred = credentials.Certificate(creds_json)
-        elif os.path.exists(CREDENTIALS_FILE):
-            # En un entorno local, lee las credenciales desde el archivo
-            print(f"Leyendo credenciales desde el archivo local: {CREDENTIALS_FILE}...")
-            cred = credentials.Certificate(CREDENTIALS_FILE)
-        else:
-            print(
-                f"ERROR: No se encontraron credenciales. Ni el secreto 'FIREBASE_CREDENTIALS' ni el archivo '{CREDENTIALS_FILE}' están disponibles."
-            )
-            return
-
-        # Evitar re-inicialización si el script se importa en otro lugar
-        if not firebase_admin._apps:
-            firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DATABASE_URL})
-
-        db = firestore.client()
-        print("✅ Conexión a Firebase exitosa.")
-    except Exception as e:
-        print(f"❌ ERROR: No se pudo conectar a Firebase. Causa: {e}")
-        return
-
-    # --- 2. Lógica de Web Scraping ---
     try:
         print(f"Obteniendo datos desde: {URL_DE_RESULTADOS}...")
         headers = {
@@ -80,7 +57,7 @@ def main():
             print(
                 "❌ ERROR de Scraping: No se encontró la celda de información de la tabla."
             )
-            return
+            return None
 
         info_text = info_cell.get_text(separator="\n", strip=True)
         lines = info_text.split("\n")
@@ -92,7 +69,7 @@ def main():
             print(
                 "❌ ERROR de Scraping: No se pudo encontrar 'Sorteo:' o 'Fecha' en la cabecera."
             )
-            return
+            return None
 
         sorteo_nuevo = int(sorteo_nuevo_str.split(":")[1].strip())
         fecha_nueva = fecha_nueva_str.split("Fecha")[1].strip()
@@ -103,7 +80,7 @@ def main():
             print(
                 "❌ ERROR de Scraping: No se encontró la etiqueta <h3> con los números."
             )
-            return
+            return None
 
         numeros_completos_str = numeros_tag.text.strip()
         numeros_principales_str = numeros_completos_str.split("-")[0]
@@ -118,10 +95,64 @@ def main():
 
     except requests.exceptions.RequestException as e:
         print(f"❌ ERROR DE RED: {e}")
-        return
+        return None
     except Exception as e:
         print(f"❌ ERROR INESPERADO durante el scraping: {e}")
+        return None
+
+    return {
+        "sorteo": sorteo_nuevo,
+        "FECHA": fecha_nueva,
+        "F1": numeros_nuevos[0],
+        "F2": numeros_nuevos[1],
+        "F3": numeros_nuevos[2],
+        "F4": numeros_nuevos[3],
+        "F5": numeros_nuevos[4],
+        "F6": numeros_nuevos[5],
+        "F7": adicional_nuevo,
+    }
+
+
+def main():
+    """
+    Función principal que orquesta el proceso de scraping y actualización.
+    """
+    print("--- Iniciando Script de Actualización de Melate Retro ---")
+
+    # --- 1. Conexión a Firebase ---
+    try:
+        if firebase_admin is None:
+            raise ImportError("firebase_admin no está instalado.")
+        if "FIREBASE_CREDENTIALS" in os.environ:
+            # En GitHub Actions, lee las credenciales desde el secreto
+            print("Leyendo credenciales desde el secreto de GitHub...")
+            creds_json = json.loads(os.environ["FIREBASE_CREDENTIALS"])
+            cred = credentials.Certificate(creds_json)
+        elif os.path.exists(CREDENTIALS_FILE):
+            # En un entorno local, lee las credenciales desde el archivo
+            print(f"Leyendo credenciales desde el archivo local: {CREDENTIALS_FILE}...")
+            cred = credentials.Certificate(CREDENTIALS_FILE)
+        else:
+            print(
+                f"ERROR: No se encontraron credenciales. Ni el secreto 'FIREBASE_CREDENTIALS' ni el archivo '{CREDENTIALS_FILE}' están disponibles."
+            )
+            return
+
+        # Evitar re-inicialización si el script se importa en otro lugar
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DATABASE_URL})
+
+        db = firestore.client()
+        print("✅ Conexión a Firebase exitosa.")
+    except Exception as e:
+        print(f"❌ ERROR: No se pudo conectar a Firebase. Causa: {e}")
+        return
+
+    # --- 2. Lógica de Web Scraping ---
+    data_to_save = fetch_latest_result()
+    if data_to_save is None:
         return
+    sorteo_nuevo = data_to_save["sorteo"]
 
     # --- 3. Actualización de Firestore ---
     try:
@@ -134,17 +165,6 @@ def main():
             )
         else:
             print(f"Añadiendo el sorteo {sorteo_nuevo} a Firestore...")
-            data_to_save = {
-                "sorteo": sorteo_nuevo,
-                "FECHA": fecha_nueva,
-                "F1": numeros_nuevos[0],
-                "F2": numeros_nuevos[1],
-                "F3": numeros_nuevos[2],
-                "F4": numeros_nuevos[3],
-                "F5": numeros_nuevos[4],
-                "F6": numeros_nuevos[5],
-                "F7": adicional_nuevo,
-            }
             doc_ref.set(data_to_save)
             print(
                 f"✅ ¡Éxito! El sorteo {sorteo_nuevo} ha sido añadido a la base de datos."
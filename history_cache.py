@@ -0,0 +1,334 @@
+# Caché Local del Historial y Estado Incremental del Análisis
+#
+# Descripción:
+# Copia local de la colección 'results' (mismo formato de documento: sorteo, FECHA,
+# F1..F7) y un estado de análisis incremental con los conteos acumulados que usa el
+# análisis estadístico (frecuencias, último sorteo en que salió cada número, pares,
+# transiciones de Markov, distribuciones par/impar, decenas, consecutivos y sumas).
+# El estado se actualiza solo con los sorteos nuevos, sin releer el historial.
+# 'precompute_analysis.py' saca de él las secciones del histórico completo, con el
+# mismo orden (incluidos los empates) que el análisis calculado desde cero.
+#
+# Archivos (configurables por variables de entorno):
+#   HISTORY_CACHE_FILE  -> history_cache.json  (lista de sorteos, el más reciente primero)
+#   ANALYSIS_STATE_FILE -> analysis_state.npz  (arreglos de conteos acumulados)
+
+import os
+import json
+
+import numpy as np
+
+import markov_engine
+
+HISTORY_CACHE_FILE = os.environ.get("HISTORY_CACHE_FILE", "history_cache.json")
+ANALYSIS_STATE_FILE = os.environ.get("ANALYSIS_STATE_FILE", "analysis_state.npz")
+
+# Sumas posibles de 6 números entre 1 y 39 (la máxima es 34+...+39 = 219).
+_MAX_SUM = 220
+# Patrón de decenas (conteos ordenados de mayor a menor) codificado en base 7.
+_TENS_CODES = 7**4
+
+
+def load_history(path=HISTORY_CACHE_FILE):
+    """Devuelve el historial en caché (el más reciente primero) o [] si no existe."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(history, path=HISTORY_CACHE_FILE):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def merge_history(history, draws):
+    """Une sorteos nuevos al historial, sin duplicados y ordenado por sorteo desc."""
+    by_sorteo = {d["sorteo"]: d for d in history}
+    by_sorteo.update((d["sorteo"], d) for d in draws)
+    return [by_sorteo[s] for s in sorted(by_sorteo, reverse=True)]
+
+
+def _tens_label(code):
+    digits = []
+    for _ in range(4):
+        code, digit = divmod(code, 7)
+        digits.append(str(digit))
+    return "-".join(reversed(digits))
+
+
+def _ranked(counts, keys, labels, label_key, value_key="count"):
+    """
+    Lista {etiqueta, conteo} de las etiquetas con conteo > 0, de mayor a menor. Los
+    empates siguen 'keys' (menor primero), el orden de aparición que deja Counter
+    al recorrer el historial del más reciente al más antiguo.
+    """
+    present = np.flatnonzero(counts > 0)
+    order = present[np.lexsort((keys[present], -counts[present]))]
+    return [{label_key: labels[i], value_key: int(counts[i])} for i in order]
+
+
+class AnalysisState:
+    """
+    Conteos acumulados del análisis completo, actualizables sorteo a sorteo. Junto
+    a cada conteo se guarda el último sorteo en que apareció la etiqueta (y la
+    posición del número en ese sorteo): con eso 'to_analysis' desempata igual que
+    'perform_full_analysis', que ordena por conteo en orden de primera aparición
+    recorriendo el historial del más reciente al más antiguo.
+    """
+
+    def __init__(self, second_order=True):
+        # Sin segundo orden se omite la tabla par -> número (la más costosa), que
+        # ninguna regla lee; sirve para análisis desechables ('rule_analysis').
+        self.second_order_enabled = second_order
+        self.watermark = 0
+        self.draws = 0
+        self.numbers = np.zeros(40, dtype=np.int64)
+        self.last_seen = np.zeros(40, dtype=np.int64)
+        # Índice (0 = F1 ... 6 = F7) del número en el último sorteo en que salió.
+        self.last_position = np.zeros(40, dtype=np.int64)
+        self.adicional = np.zeros(40, dtype=np.int64)
+        self.adicional_last_seen = np.zeros(40, dtype=np.int64)
+        self.pairs = np.zeros((40, 40), dtype=np.int64)
+        self.pair_last_seen = np.zeros(len(markov_engine.PAIRS), dtype=np.int64)
+        self.markov = np.zeros((40, 40), dtype=np.int64)
+        self.second_order = np.zeros((len(markov_engine.PAIRS), 40), dtype=np.int64)
+        self.last_numbers = np.zeros(40, dtype=np.int64)
+        self.evens = np.zeros(7, dtype=np.int64)
+        self.evens_last_seen = np.zeros(7, dtype=np.int64)
+        self.consecutive = np.zeros(6, dtype=np.int64)
+        self.consecutive_last_seen = np.zeros(6, dtype=np.int64)
+        self.tens = np.zeros(_TENS_CODES, dtype=np.int64)
+        self.tens_last_seen = np.zeros(_TENS_CODES, dtype=np.int64)
+        self.sums = np.zeros(_MAX_SUM, dtype=np.int64)
+
+    _ARRAYS = (
+        "numbers",
+        "last_seen",
+        "last_position",
+        "adicional",
+        "adicional_last_seen",
+        "pairs",
+        "pair_last_seen",
+        "markov",
+        "second_order",
+        "last_numbers",
+        "evens",
+        "evens_last_seen",
+        "consecutive",
+        "consecutive_last_seen",
+        "tens",
+        "tens_last_seen",
+        "sums",
+    )
+
+    @classmethod
+    def load(cls, path=ANALYSIS_STATE_FILE):
+        """
+        Estado guardado en 'path', o uno vacío si no existe o es de una versión
+        anterior (le faltan arreglos); en ese caso se reconstruye al actualizarlo.
+        """
+        state = cls()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if not all(name in data for name in cls._ARRAYS):
+                    return state
+                state.watermark = int(data["watermark"])
+                state.draws = int(data["draws"])
+                for name in cls._ARRAYS:
+                    setattr(state, name, data[name].astype(np.int64))
+        return state
+
+    def save(self, path=ANALYSIS_STATE_FILE):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            watermark=self.watermark,
+            draws=self.draws,
+            **{name: getattr(self, name) for name in self._ARRAYS},
+        )
+        os.replace(tmp_path, path)
+
+    def covers(self, history):
+        """True si el estado acumula exactamente los sorteos de 'history'."""
+        return (
+            bool(history)
+            and self.draws == len(history)
+            and self.watermark == max(d["sorteo"] for d in history)
+        )
+
+    def update(self, draws):
+        """
+        Agrega sorteos posteriores al 'watermark' (en cualquier orden). Todo se
+        acumula con productos de matrices one-hot sobre el bloque completo.
+        """
+        draws = sorted(
+            (d for d in draws if d["sorteo"] > self.watermark),
+            key=lambda d: d["sorteo"],
+        )
+        if not draws:
+            return 0
+        n = len(draws)
+        sorteos = np.array([d["sorteo"] for d in draws], dtype=np.int64)
+        raw = np.array(
+            [[d.get(f"F{j}") or 0 for j in range(1, 8)] for d in draws],
+            dtype=np.int64,
+        )
+        naturals = np.sort(raw[:, :6], axis=1)
+        one_hot = markov_engine.draw_matrix(draws).astype(np.int64)
+
+        self.numbers += one_hot.sum(axis=0)
+        self.last_seen = np.maximum(
+            self.last_seen, (one_hot * sorteos[:, None]).max(axis=0)
+        )
+        # Posición de cada número en su aparición más reciente del bloque.
+        rows, cols = np.nonzero(raw)
+        latest = np.unique(raw[rows, cols][::-1], return_index=True)
+        self.last_position[latest[0]] = cols[::-1][latest[1]]
+
+        adicional = raw[:, 6]
+        has_adicional = adicional > 0
+        self.adicional += np.bincount(adicional[has_adicional], minlength=40)
+        np.maximum.at(
+            self.adicional_last_seen,
+            adicional[has_adicional],
+            sorteos[has_adicional],
+        )
+
+        self.pairs += np.triu(one_hot.T @ one_hot, k=1)
+        pair_hot = markov_engine.pair_matrix(one_hot)
+        self.pair_last_seen = np.maximum(
+            self.pair_last_seen, (pair_hot * sorteos[:, None]).max(axis=0)
+        )
+        previous = np.vstack([self.last_numbers, one_hot[:-1]])
+        self.markov += previous.T @ one_hot
+        if self.second_order_enabled:
+            self.second_order += markov_engine.pair_matrix(previous).T @ one_hot
+
+        evens = (naturals % 2 == 0).sum(axis=1)
+        self.evens += np.bincount(evens, minlength=7)
+        np.maximum.at(self.evens_last_seen, evens, sorteos)
+        consecutive = (np.diff(naturals, axis=1) == 1).sum(axis=1)
+        self.consecutive += np.bincount(consecutive, minlength=6)
+        np.maximum.at(self.consecutive_last_seen, consecutive, sorteos)
+        decades = np.stack(
+            [(naturals // 10 == k).sum(axis=1) for k in range(4)], axis=1
+        )
+        decades = -np.sort(-decades, axis=1)
+        codes = ((decades[:, 0] * 7 + decades[:, 1]) * 7 + decades[:, 2]) * 7
+        codes += decades[:, 3]
+        self.tens += np.bincount(codes, minlength=_TENS_CODES)
+        np.maximum.at(self.tens_last_seen, codes, sorteos)
+        self.sums += np.bincount(naturals.sum(axis=1), minlength=_MAX_SUM)
+
+        self.last_numbers = one_hot[-1]
+        self.watermark = int(sorteos[-1])
+        self.draws += n
+        return n
+
+    def to_analysis(self):
+        """
+        Secciones del histórico completo a partir de los conteos, con el mismo
+        contenido y orden que 'perform_full_analysis' (sin 'windows').
+        """
+        analysis = {}
+        numbers = list(range(40))
+        # Orden de primera aparición de cada número (recorriendo del más reciente).
+        appearance = np.empty(40, dtype=np.int64)
+        appearance[np.lexsort((self.last_position, -self.last_seen))] = np.arange(40)
+
+        analysis["frequencies"] = _ranked(
+            self.numbers, appearance, numbers, "number", "frequency"
+        )
+        analysis["adicionalFrequencies"] = _ranked(
+            self.adicional, -self.adicional_last_seen, numbers, "number", "frequency"
+        )
+
+        floor = self.watermark - self.draws
+        lags = self.watermark - np.where(self.last_seen > 0, self.last_seen, floor)
+        analysis["lags"] = sorted(
+            [{"number": n, "lag": int(lags[n])} for n in range(1, 40)],
+            key=lambda x: x["lag"],
+            reverse=True,
+        )
+
+        pairs = markov_engine.PAIRS
+        pair_counts = self.pairs[pairs[:, 0], pairs[:, 1]]
+        pair_order = np.lexsort((np.arange(len(pairs)), -self.pair_last_seen))
+        pair_order = pair_order[np.argsort(-pair_counts[pair_order], kind="stable")]
+        pair_order = pair_order[pair_counts[pair_order] > 0]
+        top_pairs = [[int(x) for x in pairs[i]] for i in pair_order[:20]]
+        analysis["topPairs"] = [
+            {"pair": pair, "count": int(pair_counts[i])}
+            for pair, i in zip(top_pairs[:10], pair_order)
+        ]
+        analysis["topPairsSet_list"] = [json.dumps(pair) for pair in top_pairs]
+
+        analysis["oddEvenDistribution"] = _ranked(
+            self.evens,
+            -self.evens_last_seen,
+            [f"{e}P-{6 - e}I" for e in range(7)],
+            "dist",
+        )
+        analysis["tensDistribution"] = _ranked(
+            self.tens,
+            -self.tens_last_seen,
+            [_tens_label(c) for c in range(_TENS_CODES)],
+            "dist",
+        )
+
+        sums = np.repeat(np.arange(_MAX_SUM), self.sums)
+        if sums.size:
+            analysis["sumAnalysis"] = sum_statistics(sums)
+
+        analysis["markovTransitions"] = {
+            str(prev): {
+                str(curr): int(self.markov[prev, curr])
+                for curr in range(1, 40)
+                if self.markov[prev, curr]
+            }
+            for prev in range(1, 40)
+            if self.markov[prev].any()
+        }
+        analysis["markovTop"] = markov_engine.first_order_top(self.markov)
+        if self.second_order_enabled:
+            analysis["markovSecondOrder"] = markov_engine.second_order_top(
+                self.second_order
+            )
+
+        analysis["consecutiveDistribution"] = _ranked(
+            self.consecutive, -self.consecutive_last_seen, list(range(6)), "pairs"
+        )
+
+        endings = np.bincount(
+            np.arange(1, 40) % 10, weights=self.numbers[1:], minlength=10
+        ).astype(np.int64)
+        # Una terminación aparece por primera vez con el primero de sus números.
+        ending_appearance = np.full(10, 40, dtype=np.int64)
+        np.minimum.at(ending_appearance, np.arange(1, 40) % 10, appearance[1:])
+        analysis["endingDistribution"] = _ranked(
+            endings, ending_appearance, list(range(10)), "ending"
+        )
+        analysis["topEndings_list"] = [
+            item["ending"] for item in analysis["endingDistribution"][:5]
+        ]
+        return analysis
+
+
+def sum_statistics(sums):
+    """
+    Resumen de las sumas de los sorteos. Se calcula sobre las sumas ordenadas para
+    que el resultado no dependa del orden de los sorteos (el estado solo guarda el
+    histograma).
+    """
+    sums = np.sort(np.asarray(sums))
+    return {
+        "mean": float(np.mean(sums)),
+        "std": float(np.std(sums)),
+        "min": int(np.min(sums)),
+        "max": int(np.max(sums)),
+        "q25": float(np.percentile(sums, 25)),
+        "q75": float(np.percentile(sums, 75)),
+    }
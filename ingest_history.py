@@ -0,0 +1,242 @@
+# Carga Masiva del Historial desde el CSV Oficial
+#
+# Descripción:
+# Lee el CSV oficial de Melate Retro (columnas CONCURSO, FECHA, F1..F7) fila por
+# fila, valida cada sorteo y sube a Firestore solo los que todavía no están
+# guardados (se compara contra los números de sorteo existentes, no contra el
+# último, para que una carga interrumpida se complete al repetirla). Las
+# escrituras se agrupan en lotes de hasta 500 documentos (límite de Firestore por
+# lote) que se confirman en paralelo, con reintentos y espera exponencial si un
+# lote falla.
+#
+# En la misma pasada se actualiza la caché local del historial (solo con sorteos
+# confirmados en Firestore) y el estado incremental del análisis (ver
+# history_cache.py).
+#
+# Uso:
+#   python ingest_history.py Melate-Retro.csv
+#   python ingest_history.py --local Melate-Retro.csv   (solo caché y estado locales)
+
+import os
+import csv
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import history_cache
+
+# Opcional: con --local la carga solo toca la caché local y no necesita Firebase.
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+except ImportError:
+    firebase_admin = None
+
+# --- CONFIGURACIÓN ---
+FIREBASE_DATABASE_URL = os.environ.get(
+    "FIREBASE_DATABASE_URL", "https://analizadormelateretro-default-rtdb.firebaseio.com"
+)
+APP_ID = os.environ.get("APP_ID", "1:852396148354:web:fc430c9d8ffdb19ce1d69b")
+CREDENTIALS_FILE = "analizadormelateretro-firebase-adminsdk-fbsvc-4129f33301.json"
+
+# --- PARÁMETROS DE LA CARGA ---
+# Firestore acepta como máximo 500 escrituras por lote.
+CHUNK_SIZE = 500
+MAX_WORKERS = 8
+MAX_RETRIES = 5
+RETRY_BASE_SECONDS = 0.5
+
+REQUIRED_COLUMNS = ["CONCURSO", "FECHA", "F1", "F2", "F3", "F4", "F5", "F6"]
+
+
+def get_db_client():
+    """Inicializa la app de Firebase y devuelve el cliente de Firestore."""
+    if firebase_admin is None:
+        raise ImportError("firebase_admin no está instalado; usa la opción --local.")
+    if not firebase_admin._apps:
+        if "FIREBASE_CREDENTIALS" in os.environ:
+            creds_json = json.loads(os.environ["FIREBASE_CREDENTIALS"])
+            cred = credentials.Certificate(creds_json)
+        elif os.path.exists(CREDENTIALS_FILE):
+            cred = credentials.Certificate(CREDENTIALS_FILE)
+        else:
+            raise FileNotFoundError(
+                "No se encontraron credenciales de Firebase. Configura el secreto FIREBASE_CREDENTIALS o el archivo local."
+            )
+        firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DATABASE_URL})
+    return firestore.client()
+
+
+def parse_row(row):
+    """Convierte una fila del CSV al formato de 'results'. Lanza ValueError si no es válida."""
+    sorteo = int(row["CONCURSO"])
+    naturals = [int(row[f"F{j}"]) for j in range(1, 7)]
+    if any(n < 1 or n > 39 for n in naturals) or len(set(naturals)) != 6:
+        raise ValueError(f"números naturales inválidos {naturals}")
+    draw = {"sorteo": sorteo, "FECHA": row["FECHA"].strip()}
+    for j, n in enumerate(sorted(naturals), start=1):
+        draw[f"F{j}"] = n
+    adicional = (row.get("F7") or "").strip()
+    if adicional:
+        adicional = int(adicional)
+        if adicional < 1 or adicional > 39 or adicional in naturals:
+            raise ValueError(f"número adicional inválido {adicional}")
+        draw["F7"] = adicional
+    return draw
+
+
+def read_csv(path, existing):
+    """
+    Lee el CSV en streaming. Devuelve (sorteos válidos, sorteos nuevos, errores);
+    los nuevos son los que no están en 'existing' (números de sorteo ya
+    guardados), sin repetidos.
+    """
+    draws, new_draws, errors, seen = [], [], [], set()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        header = [h.strip() for h in reader.fieldnames or []]
+        missing = [c for c in REQUIRED_COLUMNS if c not in header]
+        if missing:
+            raise ValueError(f"Faltan columnas requeridas en el CSV: {missing}")
+        reader.fieldnames = header
+        for line_number, row in enumerate(reader, start=2):
+            try:
+                draw = parse_row(row)
+            except (TypeError, ValueError) as e:
+                errors.append(f"línea {line_number}: {e}")
+                continue
+            if draw["sorteo"] in seen:
+                continue
+            seen.add(draw["sorteo"])
+            draws.append(draw)
+            if draw["sorteo"] not in existing:
+                new_draws.append(draw)
+    return draws, new_draws, errors
+
+
+def fetch_existing_sorteos(db):
+    """
+    Números de sorteo guardados en Firestore (solo se lee el campo 'sorteo'). Un
+    lote que falló deja un hueco aunque los posteriores se hayan guardado, así
+    que no basta con el último sorteo.
+    """
+    results_ref = db.collection(f"artifacts/{APP_ID}/public/data/results")
+    return {doc.to_dict()["sorteo"] for doc in results_ref.select(["sorteo"]).stream()}
+
+
+def commit_chunk(db, chunk):
+    """Confirma un lote con reintentos y espera exponencial."""
+    results_ref = db.collection(f"artifacts/{APP_ID}/public/data/results")
+    for attempt in range(MAX_RETRIES):
+        try:
+            batch = db.batch()
+            for draw in chunk:
+                batch.set(results_ref.document(str(draw["sorteo"])), draw)
+            batch.commit()
+            return
+        except Exception as e:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            wait = RETRY_BASE_SECONDS * 2**attempt
+            print(f"⚠️  Falló un lote ({e}). Reintentando en {wait:.1f}s...")
+            time.sleep(wait)
+
+
+def upload_draws(db, draws):
+    """Sube los sorteos en lotes paralelos. Devuelve los sorteos confirmados."""
+    chunks = [draws[i : i + CHUNK_SIZE] for i in range(0, len(draws), CHUNK_SIZE)]
+    committed = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(commit_chunk, db, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                future.result()
+                committed.extend(chunk)
+            except Exception as e:
+                print(
+                    f"❌ ERROR: No se pudo guardar el lote de los sorteos "
+                    f"{chunk[0]['sorteo']}-{chunk[-1]['sorteo']}: {e}"
+                )
+    return committed
+
+
+def update_local_state(confirmed, failed_from):
+    """
+    Actualiza la caché del historial con los sorteos 'confirmed' (guardados en
+    Firestore, en esta carga o antes) y el estado incremental con los posteriores
+    a su watermark. Si algún lote falló, el estado solo avanza hasta antes del
+    primer sorteo faltante; la siguiente carga lo completa.
+    """
+    history = history_cache.merge_history(history_cache.load_history(), confirmed)
+    history_cache.save_history(history)
+
+    state = history_cache.AnalysisState.load()
+    added = state.update(
+        d for d in history if failed_from is None or d["sorteo"] < failed_from
+    )
+    state.save()
+    print(
+        f"✅ Caché local: {len(history)} sorteos. Estado del análisis: +{added} "
+        f"sorteos (hasta el {state.watermark})."
+    )
+
+
+def main():
+    args = sys.argv[1:]
+    local = "--local" in args
+    args = [a for a in args if a != "--local"]
+    if len(args) != 1:
+        print("Uso: python ingest_history.py [--local] <archivo.csv>")
+        return
+
+    print("--- Iniciando Carga Masiva del Historial ---")
+    start_time = time.time()
+    if local:
+        existing = {d["sorteo"] for d in history_cache.load_history()}
+        print(f"Sorteos en la caché local: {len(existing)}.")
+    else:
+        try:
+            db = get_db_client()
+        except (FileNotFoundError, ImportError) as e:
+            print(f"❌ ERROR: {e}")
+            return
+        existing = fetch_existing_sorteos(db)
+        print(f"Sorteos en Firestore: {len(existing)}.")
+
+    try:
+        draws, new_draws, errors = read_csv(args[0], existing)
+    except (OSError, ValueError) as e:
+        print(f"❌ ERROR al leer el CSV: {e}")
+        return
+    for error in errors[:20]:
+        print(f"⚠️  Fila descartada, {error}")
+    if len(errors) > 20:
+        print(f"⚠️  ... y {len(errors) - 20} filas inválidas más.")
+    print(f"Filas válidas: {len(draws)}. Nuevas (no guardadas): {len(new_draws)}.")
+
+    new_draws.sort(key=lambda d: d["sorteo"])
+    if local:
+        update_local_state(draws, None)
+        print(f"✅ ¡Éxito! Carga local completada ({time.time() - start_time:.2f}s).")
+        return
+    committed = upload_draws(db, new_draws)
+    committed_ids = {d["sorteo"] for d in committed}
+    missing = [d["sorteo"] for d in new_draws if d["sorteo"] not in committed_ids]
+    failed_from = min(missing) if missing else None
+    print(
+        f"Sorteos guardados en Firestore: {len(committed)}/{len(new_draws)} "
+        f"({time.time() - start_time:.2f}s)."
+    )
+
+    stored = [d for d in draws if d["sorteo"] in existing]
+    update_local_state(stored + committed, failed_from)
+    if missing:
+        print(f"❌ {len(missing)} sorteos no se guardaron. Vuelve a ejecutar la carga.")
+    else:
+        print("✅ ¡Éxito! Carga masiva completada.")
+
+
+if __name__ == "__main__":
+    main()
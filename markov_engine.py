@@ -0,0 +1,90 @@
+# Motor de Transiciones de Markov
+#
+# Descripción:
+# Tablas de transición entre sorteos consecutivos calculadas con productos de
+# matrices one-hot (sorteos x números, el más antiguo primero, con el Adicional):
+#   primer orden:  M[a, c] = veces que un sorteo con 'a' fue seguido de uno con 'c'
+#                  M = X[:-1].T @ X[1:]
+#   segundo orden: S[p, c] = veces que un sorteo con el par p = (a, b) fue seguido
+#                  de uno con 'c'; S = P[:-1].T @ X[1:], con P la matriz one-hot
+#                  de los 741 pares (a < b) de cada sorteo.
+# Un orden mayor es otra matriz one-hot (tríos, ...) con el mismo producto.
+#
+# Las reglas solo usan las transiciones más frecuentes de cada fila. Se calculan
+# una sola vez con 'top_transitions' y se publican en el análisis, así que
+# calificar es buscar en esa tabla en lugar de ordenar los conteos en cada uso.
+
+import numpy as np
+
+MAX_NUMBER = 39
+# Transiciones más frecuentes que se guardan por número (y por par).
+TOP_TRANSITIONS = 5
+# Pares (a < b) de números del 1 al 39 en orden lexicográfico (filas de S).
+PAIRS = np.column_stack(np.triu_indices(MAX_NUMBER, 1)) + 1
+
+
+def draw_matrix(draws):
+    """
+    Matriz one-hot (sorteos x 40) de los números de cada sorteo, incluido el
+    Adicional, en el orden recibido (la columna 0 no se usa).
+    """
+    cells = [
+        (t, d[f"F{j}"])
+        for t, d in enumerate(draws)
+        for j in range(1, 8)
+        if d.get(f"F{j}") is not None
+    ]
+    one_hot = np.zeros((len(draws), MAX_NUMBER + 1), dtype=np.int32)
+    if cells:
+        rows, numbers = np.array(cells).T
+        one_hot[rows, numbers] = 1
+    one_hot[:, 0] = 0
+    return one_hot
+
+
+def pair_matrix(one_hot):
+    """Matriz one-hot (sorteos x 741) de los pares presentes en cada sorteo."""
+    return one_hot[:, PAIRS[:, 0]] * one_hot[:, PAIRS[:, 1]]
+
+
+def transition_matrix(one_hot):
+    """Transiciones de primer orden (40 x 40) entre sorteos consecutivos."""
+    return one_hot[:-1].T @ one_hot[1:]
+
+
+def second_order_matrix(one_hot):
+    """Transiciones de segundo orden (741 pares x 40) entre sorteos consecutivos."""
+    return pair_matrix(one_hot)[:-1].T @ one_hot[1:]
+
+
+def top_transitions(matrix, n=TOP_TRANSITIONS):
+    """
+    Las n columnas con más transiciones de cada fila, de mayor a menor (empates
+    por número menor, como 'most_common' sobre los conteos en orden numérico). Las
+    posiciones sin transiciones quedan en 0.
+    """
+    order = np.argsort(-matrix, axis=1, kind="stable")[:, :n]
+    return np.where(np.take_along_axis(matrix, order, axis=1) > 0, order, 0)
+
+
+def top_table(top, labels):
+    """{etiqueta de la fila: [números]} de las filas con alguna transición."""
+    return {
+        label: [int(c) for c in row if c]
+        for label, row in zip(labels, top.tolist())
+        if any(row)
+    }
+
+
+def first_order_top(matrix, n=TOP_TRANSITIONS):
+    """Top de transiciones de cada número como {"a": [c, ...]}."""
+    top = top_transitions(matrix, n)
+    top[0] = 0
+    return top_table(top, [str(a) for a in range(MAX_NUMBER + 1)])
+
+
+def second_order_top(matrix, n=TOP_TRANSITIONS):
+    """Top de transiciones de cada par como {"a-b": [c, ...]} (solo pares vistos)."""
+    return top_table(
+        top_transitions(matrix, n), [f"{a}-{b}" for a, b in PAIRS.tolist()]
+    )
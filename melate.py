@@ -0,0 +1,272 @@
+# Línea de Comandos Unificada para Melate Retro
+#
+# Descripción:
+# Punto de entrada único para los scripts del proyecto:
+#   python melate.py scrape       [--offline]
+#   python melate.py precompute   [--offline]
+#   python melate.py bruteforce   [--offline] [--profiles | --adicional]
+#   python melate.py findweights  [--offline] [--optimize]
+#   python melate.py rate 3 8 15 22 30 37            [--offline]
+#   python melate.py rank 3,8,15,22,30,37 1,2,3,4,5,6 [--offline]
+#
+# Cada subcomando importa solo los módulos que necesita: Firebase, BeautifulSoup y
+# NumPy se cargan dentro del subcomando, nunca al iniciar. 'rate' y 'rank' usan la
+# ruta escalar de 'rule_registry.py' (sin NumPy), así que con --offline arrancan y
+# responden en unas decenas de milisegundos.
+#
+# Modo --offline: en lugar de Firestore se usan archivos locales.
+#   history_cache.json        -> historial (lo actualizan 'scrape' e 'ingest_history.py')
+#   analysis_latest.json      -> análisis y último sorteo (lo escribe 'precompute')
+#   strategy_weights.json     -> pesos (opcional; por omisión los del registro)
+#   rule_windows.json         -> ventana de cada regla (opcional)
+#   brute_force_suggestions.json -> Top de 'bruteforce'
+# Las rutas se pueden cambiar con las variables de entorno OFFLINE_*_FILE.
+
+import argparse
+import json
+import os
+import sys
+
+ANALYSIS_FILE = os.environ.get("OFFLINE_ANALYSIS_FILE", "analysis_latest.json")
+WEIGHTS_FILE = os.environ.get("OFFLINE_WEIGHTS_FILE", "strategy_weights.json")
+RULE_WINDOWS_FILE = os.environ.get("OFFLINE_RULE_WINDOWS_FILE", "rule_windows.json")
+SUGGESTIONS_FILE = os.environ.get(
+    "OFFLINE_SUGGESTIONS_FILE", "brute_force_suggestions.json"
+)
+
+
+def read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_offline_inputs():
+    """Análisis, último sorteo, pesos y ventanas desde los archivos locales."""
+    import rule_registry
+
+    saved = read_json(ANALYSIS_FILE)
+    if saved is None:
+        raise FileNotFoundError(
+            f"No existe '{ANALYSIS_FILE}'. Ejecuta 'python melate.py precompute "
+            "--offline' primero."
+        )
+    strategy_weights = rule_registry.complete_weights(
+        read_json(WEIGHTS_FILE) or rule_registry.DEFAULT_WEIGHTS
+    )
+    rule_windows = read_json(RULE_WINDOWS_FILE, {})
+    return saved["analysis"], saved["lastDraw"], strategy_weights, rule_windows
+
+
+def load_online_inputs():
+    """Análisis, último sorteo, pesos y ventanas desde Firestore."""
+    import brute_force_analyzer as bfa
+
+    bfa.fetch_data(bfa.get_db_client())
+    return bfa.analysis, bfa.last_draw, bfa.strategy_weights, bfa.rule_windows
+
+
+def parse_combination(text):
+    """'3,8,15,22,30,37' (o separados por espacios) -> lista ordenada de 6 números."""
+    from rule_registry import COMBO_SIZE, MAX_NUMBER
+
+    try:
+        combo = sorted(int(n) for n in text.replace(",", " ").split())
+    except ValueError:
+        raise ValueError(f"Combinación inválida: '{text}'.")
+    if len(combo) != COMBO_SIZE:
+        raise ValueError(f"'{text}' debe tener exactamente {COMBO_SIZE} números.")
+    if combo[0] < 1 or combo[-1] > MAX_NUMBER:
+        raise ValueError(f"Los números de '{text}' deben estar entre 1 y {MAX_NUMBER}.")
+    if len(set(combo)) != COMBO_SIZE:
+        raise ValueError(f"Los números de '{text}' deben ser únicos.")
+    return combo
+
+
+def rate_combinations(combos, offline):
+    """Confianza de cada combinación con la ruta escalar del registro."""
+    import rule_registry
+
+    load_inputs = load_offline_inputs if offline else load_online_inputs
+    analysis, last_draw, strategy_weights, rule_windows = load_inputs()
+    tables = rule_registry.prepare_tables(analysis, last_draw, rule_windows)
+    return [
+        rule_registry.rate_combination(combo, tables, strategy_weights)
+        for combo in combos
+    ]
+
+
+def cmd_scrape(args):
+    import firebase_scraper
+
+    if not args.offline:
+        firebase_scraper.main()
+        return
+    draw = firebase_scraper.fetch_latest_result()
+    if draw is None:
+        return
+    import history_cache
+
+    history = history_cache.merge_history(history_cache.load_history(), [draw])
+    history_cache.save_history(history)
+    state = history_cache.AnalysisState.load()
+    added = state.update(history)
+    state.save()
+    print(
+        f"✅ Caché local: {len(history)} sorteos (+{added} en el estado del análisis)."
+    )
+
+
+def cmd_precompute(args):
+    import precompute_analysis
+
+    if not args.offline:
+        precompute_analysis.main()
+        return
+    import history_cache
+
+    history = history_cache.load_history()
+    if not history:
+        print(
+            f"❌ ERROR: La caché local '{history_cache.HISTORY_CACHE_FILE}' está vacía."
+        )
+        return
+    precompute_analysis.full_history = history
+    precompute_analysis.analysis = {}
+    state = history_cache.AnalysisState.load()
+    state.update(history)
+    precompute_analysis.perform_full_analysis(state).save()
+    write_json(
+        ANALYSIS_FILE,
+        {
+            "analysis": precompute_analysis.sanitize_for_firestore(
+                precompute_analysis.analysis
+            ),
+            "lastDraw": history[0],
+        },
+    )
+    print(f"✅ ¡Éxito! El análisis ha sido guardado en '{ANALYSIS_FILE}'.")
+
+
+def cmd_bruteforce(args):
+    import brute_force_analyzer as bfa
+
+    if not args.offline:
+        if args.profiles:
+            bfa.main_profiles()
+        elif args.adicional:
+            bfa.main_adicional()
+        else:
+            bfa.main_brute_force()
+        return
+    if args.profiles or args.adicional:
+        print("❌ ERROR: Los modos --profiles y --adicional requieren Firestore.")
+        return
+
+    inputs = load_offline_inputs()
+    bfa.analysis, bfa.last_draw, bfa.strategy_weights, bfa.rule_windows = inputs
+    sorteo_sugerido_para = bfa.last_draw["sorteo"] + 1
+    print(f"Calculando ranking para el sorteo: {sorteo_sugerido_para}.")
+    combos, confidences = bfa.rank_all_combinations()
+    write_json(
+        SUGGESTIONS_FILE,
+        [
+            {
+                "sorteo_sugerido_para": sorteo_sugerido_para,
+                "combination": [int(n) for n in combo],
+                "confidence": float(confidence),
+                "rank": i + 1,
+            }
+            for i, (combo, confidence) in enumerate(zip(combos, confidences))
+        ],
+    )
+    print(f"✅ ¡Éxito! Top {len(combos)} guardado en '{SUGGESTIONS_FILE}'.")
+
+
+def cmd_findweights(args):
+    import weight_finder_brute_force as wf
+
+    history = current_weights = None
+    if args.offline:
+        import history_cache
+
+        history = history_cache.load_history()
+        current_weights = read_json(WEIGHTS_FILE)
+    if args.optimize:
+        wf.main_optimizer(history, current_weights)
+    else:
+        wf.main_weight_finder(history)
+
+
+def cmd_rate(args):
+    combo = parse_combination(" ".join(args.numbers))
+    (confidence,) = rate_combinations([combo], args.offline)
+    print(f"{json.dumps(combo)}: {confidence:.2f}%")
+
+
+def cmd_rank(args):
+    texts = args.combinations or [line for line in sys.stdin if line.strip()]
+    combos = [parse_combination(text) for text in texts]
+    confidences = rate_combinations(combos, args.offline)
+    ranked = sorted(zip(combos, confidences), key=lambda x: x[1], reverse=True)
+    for i, (combo, confidence) in enumerate(ranked):
+        print(f"{i + 1:>3}. {json.dumps(combo)}: {confidence:.2f}%")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="melate.py", description="Herramientas de análisis de Melate Retro."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def command(name, handler, help):
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument(
+            "--offline",
+            action="store_true",
+            help="usar archivos locales en lugar de Firestore",
+        )
+        sub.set_defaults(handler=handler)
+        return sub
+
+    command("scrape", cmd_scrape, "obtener el último resultado publicado")
+    command("precompute", cmd_precompute, "calcular el análisis estadístico")
+    bruteforce = command("bruteforce", cmd_bruteforce, "calificar todo el espacio")
+    mode = bruteforce.add_mutually_exclusive_group()
+    mode.add_argument("--profiles", action="store_true", help="Top por perfil")
+    mode.add_argument("--adicional", action="store_true", help="ranking 6+1")
+    findweights = command("findweights", cmd_findweights, "buscar pesos ideales")
+    findweights.add_argument(
+        "--optimize", action="store_true", help="evolución diferencial walk-forward"
+    )
+    rate = command("rate", cmd_rate, "calificar una combinación")
+    rate.add_argument("numbers", nargs="+", help="6 números (p. ej. 3 8 15 22 30 37)")
+    rank = command("rank", cmd_rank, "ordenar combinaciones por confianza")
+    rank.add_argument(
+        "combinations",
+        nargs="*",
+        help="combinaciones '3,8,15,22,30,37' (sin argumentos: una por línea)",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except (FileNotFoundError, ImportError, ValueError) as e:
+        print(f"❌ ERROR: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,13 +8,22 @@
 #
 # Autor: Gemini (Google AI) - Versión Corregida y Sanitizada
 
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
 import json
-from itertools import combinations
 import numpy as np
-from collections import Counter
+
+import analysis_codec
+import history_cache
+import markov_engine
+import rule_registry
+
+# Opcional: sin Firebase el análisis se calcula sobre la caché local del historial
+# ('python melate.py precompute --offline').
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+except ImportError:
+    firebase_admin = None
 
 # --- CONFIGURACIÓN ---
 FIREBASE_DATABASE_URL = os.environ.get(
@@ -23,11 +32,18 @@ FIREBASE_DATABASE_URL = os.environ.get(
 APP_ID = os.environ.get("APP_ID", "1:852396148354:web:fc430c9d8ffdb19ce1d69b")
 CREDENTIALS_FILE = "analizadormelateretro-firebase-adminsdk-fbsvc-4129f33301.json"
 
+# Ventanas de sorteos recientes y vida media (en sorteos) del decaimiento exponencial
+# para las estadísticas publicadas en analysis["windows"].
+WINDOW_SIZES = [50, 100, 500]
+DECAY_HALF_LIFE = 100
+
 analysis = {}
 full_history = []
 
 
 def get_db_client():
+    if firebase_admin is None:
+        raise ImportError("firebase_admin no está instalado; usa el modo --offline.")
     if not firebase_admin._apps:
         if "FIREBASE_CREDENTIALS" in os.environ:
             creds_json = json.loads(os.environ["FIREBASE_CREDENTIALS"])
@@ -49,142 +65,188 @@ def fetch_data(db):
     print(f"Se cargaron {len(full_history)} sorteos.")
 
 
-def perform_full_analysis():
-    global analysis
+def perform_full_analysis(state=None):
+    """
+    Análisis completo de 'full_history'. Las secciones del histórico completo
+    salen de los conteos acumulados de 'state' (history_cache.AnalysisState), que
+    solo se reconstruye si no cubre exactamente el historial; las ventanas se
+    calculan sobre el historial. Devuelve el estado usado.
+    """
     print("Realizando análisis estadístico completo...")
+    if state is None or not state.covers(full_history):
+        state = history_cache.AnalysisState()
+        state.update(full_history)
+    analysis.update(state.to_analysis())
+    analysis["windows"] = compute_windowed_statistics()
 
-    all_numbers = [
-        num
-        for draw in full_history
-        for num in [draw.get(f"F{j}") for j in range(1, 8)]
-        if num is not None
-    ]
+    print("Análisis completado.")
+    return state
 
-    freq_counts = Counter(all_numbers)
-    analysis["frequencies"] = sorted(
-        [{"number": int(num), "frequency": freq} for num, freq in freq_counts.items()],
-        key=lambda x: x["frequency"],
-        reverse=True,
+
+def rule_analysis(history):
+    """
+    Versión ligera del análisis para calificar con muchos historiales distintos
+    (la validación walk-forward de 'weight_finder_brute_force.py'): solo los
+    campos del histórico completo que declaran las reglas en 'inputs', sin
+    ventanas ni transiciones de segundo orden.
+    """
+    fields = {
+        field
+        for rule in rule_registry.RULES + rule_registry.ADICIONAL_RULES
+        for field in rule.inputs
+    }
+    state = history_cache.AnalysisState(second_order=False)
+    state.update(history)
+    return {
+        field: value for field, value in state.to_analysis().items() if field in fields
+    }
+
+
+def compute_windowed_statistics():
+    """
+    Calcula las mismas estadísticas del análisis (frecuencias, atrasos, pares,
+    Markov, terminaciones y distribuciones) para los últimos N sorteos de cada
+    ventana en WINDOW_SIZES y con ponderación de decaimiento exponencial.
+
+    Todo sale de una sola pasada: cada sorteo se convierte en un vector de conteos
+    (one-hot de números, matriz de pares, matriz de transición desde el sorteo
+    anterior y one-hot de sus patrones). La suma acumulada de esos vectores da
+    cualquier ventana como una resta, y el decaimiento es un producto punto. El
+    atraso no es un conteo: en cada ventana es el del histórico limitado a N (un
+    número ausente en la ventana tiene atraso N); el decaimiento usa el completo.
+    """
+    history = full_history[::-1]  # Cronológico: el más antiguo primero.
+    n_draws = len(history)
+
+    one_hot = markov_engine.draw_matrix(history)
+    naturals = np.sort(
+        np.array([[d[f"F{j}"] for j in range(1, 7)] for d in history], dtype=np.int32),
+        axis=1,
+    ).reshape(n_draws, 6)
+
+    pairs = np.triu(one_hot[:, :, None] * one_hot[:, None, :], k=1)
+    markov = np.zeros((n_draws, 40, 40), dtype=np.int32)
+    markov[1:] = one_hot[:-1, :, None] * one_hot[1:, None, :]
+
+    evens = (naturals % 2 == 0).sum(axis=1)
+    consecutive = (np.diff(naturals, axis=1) == 1).sum(axis=1)
+    decades = np.stack([(naturals // 10 == k).sum(axis=1) for k in range(4)], axis=1)
+    tens_patterns, tens_index = np.unique(
+        -np.sort(-decades, axis=1), axis=0, return_inverse=True
     )
+    tens_index = tens_index.reshape(-1)
+    sums = naturals.sum(axis=1).astype(np.float64)
+
+    # Vector de conteos por sorteo; las secciones se recortan después con 'layout'.
+    sections = [
+        ("numbers", one_hot),
+        ("pairs", pairs.reshape(n_draws, -1)),
+        ("markov", markov.reshape(n_draws, -1)),
+        ("evens", np.eye(7)[evens]),
+        ("consecutive", np.eye(6)[consecutive]),
+        ("tens", np.eye(len(tens_patterns))[tens_index]),
+        ("sums", np.stack([np.ones(n_draws), sums, sums**2], axis=1)),
+    ]
+    layout, start = {}, 0
+    for name, block in sections:
+        layout[name] = slice(start, start + block.shape[1])
+        start += block.shape[1]
+    per_draw = np.concatenate([block for _, block in sections], axis=1)
+
+    cumulative = np.zeros((n_draws + 1, per_draw.shape[1]), dtype=np.float64)
+    np.cumsum(per_draw, axis=0, out=cumulative[1:])
+
+    totals = {}
+    for size in WINDOW_SIZES:
+        if size < n_draws:
+            totals[f"last{size}"] = cumulative[-1] - cumulative[-1 - size]
+    ages = np.arange(n_draws)[::-1]
+    totals["decay"] = (0.5 ** (ages / DECAY_HALF_LIFE)) @ per_draw
 
-    last_draw_num = full_history[0]["sorteo"]
-    lags = {
-        num: last_draw_num
-        - next(
-            (
-                d["sorteo"]
-                for d in full_history
-                if num
-                in [d.get(f"F{j}") for j in range(1, 8) if d.get(f"F{j}") is not None]
-            ),
-            last_draw_num - len(full_history),
+    # Sorteos desde la última aparición de cada número (n_draws si nunca salió).
+    seen = one_hot[::-1].astype(bool)
+    lags = np.where(seen.any(axis=0), seen.argmax(axis=0), n_draws)
+    caps = {name: int(name[4:]) for name in totals if name.startswith("last")}
+
+    tens_labels = ["-".join(map(str, p)) for p in tens_patterns]
+    return {
+        name: _window_statistics(
+            vector,
+            layout,
+            tens_labels,
+            name == "decay",
+            np.minimum(lags, caps.get(name, n_draws)),
         )
-        for num in range(1, 40)
+        for name, vector in totals.items()
     }
-    analysis["lags"] = sorted(
-        [{"number": num, "lag": lag_val} for num, lag_val in lags.items()],
+
+
+def _window_statistics(vector, layout, tens_labels, weighted, lags):
+    """Convierte un vector de conteos agregado en el formato de 'analysis'."""
+
+    def value(x):
+        return round(float(x), 4) if weighted else int(round(x))
+
+    numbers = vector[layout["numbers"]]
+    pairs = vector[layout["pairs"]].reshape(40, 40)
+    markov = vector[layout["markov"]].reshape(40, 40)
+
+    stats = {}
+    stats["frequencies"] = sorted(
+        [{"number": n, "frequency": value(numbers[n])} for n in range(1, 40)],
+        key=lambda x: x["frequency"],
+        reverse=True,
+    )
+    stats["lags"] = sorted(
+        [{"number": n, "lag": int(lags[n])} for n in range(1, 40)],
         key=lambda x: x["lag"],
         reverse=True,
     )
 
-    all_pairs = [
-        pair
-        for d in full_history
-        for pair in combinations(
-            sorted([d.get(f"F{j}") for j in range(1, 8) if d.get(f"F{j}") is not None]),
-            2,
-        )
-    ]
-    pair_counts = Counter(all_pairs)
-    analysis["topPairs"] = [
-        {"pair": list(p), "count": c} for p, c in pair_counts.most_common(10)
-    ]
-    # CORRECCIÓN: Convertir la lista de pares a una lista de strings JSON para evitar arrays anidados
-    analysis["topPairsSet_list"] = [
-        json.dumps(sorted(list(p))) for p, c in pair_counts.most_common(20)
+    pair_order = np.argsort(-pairs, axis=None, kind="stable")[:20]
+    stats["topPairsSet_list"] = [
+        json.dumps(sorted(int(x) for x in np.unravel_index(i, pairs.shape)))
+        for i in pair_order
     ]
 
-    # CORRECCIÓN: Convertir distribuciones a un formato de lista de objetos
-    odd_even_counts = Counter(
-        f"{sum(1 for n in [d[f'F{j}'] for j in range(1, 7)] if n % 2 == 0)}P-{sum(1 for n in [d[f'F{j}'] for j in range(1, 7)] if n % 2 != 0)}I"
-        for d in full_history
-    )
-    analysis["oddEvenDistribution"] = [
-        {"dist": item[0], "count": item[1]}
-        for item in sorted(odd_even_counts.items(), key=lambda x: x[1], reverse=True)
-    ]
+    stats["markovTransitions"] = {
+        str(prev): {
+            str(curr): value(markov[prev, curr])
+            for curr in range(1, 40)
+            if markov[prev, curr] > 0
+        }
+        for prev in range(1, 40)
+        if markov[prev].any()
+    }
+    stats["markovTop"] = markov_engine.first_order_top(markov)
 
-    def get_tens_dist_str(combo):
-        tens = [0, 0, 0, 0]
-        for n in combo:
-            if n <= 9:
-                tens[0] += 1
-            elif n <= 19:
-                tens[1] += 1
-            elif n <= 29:
-                tens[2] += 1
-            else:
-                tens[3] += 1
-        return "-".join(map(str, sorted(tens, reverse=True)))
-
-    tens_counts = Counter(
-        get_tens_dist_str([d[f"F{j}"] for j in range(1, 7)]) for d in full_history
-    )
-    analysis["tensDistribution"] = [
-        {"dist": item[0], "count": item[1]}
-        for item in sorted(tens_counts.items(), key=lambda x: x[1], reverse=True)
-    ]
+    endings = np.bincount(np.arange(1, 40) % 10, weights=numbers[1:], minlength=10)
+    stats["topEndings_list"] = [int(e) for e in np.argsort(-endings, kind="stable")[:5]]
 
-    sums = [sum([d[f"F{j}"] for j in range(1, 7)]) for d in full_history]
-    analysis["sumAnalysis"] = {
-        "mean": float(np.mean(sums)),
-        "std": float(np.std(sums)),
-        "min": int(np.min(sums)),
-        "max": int(np.max(sums)),
-        "q25": float(np.percentile(sums, 25)),
-        "q75": float(np.percentile(sums, 75)),
-    }
+    def distribution(counts, label_key, labels):
+        items = [(labels[i], counts[i]) for i in range(len(counts)) if counts[i] > 0]
+        return [
+            {label_key: label, "count": value(c)}
+            for label, c in sorted(items, key=lambda x: x[1], reverse=True)
+        ]
 
-    markov = {}
-    history_reversed = full_history[::-1]
-    for i in range(len(history_reversed) - 1):
-        prev_draw_nums = {
-            history_reversed[i].get(f"F{j}")
-            for j in range(1, 8)
-            if history_reversed[i].get(f"F{j}") is not None
-        }
-        curr_draw_nums = {
-            history_reversed[i + 1].get(f"F{j}")
-            for j in range(1, 8)
-            if history_reversed[i + 1].get(f"F{j}") is not None
-        }
-        for prev_num in prev_draw_nums:
-            markov.setdefault(str(prev_num), Counter()).update(curr_draw_nums)
-    analysis["markovTransitions"] = {k: dict(v) for k, v in markov.items()}
-
-    consecutive_counts = Counter(
-        sum(
-            1
-            for i in range(5)
-            if sorted([d[f"F{j}"] for j in range(1, 7)])[i + 1]
-            - sorted([d[f"F{j}"] for j in range(1, 7)])[i]
-            == 1
-        )
-        for d in full_history
+    stats["oddEvenDistribution"] = distribution(
+        vector[layout["evens"]], "dist", [f"{e}P-{6 - e}I" for e in range(7)]
+    )
+    stats["tensDistribution"] = distribution(
+        vector[layout["tens"]], "dist", tens_labels
+    )
+    stats["consecutiveDistribution"] = distribution(
+        vector[layout["consecutive"]], "pairs", list(range(6))
     )
-    analysis["consecutiveDistribution"] = [
-        {"pairs": item[0], "count": item[1]}
-        for item in sorted(consecutive_counts.items(), key=lambda x: x[1], reverse=True)
-    ]
-
-    ending_counts = Counter(n % 10 for n in all_numbers)
-    analysis["endingDistribution"] = [
-        {"ending": item[0], "count": item[1]}
-        for item in sorted(ending_counts.items(), key=lambda x: x[1], reverse=True)
-    ]
-    analysis["topEndings_list"] = [item[0] for item in ending_counts.most_common(5)]
 
-    print("Análisis completado.")
+    weight, total, total_sq = vector[layout["sums"]]
+    mean = total / weight
+    stats["sumAnalysis"] = {
+        "mean": float(mean),
+        "std": float(np.sqrt(max(total_sq / weight - mean**2, 0.0))),
+    }
+    return stats
 
 
 def sanitize_for_firestore(data):
@@ -205,13 +267,23 @@ def save_analysis(db):
     print("Sanitizando datos para Firestore...")
     sanitized_analysis = sanitize_for_firestore(analysis)
 
+    # El documento guarda el análisis empaquetado (ver analysis_codec.py) en un
+    # solo campo de bytes en lugar de mapas anidados.
+    packed = analysis_codec.encode_analysis(sanitized_analysis)
+    print(f"Análisis empaquetado: {len(packed) / 1024:.1f} KB.")
+    document = {
+        "packed": packed,
+        "packedVersion": analysis_codec.FORMAT_VERSION,
+        "timestamp": firestore.SERVER_TIMESTAMP,
+    }
+
     print("Guardando análisis pre-calculado en Firestore...")
     analysis_doc_ref = db.collection(
         f"artifacts/{APP_ID}/public/data/analysis"
     ).document("latest")
 
     try:
-        analysis_doc_ref.set(sanitized_analysis)
+        analysis_doc_ref.set(document)
         print("✅ ¡Éxito! El análisis ha sido guardado en 'analysis/latest'.")
     except Exception as e:
         print(f"❌ ERROR al guardar el análisis: {e}")
@@ -223,7 +295,12 @@ def main():
     if not full_history:
         print("No hay datos para analizar.")
         return
-    perform_full_analysis()
+    # El estado local solo agrega los sorteos nuevos; si no corresponde al
+    # historial de Firestore, 'perform_full_analysis' lo reconstruye.
+    state = history_cache.AnalysisState.load()
+    state.update(full_history)
+    state = perform_full_analysis(state)
+    state.save()
     save_analysis(db)
 
 
@@ -0,0 +1,580 @@
+# Registro Declarativo de Reglas de Calificación
+#
+# Descripción:
+# Cada regla se declara una sola vez como una especificación ('Rule'):
+#   - inputs:      campos del análisis que lee (se resuelven con la ventana que
+#                  indique 'rule_windows' para esa regla);
+#   - prepare:     convierte esos campos (y el último sorteo) en una tabla pequeña
+#                  de listas y números;
+#   - feature:     la característica de la combinación que necesita (ver FEATURES);
+#   - numerator:   convierte la característica en un "numerador" entero. La
+#                  fracción que aporta la regla es numerador / denominador.
+#
+# Los numeradores solo usan aritmética, comparaciones e indexación, así que la misma
+# función sirve para un entero (la ruta escalar de referencia de este módulo, sin
+# NumPy) y para un arreglo (el kernel vectorizado que compila 'scoring_engine.py').
+# Agregar una regla es declararla aquí con 'register'; el motor, el script de fuerza
+# bruta y el buscador de pesos la recogen sin cambios. Solo una característica nueva
+# requiere su versión escalar (FEATURES) y su versión vectorizada en el motor.
+#
+# Características (todas sobre la combinación ordenada):
+#   sum, evens, tens_code, consecutive -> estructurales: no dependen de la tabla
+#       (el motor las evalúa por clase de equivalencia).
+#   ending_hits   -> números cuyo dígito final está marcado en table["digits"] (10).
+#   number_counts -> por cada vector de table["vectors"] (indexados por número,
+#       0..39), la suma de sus valores sobre los 6 números. El motor reúne los
+#       vectores de todas las reglas en una sola matriz y los suma de una vez.
+#   pair_hits     -> suma de table["pairs"][a][b] sobre los 15 pares a < b.
+#
+# Entradas: 'prepare' recibe cada campo ya en la forma compacta que usan las reglas,
+# la misma que guardan los arreglos de 'analysis_codec.py':
+#   tablas (frequencies, lags, ...) -> lista de etiquetas en el orden publicado
+#       (número, pares en 'oddEvenDistribution', código base 7 de las decenas,
+#       consecutivos o terminación);
+#   topPairsSet_list -> lista de pares [a, b] con a < b;
+#   markovTransitions -> matriz 40 x 40 de conteos; markovTop -> lista de 40 listas.
+# Un análisis empaquetado ('analysis_codec.PackedAnalysis') entrega esos campos
+# directamente de sus arreglos; el diccionario de análisis (JSON, caché local o
+# documentos anteriores) se convierte con 'rule_inputs'.
+
+from itertools import combinations
+import json
+
+MAX_NUMBER = 39
+COMBO_SIZE = 6
+# Patrón de decenas (conteos ordenados de mayor a menor) codificado en base 7.
+TENS_CODES = 7**4
+
+
+class Rule:
+    """Especificación declarativa de una regla de calificación."""
+
+    def __init__(
+        self,
+        key,
+        label,
+        denominator,
+        default_weight,
+        inputs,
+        feature,
+        prepare,
+        numerator,
+    ):
+        self.key = key
+        self.label = label
+        self.denominator = denominator
+        self.default_weight = default_weight
+        self.inputs = tuple(inputs)
+        self.feature = feature
+        self.prepare = prepare
+        self.numerator = numerator
+
+    def __repr__(self):
+        return f"Rule({self.key!r}, feature={self.feature!r})"
+
+
+# --- CARACTERÍSTICAS (ruta escalar) ---
+
+
+def tens_code(combo):
+    """Codifica el patrón de decenas de la combinación ('3-2-1-0') en base 7."""
+    tens = [0, 0, 0, 0]
+    for n in combo:
+        tens[min(n // 10, 3)] += 1
+    tens.sort(reverse=True)
+    return ((tens[0] * 7 + tens[1]) * 7 + tens[2]) * 7 + tens[3]
+
+
+def parse_tens_code(dist_str):
+    """Código en base 7 de un patrón de decenas escrito como '3-2-1-0'."""
+    code = 0
+    for part in dist_str.split("-"):
+        code = code * 7 + int(part)
+    return code
+
+
+FEATURES = {
+    "sum": lambda combo, table: sum(combo),
+    "evens": lambda combo, table: sum(1 for n in combo if n % 2 == 0),
+    "tens_code": lambda combo, table: tens_code(combo),
+    "consecutive": lambda combo, table: sum(
+        1 for i in range(len(combo) - 1) if combo[i + 1] - combo[i] == 1
+    ),
+    "ending_hits": lambda combo, table: sum(table["digits"][n % 10] for n in combo),
+    "number_counts": lambda combo, table: tuple(
+        sum(vector[n] for n in combo) for vector in table["vectors"]
+    ),
+    "pair_hits": lambda combo, table: sum(
+        table["pairs"][a][b] for a, b in combinations(combo, 2)
+    ),
+}
+# Características que solo dependen de la combinación (no de la tabla).
+STRUCTURAL_FEATURES = ["sum", "evens", "tens_code", "consecutive"]
+
+RULES = []
+
+
+def register(rule):
+    """Agrega una regla al registro (el orden de registro es el orden de suma)."""
+    if rule.feature not in FEATURES:
+        raise ValueError(f"Característica desconocida '{rule.feature}'.")
+    if any(r.key == rule.key for r in RULES):
+        raise ValueError(f"La regla '{rule.key}' ya está registrada.")
+    RULES.append(rule)
+    return rule
+
+
+# --- AUXILIARES DE LAS REGLAS ---
+
+
+def _number_vector(numbers):
+    vector = [0] * (MAX_NUMBER + 1)
+    for n in numbers:
+        vector[int(n)] = 1
+    return vector
+
+
+def _top_points(labels, top, size):
+    """Puntos por etiqueta: 2 para la más frecuente, 1 para las demás del top."""
+    points = [0] * size
+    for position, label in reversed(list(enumerate(labels[:top]))):
+        points[label] = 2 if position == 0 else 1
+    return points
+
+
+def _balance(first, second):
+    """8 - (|a-2| + |b-2| + |medio-2|), es decir, 8 * la fracción de balance."""
+    medium = COMBO_SIZE - first - second
+    return 8 - (abs(first - 2) + abs(second - 2) + abs(medium - 2))
+
+
+def _parse_pair(p):
+    return sorted(json.loads(p) if isinstance(p, str) else p)
+
+
+def _prepare_sum(data, last_draw):
+    sum_analysis = data["sumAnalysis"]
+    return {
+        "mean": sum_analysis["mean"],
+        "near": 0.75 * sum_analysis["std"],
+        "far": 1.5 * sum_analysis["std"],
+    }
+
+
+def _sum_numerator(value, table):
+    # 2 dentro de 0.75 desviaciones, 1 dentro de 1.5 y 0 fuera.
+    deviation = abs(value - table["mean"])
+    return 1 * (deviation < table["near"]) + 1 * (deviation < table["far"])
+
+
+def _prepare_odd_even(data, last_draw):
+    return {"points": _top_points(data["oddEvenDistribution"], 3, COMBO_SIZE + 1)}
+
+
+def _prepare_frequency_mix(data, last_draw):
+    freqs = data["frequencies"]
+    return {"vectors": [_number_vector(freqs[-13:]), _number_vector(freqs[:13])]}
+
+
+def _prepare_lag_mix(data, last_draw):
+    lags = data["lags"]
+    return {"vectors": [_number_vector(lags[:13]), _number_vector(lags[-13:])]}
+
+
+def _prepare_tens(data, last_draw):
+    return {"points": _top_points(data["tensDistribution"], 3, TENS_CODES)}
+
+
+def _prepare_pairs(data, last_draw):
+    pairs = [[0] * (MAX_NUMBER + 1) for _ in range(MAX_NUMBER + 1)]
+    for a, b in data["topPairsSet_list"] or []:
+        pairs[a][b] = 1
+    return {"pairs": pairs}
+
+
+def _markov_top(data):
+    """
+    Las 5 transiciones más frecuentes de cada número. El análisis las publica ya
+    calculadas ('markovTop', ver 'markov_engine.py'); para análisis anteriores se
+    ordenan los conteos (empates por número menor).
+    """
+    if data.get("markovTop") is not None:
+        return data["markovTop"]
+    return [
+        [c for c in sorted(range(MAX_NUMBER + 1), key=lambda c: -row[c])[:5] if row[c]]
+        for row in data["markovTransitions"]
+        or [[0] * (MAX_NUMBER + 1)] * (MAX_NUMBER + 1)
+    ]
+
+
+def _prepare_markov(data, last_draw):
+    # Cada número del último sorteo aporta sus 5 transiciones más frecuentes.
+    markov = [0] * (MAX_NUMBER + 1)
+    markov_top = _markov_top(data)
+    last_draw_nums = {
+        last_draw.get(f"F{j}")
+        for j in range(1, 8)
+        if last_draw.get(f"F{j}") is not None
+    }
+    for prev_num in last_draw_nums:
+        for curr in markov_top[int(prev_num)]:
+            markov[curr] += 1
+    return {"vectors": [markov]}
+
+
+def _prepare_consecutive(data, last_draw):
+    top = data["consecutiveDistribution"][:2]
+    return {"points": [1 if c in top else 0 for c in range(COMBO_SIZE)]}
+
+
+def _prepare_endings(data, last_draw):
+    top_endings = set(data["topEndings_list"] or [])
+    return {"digits": [1 if d in top_endings else 0 for d in range(10)]}
+
+
+# --- LAS 9 REGLAS ---
+
+register(
+    Rule(
+        "suma_rango",
+        "Suma en Rango",
+        2,
+        15,
+        ["sumAnalysis"],
+        "sum",
+        _prepare_sum,
+        _sum_numerator,
+    )
+)
+register(
+    Rule(
+        "dist_par_impar",
+        "Distribución Par/Impar",
+        2,
+        15,
+        ["oddEvenDistribution"],
+        "evens",
+        _prepare_odd_even,
+        lambda value, table: table["points"][value],
+    )
+)
+register(
+    Rule(
+        "mix_frecuencia",
+        "Mix de Frecuencia",
+        8,
+        10,
+        ["frequencies"],
+        "number_counts",
+        _prepare_frequency_mix,
+        lambda value, table: _balance(value[0], value[1]),
+    )
+)
+register(
+    Rule(
+        "mix_atraso",
+        "Mix de Atraso (Granular)",
+        8,
+        10,
+        ["lags"],
+        "number_counts",
+        _prepare_lag_mix,
+        lambda value, table: _balance(value[0], value[1]),
+    )
+)
+register(
+    Rule(
+        "decenas_distribucion",
+        "Distribución de Decenas",
+        2,
+        10,
+        ["tensDistribution"],
+        "tens_code",
+        _prepare_tens,
+        lambda value, table: table["points"][value],
+    )
+)
+register(
+    Rule(
+        "pares_frecuentes",
+        "Pares Frecuentes",
+        6,
+        10,
+        ["topPairsSet_list"],
+        "pair_hits",
+        _prepare_pairs,
+        lambda value, table: value,
+    )
+)
+register(
+    Rule(
+        "prediccion_markov",
+        "Predicción Markov",
+        30,
+        15,
+        ["markovTransitions", "markovTop"],
+        "number_counts",
+        _prepare_markov,
+        lambda value, table: value[0],
+    )
+)
+register(
+    Rule(
+        "consecutivos",
+        "Consecutivos",
+        1,
+        10,
+        ["consecutiveDistribution"],
+        "consecutive",
+        _prepare_consecutive,
+        lambda value, table: table["points"][value],
+    )
+)
+register(
+    Rule(
+        "terminaciones",
+        "Terminaciones",
+        6,
+        5,
+        ["topEndings_list"],
+        "ending_hits",
+        _prepare_endings,
+        lambda value, table: value,
+    )
+)
+
+RULE_KEYS = [rule.key for rule in RULES]
+DEFAULT_WEIGHTS = {rule.key: rule.default_weight for rule in RULES}
+
+
+def complete_weights(strategy_weights):
+    """
+    Pesos guardados (config/strategyWeights, un perfil o strategy_weights.json)
+    con todas las reglas: una regla omitida pesa 0, igual que en la app. Los
+    pesos por defecto solo se usan cuando no hay ningún documento de pesos.
+    """
+    return {**dict.fromkeys(RULE_KEYS, 0), **strategy_weights}
+
+
+# --- REGLAS DEL NÚMERO ADICIONAL (modo 6+1) ---
+# Califican al candidato a número adicional 'a' de un boleto de 6 números, para
+# los premios que incluyen el adicional. Se suman a las 9 reglas del boleto.
+# Características:
+#   adicional       -> el propio número a (las tablas se indexan por número).
+#   adicional_pairs -> pares principales (table["pairs"], simétrica) entre a y
+#                      los 6 números del boleto.
+
+ADICIONAL_FEATURES = {
+    "adicional": lambda combo, adicional, table: adicional,
+    "adicional_pairs": lambda combo, adicional, table: sum(
+        table["pairs"][n][adicional] for n in combo
+    ),
+}
+ADICIONAL_RULES = []
+
+
+def register_adicional(rule):
+    """Agrega una regla del número adicional (mismo formato que 'register')."""
+    if rule.feature not in ADICIONAL_FEATURES:
+        raise ValueError(f"Característica desconocida '{rule.feature}'.")
+    if any(r.key == rule.key for r in RULES + ADICIONAL_RULES):
+        raise ValueError(f"La regla '{rule.key}' ya está registrada.")
+    ADICIONAL_RULES.append(rule)
+    return rule
+
+
+def _prepare_adicional_frequency(data, last_draw):
+    # Tercio más frecuente como adicional: 2; tercio medio: 1; el resto: 0.
+    points = [0] * (MAX_NUMBER + 1)
+    for position, number in enumerate(data["adicionalFrequencies"] or []):
+        points[number] = 2 - min(position // 13, 2)
+    return {"points": points}
+
+
+def _prepare_adicional_pairs(data, last_draw):
+    pairs = _prepare_pairs(data, last_draw)["pairs"]
+    for a in range(MAX_NUMBER + 1):
+        for b in range(a):
+            pairs[a][b] = pairs[b][a]
+    return {"pairs": pairs}
+
+
+def _prepare_adicional_markov(data, last_draw):
+    return {"points": _prepare_markov(data, last_draw)["vectors"][0]}
+
+
+register_adicional(
+    Rule(
+        "adicional_frecuencia",
+        "Frecuencia como Adicional",
+        2,
+        10,
+        ["adicionalFrequencies"],
+        "adicional",
+        _prepare_adicional_frequency,
+        lambda value, table: table["points"][value],
+    )
+)
+register_adicional(
+    Rule(
+        "adicional_pares",
+        "Pares con el Boleto",
+        6,
+        5,
+        ["topPairsSet_list"],
+        "adicional_pairs",
+        _prepare_adicional_pairs,
+        lambda value, table: value,
+    )
+)
+register_adicional(
+    Rule(
+        "adicional_markov",
+        "Predicción Markov del Adicional",
+        # Un punto por cada número del último sorteo (hasta 7) que lo predice.
+        7,
+        5,
+        ["markovTransitions", "markovTop"],
+        "adicional",
+        _prepare_adicional_markov,
+        lambda value, table: table["points"][value],
+    )
+)
+
+ADICIONAL_KEYS = [rule.key for rule in ADICIONAL_RULES]
+DEFAULT_ADICIONAL_WEIGHTS = {rule.key: rule.default_weight for rule in ADICIONAL_RULES}
+
+
+# --- RUTA ESCALAR DE REFERENCIA ---
+
+# Pares (regla, ventana) ya avisados por 'rule_source'.
+_unserved_windows = set()
+
+
+def rule_source(analysis, rule_windows, rule):
+    """
+    Sección del análisis de la que lee una regla: la ventana configurada en
+    'rule_windows' (p. ej. "last100" o "decay") si existe y contiene TODOS los
+    campos de 'rule.inputs', o el histórico completo en caso contrario. Todos los
+    campos de una regla salen de la misma sección para no mezclar historiales.
+    Si la ventana configurada no existe o le faltan campos se avisa una vez.
+    """
+    name = (rule_windows or {}).get(rule.key)
+    if not name:
+        return analysis
+    window = analysis.get("windows", {}).get(name)
+    missing = [field for field in rule.inputs if window is None or field not in window]
+    if not missing:
+        return window
+    if (rule.key, name) not in _unserved_windows:
+        _unserved_windows.add((rule.key, name))
+        reason = f"faltan {missing}" if window is not None else "no existe"
+        print(
+            f"⚠️  La regla '{rule.key}' no puede usar la ventana '{name}' "
+            f"({reason}); se usa el histórico completo."
+        )
+    return analysis
+
+
+# Etiqueta de cada elemento de las tablas del análisis (en el orden publicado).
+_TABLE_LABELS = {
+    "frequencies": lambda item: int(item["number"]),
+    "adicionalFrequencies": lambda item: int(item["number"]),
+    "lags": lambda item: int(item["number"]),
+    "oddEvenDistribution": lambda item: int(item["dist"].split("P")[0]),
+    "tensDistribution": lambda item: parse_tens_code(item["dist"]),
+    "consecutiveDistribution": lambda item: int(item["pairs"]),
+    "endingDistribution": lambda item: int(item["ending"]),
+}
+
+
+def _compact_input(field, value):
+    """Un campo del diccionario de análisis en la forma que reciben las reglas."""
+    if value is None:
+        return None
+    if field in _TABLE_LABELS:
+        return [_TABLE_LABELS[field](item) for item in value]
+    if field == "topPairsSet_list":
+        return [_parse_pair(p) for p in value]
+    if field == "markovTransitions":
+        matrix = [[0] * (MAX_NUMBER + 1) for _ in range(MAX_NUMBER + 1)]
+        for prev, counts in value.items():
+            for curr, count in counts.items():
+                matrix[int(prev)][int(curr)] = count
+        return matrix
+    if field == "markovTop":
+        return [list(value.get(str(n), [])) for n in range(MAX_NUMBER + 1)]
+    return value
+
+
+def rule_inputs(section, fields):
+    """
+    Campos 'fields' de una sección del análisis en la forma compacta de las
+    reglas. Una sección empaquetada ya los entrega así; un diccionario se
+    convierte campo por campo.
+    """
+    if isinstance(section, dict):
+        return {field: _compact_input(field, section.get(field)) for field in fields}
+    return {field: section.get(field) for field in fields}
+
+
+def prepare_tables(analysis, last_draw, rule_windows=None, rules=None):
+    """
+    Tablas de las reglas registradas (o de 'rules', p. ej. ADICIONAL_RULES):
+    {clave de la regla: tabla}. 'analysis' es el diccionario de análisis o un
+    'analysis_codec.PackedAnalysis'.
+    """
+    tables = {}
+    for rule in RULES if rules is None else rules:
+        source = rule_source(analysis, rule_windows, rule)
+        tables[rule.key] = rule.prepare(rule_inputs(source, rule.inputs), last_draw)
+    return tables
+
+
+def rule_numerators(combo, tables):
+    """Numeradores de una combinación, en el orden de RULES."""
+    combo = sorted(combo)
+    numerators = []
+    for rule in RULES:
+        table = tables[rule.key]
+        numerators.append(rule.numerator(FEATURES[rule.feature](combo, table), table))
+    return numerators
+
+
+def rate_combination(combo, tables, strategy_weights):
+    """
+    Confianza (0-100) de una combinación. Las fracciones se suman regla por regla
+    en el orden del registro; el motor vectorizado hace las mismas operaciones,
+    así que ambos resultados coinciden bit a bit.
+    """
+    max_score = sum(strategy_weights.values())
+    if max_score == 0:
+        return 0
+    score = 0.0
+    for rule, numerator in zip(RULES, rule_numerators(combo, tables)):
+        score += (numerator / rule.denominator) * strategy_weights.get(rule.key, 0)
+    return (score / max_score) * 100
+
+
+def rate_six_plus_one(
+    combo, adicional, tables, adicional_tables, strategy_weights, adicional_weights
+):
+    """
+    Confianza (0-100) de un boleto de 6 números con 'adicional' como candidato a
+    número adicional: las 9 reglas del boleto y luego las del adicional, en ese
+    orden, sobre la suma de todos los pesos.
+    """
+    max_score = sum(strategy_weights.values()) + sum(adicional_weights.values())
+    if max_score == 0:
+        return 0
+    combo = sorted(combo)
+    score = 0.0
+    for rule, numerator in zip(RULES, rule_numerators(combo, tables)):
+        score += (numerator / rule.denominator) * strategy_weights.get(rule.key, 0)
+    for rule in ADICIONAL_RULES:
+        table = adicional_tables[rule.key]
+        value = ADICIONAL_FEATURES[rule.feature](combo, adicional, table)
+        score += (rule.numerator(value, table) / rule.denominator) * (
+            adicional_weights.get(rule.key, 0)
+        )
+    return (score / max_score) * 100
@@ -0,0 +1,336 @@
+# Backends de Puntuación Seleccionables en Tiempo de Ejecución
+#
+# Descripción:
+# El recorrido de fuerza bruta califica las 3.26M combinaciones por bloques. Este
+# módulo ofrece tres formas de calcular la confianza de un bloque:
+#   numba  -> kernel compilado (JIT) que recorre el bloque una sola vez y evalúa
+#             todas las reglas por combinación, sin arreglos temporales. Es
+#             opcional: solo se usa si Numba está instalado.
+#   numpy  -> el motor vectorizado de 'scoring_engine.py'.
+#   python -> la ruta escalar de referencia de 'rule_registry.py' (lenta; último
+#             recurso).
+#
+# 'select_backend' prueba los backends en ese orden (o desde el indicado en la
+# variable de entorno SCORING_BACKEND) y se queda con el primero disponible cuyo
+# resultado coincide bit a bit con 'rule_registry.rate_combination' sobre una
+# muestra fija de combinaciones. Si el backend pedido no está disponible (p. ej.
+# SCORING_BACKEND=numba sin Numba instalado) se avisa y se sigue con el siguiente.
+#
+# El kernel compilado no ejecuta las funciones de las reglas: al construirse, cada
+# regla del registro se convierte en una tabla de numeradores indexada por el valor
+# de su característica (todas toman pocos valores), así que agregar una regla con
+# una característica conocida no requiere tocar el kernel.
+
+import os
+
+import numpy as np
+
+import rule_registry
+import scoring_engine as se
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Combinaciones de la muestra con la que se comprueba la paridad al iniciar.
+PARITY_SAMPLE_SIZE = 2000
+PARITY_SEED = 0
+# Combinaciones por tarea paralela del kernel compilado.
+KERNEL_BLOCK = 4096
+
+SCORING_BACKEND = os.environ.get("SCORING_BACKEND", "auto")
+
+# Tipo de cada característica dentro del kernel compilado.
+_FEATURE_KINDS = {
+    "sum": 0,
+    "evens": 1,
+    "tens_code": 2,
+    "consecutive": 3,
+    "ending_hits": 4,
+    "number_counts": 5,
+    "pair_hits": 6,
+}
+# Valores posibles de las características estructurales (0 .. tamaño - 1).
+_STRUCTURAL_DOMAIN = {
+    "sum": se.COMBO_SIZE * se.MAX_NUMBER + 1,
+    "evens": se.COMBO_SIZE + 1,
+    "tens_code": rule_registry.TENS_CODES,
+    "consecutive": se.COMBO_SIZE,
+}
+_PAIRS_PER_COMBO = se.COMBO_SIZE * (se.COMBO_SIZE - 1) // 2
+
+prange = numba.prange if numba is not None else range
+
+
+def _fused_confidence(
+    combos,
+    kinds,
+    first,
+    last,
+    lut_offsets,
+    luts,
+    radix,
+    number_matrix,
+    pairs,
+    digits,
+    divisors,
+    weights,
+    max_score,
+    block,
+    out,
+):
+    """
+    Confianza de cada combinación en una sola pasada: primero sus características
+    (suma, pares, decenas, consecutivos, conteos por número) y luego, regla por
+    regla, numerador = tabla[valor de la característica]. La suma ponderada se
+    hace en el mismo orden que 'scoring_engine.confidence'.
+    """
+    n, size = combos.shape
+    n_columns = number_matrix.shape[1]
+    for b in prange((n + block - 1) // block):
+        counts = np.zeros(n_columns, dtype=np.int64)
+        tens = np.zeros(4, dtype=np.int64)
+        for i in range(b * block, min(n, (b + 1) * block)):
+            total = 0
+            evens = 0
+            consecutive = 0
+            for c in range(n_columns):
+                counts[c] = 0
+            for d in range(4):
+                tens[d] = 0
+            for j in range(size):
+                x = np.int64(combos[i, j])
+                total += x
+                if x % 2 == 0:
+                    evens += 1
+                if j > 0 and x == np.int64(combos[i, j - 1]) + 1:
+                    consecutive += 1
+                tens[min(x // 10, 3)] += 1
+                for c in range(n_columns):
+                    counts[c] += number_matrix[x, c]
+            # Patrón de decenas: conteos de mayor a menor en base 7.
+            for d in range(1, 4):
+                value = tens[d]
+                e = d
+                while e > 0 and tens[e - 1] < value:
+                    tens[e] = tens[e - 1]
+                    e -= 1
+                tens[e] = value
+            tens_code = ((tens[0] * 7 + tens[1]) * 7 + tens[2]) * 7 + tens[3]
+
+            score = 0.0
+            for r in range(len(kinds)):
+                kind = kinds[r]
+                value = 0
+                if kind == 0:
+                    value = total
+                elif kind == 1:
+                    value = evens
+                elif kind == 2:
+                    value = tens_code
+                elif kind == 3:
+                    value = consecutive
+                elif kind == 4:
+                    for j in range(size):
+                        value += digits[first[r], np.int64(combos[i, j]) % 10]
+                elif kind == 5:
+                    for c in range(first[r], last[r]):
+                        value = value * radix[c] + counts[c]
+                else:
+                    for j in range(size - 1):
+                        for k in range(j + 1, size):
+                            value += pairs[
+                                first[r], np.int64(combos[i, j]), np.int64(combos[i, k])
+                            ]
+                score += (luts[lut_offsets[r] + value] / divisors[r]) * weights[r]
+            out[i] = (score / max_score) * 100
+
+
+_fused_kernel = (
+    numba.njit(parallel=True, cache=True)(_fused_confidence)
+    if numba is not None
+    else None
+)
+
+
+class NumbaBackend:
+    """Kernel compilado con Numba sobre tablas de numeradores por regla."""
+
+    name = "numba"
+
+    def __init__(self, tables, scalar_tables, strategy_weights):
+        if _fused_kernel is None:
+            raise ImportError("Numba no está instalado.")
+        self.max_score = float(sum(strategy_weights.values()))
+        self.weights = se.weights_vector(strategy_weights)
+        self.divisors = se.RULE_DENOMINATORS
+        self.number_matrix = tables["number_matrix"].astype(np.int64)
+        # Cada columna de conteos toma valores 0 .. 6 * máximo de la columna.
+        self.radix = se.COMBO_SIZE * self.number_matrix.max(axis=0, initial=0) + 1
+
+        kinds, first, last, lut_offsets, luts = [], [], [], [], []
+        pairs, digits = [], []
+        offset = 0
+        for rule in rule_registry.RULES:
+            if rule.feature not in _FEATURE_KINDS:
+                raise NotImplementedError(
+                    f"El kernel compilado no soporta la característica '{rule.feature}'."
+                )
+            table = tables["rules"][rule.key]
+            start = stop = 0
+            if rule.feature in _STRUCTURAL_DOMAIN:
+                value = np.arange(_STRUCTURAL_DOMAIN[rule.feature])
+            elif rule.feature == "ending_hits":
+                start = len(digits)
+                digits.append(table["digits"])
+                value = np.arange(se.COMBO_SIZE * table["digits"].max() + 1)
+            elif rule.feature == "pair_hits":
+                start = len(pairs)
+                pairs.append(table["pairs"])
+                value = np.arange(_PAIRS_PER_COMBO * table["pairs"].max() + 1)
+            else:
+                start, stop = tables["number_columns"][rule.key]
+                # Todas las combinaciones de conteos, en el orden de la base mixta.
+                grid = np.indices(self.radix[start:stop]).reshape(stop - start, -1)
+                value = tuple(grid)
+            size = len(value[0]) if isinstance(value, tuple) else len(value)
+            lut = np.broadcast_to(
+                np.asarray(rule.numerator(value, table), dtype=np.int64), (size,)
+            )
+            kinds.append(_FEATURE_KINDS[rule.feature])
+            first.append(start)
+            last.append(stop)
+            lut_offsets.append(offset)
+            luts.append(lut)
+            offset += size
+
+        self.kinds = np.array(kinds, dtype=np.int64)
+        self.first = np.array(first, dtype=np.int64)
+        self.last = np.array(last, dtype=np.int64)
+        self.lut_offsets = np.array(lut_offsets, dtype=np.int64)
+        self.luts = np.concatenate(luts)
+        side = se.MAX_NUMBER + 1
+        self.pairs = np.array(pairs, dtype=np.int64).reshape(-1, side, side)
+        self.digits = np.array(digits, dtype=np.int64).reshape(-1, 10)
+
+    def confidence(self, combos, block=None):
+        combos = np.ascontiguousarray(combos, dtype=np.uint8)
+        out = np.zeros(len(combos), dtype=np.float64)
+        if self.max_score == 0 or len(combos) == 0:
+            return out
+        _fused_kernel(
+            combos,
+            self.kinds,
+            self.first,
+            self.last,
+            self.lut_offsets,
+            self.luts,
+            self.radix,
+            self.number_matrix,
+            self.pairs,
+            self.digits,
+            self.divisors,
+            self.weights,
+            self.max_score,
+            KERNEL_BLOCK,
+            out,
+        )
+        return out
+
+
+class NumpyBackend:
+    """Motor vectorizado: numeradores por regla y suma ponderada."""
+
+    name = "numpy"
+
+    def __init__(self, tables, scalar_tables, strategy_weights):
+        self.tables = tables
+        self.strategy_weights = dict(strategy_weights)
+
+    def confidence(self, combos, block=None):
+        numerators = se.rule_numerators(combos, self.tables, block)
+        return se.confidence(numerators, self.strategy_weights)
+
+
+class PythonBackend:
+    """Ruta escalar del registro, una combinación a la vez."""
+
+    name = "python"
+
+    def __init__(self, tables, scalar_tables, strategy_weights):
+        self.scalar_tables = scalar_tables
+        self.strategy_weights = dict(strategy_weights)
+
+    def confidence(self, combos, block=None):
+        return np.array(
+            [
+                rule_registry.rate_combination(
+                    [int(n) for n in combo], self.scalar_tables, self.strategy_weights
+                )
+                for combo in combos
+            ],
+            dtype=np.float64,
+        )
+
+
+BACKENDS = [NumbaBackend, NumpyBackend, PythonBackend]
+
+
+def parity_sample():
+    """Muestra fija de combinaciones (ordenadas) para la comprobación de paridad."""
+    rng = np.random.default_rng(PARITY_SEED)
+    index = np.sort(
+        rng.choice(se.TOTAL_COMBINATIONS, PARITY_SAMPLE_SIZE, replace=False)
+    )
+    return se.all_combinations()[index]
+
+
+def select_backend(
+    analysis, last_draw, strategy_weights, rule_windows=None, tables=None
+):
+    """
+    Devuelve el primer backend disponible (a partir del de SCORING_BACKEND) que
+    da la misma confianza que 'rule_registry.rate_combination' sobre la muestra.
+    """
+    if tables is None:
+        tables = se.build_tables(analysis, last_draw, rule_windows)
+    scalar_tables = rule_registry.prepare_tables(analysis, last_draw, rule_windows)
+    names = [backend.name for backend in BACKENDS]
+    if SCORING_BACKEND == "auto":
+        candidates = BACKENDS
+    elif SCORING_BACKEND in names:
+        candidates = BACKENDS[names.index(SCORING_BACKEND) :]
+    else:
+        raise ValueError(f"Backend de puntuación desconocido: '{SCORING_BACKEND}'.")
+
+    sample = parity_sample()
+    expected = None
+    for backend_class in candidates:
+        try:
+            backend = backend_class(tables, scalar_tables, strategy_weights)
+        except (ImportError, NotImplementedError) as e:
+            if backend_class.name == SCORING_BACKEND:
+                print(
+                    f"⚠️  SCORING_BACKEND={SCORING_BACKEND} no está disponible: {e} "
+                    f"Se usa el siguiente backend."
+                )
+            else:
+                print(f"ℹ️  Backend '{backend_class.name}' no disponible: {e}")
+            continue
+        if backend_class is PythonBackend:
+            return backend
+        if expected is None:
+            expected = PythonBackend(
+                tables, scalar_tables, strategy_weights
+            ).confidence(sample)
+        mismatches = int(np.count_nonzero(backend.confidence(sample) != expected))
+        if mismatches:
+            print(
+                f"⚠️  El backend '{backend.name}' no coincide con rate_combination en "
+                f"{mismatches}/{len(sample)} combinaciones; se descarta."
+            )
+            continue
+        print(f"✅ Backend de puntuación: {backend.name} (paridad verificada).")
+        return backend
+    raise RuntimeError("Ningún backend de puntuación pasó la comprobación de paridad.")
@@ -0,0 +1,720 @@
+# Motor de Puntuación Vectorizado
+#
+# Descripción:
+# Compila las reglas declaradas en 'rule_registry.py' en un kernel vectorizado
+# (NumPy). En lugar de calificar una combinación a la vez, cada regla se evalúa
+# sobre una matriz (combinaciones x 6) y produce un "numerador" entero por
+# combinación. La fracción que aporta cada regla es numerador / denominador, y la
+# confianza final es la suma ponderada de esas fracciones, exactamente igual que en
+# la ruta escalar del registro (mismas operaciones de punto flotante, mismo orden).
+#
+# Separar los numeradores (que solo dependen del análisis y del último sorteo) de
+# los pesos permite re-ponderar los 3.26M de combinaciones sin volver a evaluar
+# las reglas.
+#
+# Las reglas con características estructurales (suma, pares, decenas,
+# consecutivos y terminaciones) solo dependen de unas pocas características de la
+# combinación. Sobre el espacio completo se agrupan una vez en clases de
+# equivalencia (~11k firmas de suma/pares/decenas/consecutivos y ~5k de dígitos
+# finales); las reglas se evalúan por clase y el resultado se reparte con un
+# arreglo de id de clase.
+
+import copy
+from math import comb
+
+import numpy as np
+
+import rule_registry
+
+RULE_KEYS = rule_registry.RULE_KEYS
+# Fracción de cada regla = numerador / denominador (ver 'rule_numerators').
+RULE_DENOMINATORS = np.array(
+    [rule.denominator for rule in rule_registry.RULES], dtype=np.float64
+)
+DEFAULT_WEIGHTS = dict(rule_registry.DEFAULT_WEIGHTS)
+
+MAX_NUMBER = 39
+COMBO_SIZE = 6
+TOTAL_COMBINATIONS = comb(MAX_NUMBER, COMBO_SIZE)
+
+# Completaciones con números fijos: subespacios de hasta este tamaño se enumeran;
+# los mayores (1 o 2 números fijos) se resuelven recorriendo el ranking global.
+COMPLETION_ENUMERATION_LIMIT = 20000
+COMPLETION_SCAN_BLOCK = 1 << 16
+
+# Margen (en puntos de confianza) para los candidatos del ranking multi-perfil;
+# muy por encima del error de redondeo del producto en float32 (~1e-5).
+PROFILE_TOLERANCE = 1e-3
+
+# Posiciones (i < j) de los 15 pares dentro de una combinación ordenada.
+PAIR_POSITIONS = np.triu_indices(COMBO_SIZE, 1)
+
+# Bloque de combinaciones con el que se calculan las clases estructurales.
+CLASS_CHUNK_SIZE = 1 << 18
+# Posición de cada código de decenas válido (patrones de 6 números en 4 decenas)
+# entre todos ellos, en orden de código; 255 para los imposibles.
+_TENS_RANK = np.full(7**4, 255, dtype=np.uint8)
+_TENS_RANK[
+    sorted(
+        ((a * 7 + b) * 7 + c) * 7 + d
+        for a in range(7)
+        for b in range(a + 1)
+        for c in range(b + 1)
+        for d in range(c + 1)
+        if a + b + c + d == COMBO_SIZE
+    )
+] = np.arange(9)
+
+# Tabla de coeficientes binomiales para calcular índices de combinaciones.
+_BINOM = np.array(
+    [[comb(n, k) for k in range(COMBO_SIZE + 2)] for n in range(MAX_NUMBER + 2)],
+    dtype=np.int64,
+)
+_all_combinations_cache = None
+_structural_classes_cache = None
+
+
+def all_combinations():
+    """
+    Devuelve todas las combinaciones de 6 números del 1 al 39 como una matriz
+    uint8 (3,262,623 x 6), en el mismo orden lexicográfico que
+    itertools.combinations(range(1, 40), 6). Se calcula una sola vez.
+    """
+    global _all_combinations_cache
+    if _all_combinations_cache is None:
+        _all_combinations_cache = enumerate_combinations(
+            np.arange(1, MAX_NUMBER + 1), COMBO_SIZE
+        )
+    return _all_combinations_cache
+
+
+def enumerate_combinations(pool, k):
+    """Enumera en orden lexicográfico las combinaciones de tamaño k de 'pool'."""
+    pool = np.asarray(pool, dtype=np.uint8)
+    n = len(pool)
+    if k == 0:
+        return np.zeros((1, 0), dtype=np.uint8)
+    # Se trabaja con posiciones dentro de 'pool' y al final se traducen a valores.
+    positions = np.arange(n - k + 1, dtype=np.int64)[:, None]
+    for depth in range(1, k):
+        last = positions[:, -1]
+        # Posiciones válidas para el siguiente elemento: last+1 .. n-k+depth
+        counts = (n - k + depth) - last
+        rows = np.repeat(positions, counts, axis=0)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        offsets = np.arange(counts.sum()) - starts + 1
+        positions = np.column_stack([rows, np.repeat(last, counts) + offsets])
+    return pool[positions]
+
+
+def combination_index(combos):
+    """
+    Índice (0-based) de cada combinación ordenada dentro de 'all_combinations()'.
+    Acepta una matriz (n x 6) y devuelve un vector int64.
+    """
+    combos = np.asarray(combos, dtype=np.int64).reshape(-1, COMBO_SIZE)
+    index = np.full(len(combos), TOTAL_COMBINATIONS - 1, dtype=np.int64)
+    for i in range(COMBO_SIZE):
+        index -= _BINOM[MAX_NUMBER - combos[:, i], COMBO_SIZE - i]
+    return index
+
+
+def combinations_at(index):
+    """
+    Inversa de 'combination_index': las combinaciones (n x 6, uint8) con esos
+    índices, sin construir 'all_combinations()'. Usa el sistema combinatorio: el
+    complemento del índice es sum C(39 - c_i, 6 - i) con términos decrecientes,
+    así que cada número sale de una búsqueda en una columna de _BINOM.
+    """
+    rest = TOTAL_COMBINATIONS - 1 - np.asarray(index, dtype=np.int64).ravel()
+    combos = np.empty((len(rest), COMBO_SIZE), dtype=np.uint8)
+    for i in range(COMBO_SIZE):
+        column = _BINOM[:, COMBO_SIZE - i]
+        x = np.searchsorted(column, rest, side="right") - 1
+        rest -= column[x]
+        combos[:, i] = MAX_NUMBER - x
+    return combos
+
+
+def weights_vector(strategy_weights):
+    """Pesos en el orden de RULE_KEYS (las reglas sin peso cuentan como 0)."""
+    return np.array(
+        [float(strategy_weights.get(key, 0)) for key in RULE_KEYS], dtype=np.float64
+    )
+
+
+def build_tables(analysis, last_draw, rule_windows=None):
+    """
+    Compila las reglas del registro para un análisis y un último sorteo: la tabla
+    de cada regla con sus listas convertidas en arreglos y, para la característica
+    'number_counts', una sola matriz (40 x vectores) con los vectores por número de
+    todas las reglas que la usan. Es el único paso que recorre estructuras de
+    Python; se ejecuta una vez por análisis. 'rule_windows' elige la ventana de
+    estadísticas de cada regla.
+    """
+    prepared = rule_registry.prepare_tables(analysis, last_draw, rule_windows)
+    rules = {
+        key: {
+            name: np.asarray(value) if isinstance(value, list) else value
+            for name, value in table.items()
+        }
+        for key, table in prepared.items()
+    }
+    vectors, number_columns = [], {}
+    for rule in rule_registry.RULES:
+        if rule.feature == "number_counts":
+            start = len(vectors)
+            vectors.extend(prepared[rule.key]["vectors"])
+            number_columns[rule.key] = (start, len(vectors))
+    number_matrix = np.array(vectors, dtype=np.int8).reshape(len(vectors), -1).T
+    return {
+        "rules": rules,
+        "number_matrix": np.ascontiguousarray(number_matrix),
+        "number_columns": number_columns,
+    }
+
+
+def _structural_features(idx):
+    """
+    Características estructurales (n x 4), en el orden de
+    rule_registry.STRUCTURAL_FEATURES: suma, cantidad de pares, código de decenas
+    y pares consecutivos.
+    """
+    sums = idx.sum(axis=1)
+    evens = (idx % 2 == 0).sum(axis=1)
+    decade = np.minimum(idx // 10, 3)
+    tens = np.stack([(decade == d).sum(axis=1) for d in range(4)], axis=1)
+    tens = -np.sort(-tens, axis=1)
+    tens_code = ((tens[:, 0] * 7 + tens[:, 1]) * 7 + tens[:, 2]) * 7 + tens[:, 3]
+    consecutive = (np.diff(idx, axis=1) == 1).sum(axis=1)
+    return np.stack([sums, evens, tens_code, consecutive], axis=1)
+
+
+def _dense_classes(key):
+    """
+    Ids de clase (uint16, en orden de clave) y un elemento de cada clase,
+    usando la clave como índice de un arreglo denso (sin ordenar los 3.26M). La
+    clave debe ser compacta: el arreglo denso mide key.max() + 1.
+    """
+    present = np.zeros(int(key.max()) + 1, dtype=np.uint8)
+    present[key] = 1
+    class_of_key = np.cumsum(present, dtype=np.int32) - 1
+    ids = class_of_key[key].astype(np.uint16)
+    # Cualquier elemento sirve de representante: la clase comparte la clave.
+    first = np.zeros(int(class_of_key[-1]) + 1, dtype=np.int64)
+    first[ids] = np.arange(len(key), dtype=np.int32)
+    return ids, first
+
+
+def _class_keys(combos):
+    """
+    Claves compactas (int32) de la firma estructural y del multiconjunto de
+    dígitos finales de un bloque de combinaciones. La firma usa la posición del
+    código de decenas (9 valores) en lugar del código, así que las clases quedan
+    en el mismo orden que con la clave (suma, pares, código, consecutivos).
+    """
+    idx = combos.astype(np.intp)
+    features = _structural_features(idx)
+    structure = (features[:, 0] * 7 + features[:, 1]) * 9 + _TENS_RANK[features[:, 2]]
+    structure = structure * 6 + features[:, 3]
+    # Dígitos finales ordenados leídos como número en base 10 (< 10^6).
+    endings = np.sort(combos % 10, axis=1)
+    ending = np.zeros(len(combos), dtype=np.int32)
+    for i in range(COMBO_SIZE):
+        ending = ending * 10 + endings[:, i]
+    return structure.astype(np.int32), ending
+
+
+def structural_classes():
+    """
+    Clases de equivalencia estructurales del espacio completo (se calculan una
+    sola vez): 'structure' asigna a cada combinación el id de su firma (suma,
+    pares, decenas, consecutivos), cuyas características están en
+    'structure_features'; 'ending' asigna el id de su histograma de dígitos
+    finales, guardado en 'ending_counts' (clases x 10).
+    """
+    global _structural_classes_cache
+    if _structural_classes_cache is None:
+        # Las claves se calculan por bloques para no materializar las
+        # características de las 3.26M combinaciones a la vez.
+        combos = all_combinations()
+        structure_key = np.empty(len(combos), dtype=np.int32)
+        ending_key = np.empty(len(combos), dtype=np.int32)
+        for start in range(0, len(combos), CLASS_CHUNK_SIZE):
+            end = start + CLASS_CHUNK_SIZE
+            structure_key[start:end], ending_key[start:end] = _class_keys(
+                combos[start:end]
+            )
+        structure, representative = _dense_classes(structure_key)
+        ending, ending_representative = _dense_classes(ending_key)
+        del structure_key, ending_key
+
+        representatives = combos[ending_representative].astype(np.intp)
+        ending_counts = np.zeros((len(ending_representative), 10), dtype=np.int64)
+        rows = np.arange(len(ending_representative))
+        for i in range(COMBO_SIZE):
+            ending_counts[rows, representatives[:, i] % 10] += 1
+
+        _structural_classes_cache = {
+            "structure": structure,
+            "structure_features": _structural_features(
+                combos[representative].astype(np.intp)
+            ),
+            "ending": ending,
+            "ending_counts": ending_counts,
+        }
+    return _structural_classes_cache
+
+
+# --- CARACTERÍSTICAS VECTORIZADAS ---
+# Cada una devuelve (valor, ids): si 'ids' no es None el valor es por clase de
+# equivalencia y el numerador de la regla se reparte con numerador[ids]. 'cache'
+# guarda lo que comparten varias reglas dentro de una misma llamada.
+
+
+def _structural_feature(name):
+    column = rule_registry.STRUCTURAL_FEATURES.index(name)
+
+    def feature(rule, tables, idx, classes, cache):
+        if classes is None:
+            if "structural" not in cache:
+                cache["structural"] = _structural_features(idx)
+            return cache["structural"][:, column], None
+        table = structural_classes()
+        return table["structure_features"][:, column], table["structure"][classes]
+
+    return feature
+
+
+def _ending_hits(rule, tables, idx, classes, cache):
+    digits = tables["rules"][rule.key]["digits"]
+    if classes is None:
+        return digits[idx % 10].sum(axis=1), None
+    # Dígitos finales de cada clase x dígitos marcados.
+    table = structural_classes()
+    return table["ending_counts"] @ digits, table["ending"][classes]
+
+
+def _number_counts(rule, tables, idx, classes, cache):
+    if "number_counts" not in cache:
+        # Los vectores de todas las reglas se suman en un solo recorrido: una fila
+        # de la matriz (número x vectores) por cada posición de la combinación.
+        matrix = tables["number_matrix"]
+        counts = matrix[idx[:, 0]].astype(np.int16)
+        for i in range(1, COMBO_SIZE):
+            counts += matrix[idx[:, i]]
+        cache["number_counts"] = counts
+    start, stop = tables["number_columns"][rule.key]
+    return tuple(cache["number_counts"][:, c] for c in range(start, stop)), None
+
+
+def _pair_hits(rule, tables, idx, classes, cache):
+    pairs = tables["rules"][rule.key]["pairs"].ravel()
+    hits = np.zeros(len(idx), dtype=np.int16)
+    for i in range(COMBO_SIZE - 1):
+        row = idx[:, i] * (MAX_NUMBER + 1)
+        for j in range(i + 1, COMBO_SIZE):
+            hits += pairs[row + idx[:, j]]
+    return hits, None
+
+
+_VECTOR_FEATURES = {
+    **{name: _structural_feature(name) for name in rule_registry.STRUCTURAL_FEATURES},
+    "ending_hits": _ending_hits,
+    "number_counts": _number_counts,
+    "pair_hits": _pair_hits,
+}
+
+
+def rule_numerators(combos, tables, classes=None):
+    """
+    Evalúa las reglas del registro sobre una matriz de combinaciones ordenadas
+    (n x 6) y devuelve una matriz int8 (n x reglas) de numeradores en el orden de
+    RULE_KEYS.
+
+    Si 'combos' es un tramo contiguo de all_combinations(), 'classes' puede ser
+    el slice (inicio, fin) correspondiente: las reglas estructurales se evalúan
+    entonces por clase de equivalencia y se reparten por id de clase.
+    """
+    combos = np.asarray(combos)
+    idx = combos.astype(np.intp)
+    numerators = np.zeros((len(combos), len(RULE_KEYS)), dtype=np.int8)
+    cache = {}
+    for r, rule in enumerate(rule_registry.RULES):
+        table = tables["rules"][rule.key]
+        value, ids = _VECTOR_FEATURES[rule.feature](rule, tables, idx, classes, cache)
+        result = rule.numerator(value, table)
+        numerators[:, r] = result if ids is None else np.asarray(result)[ids]
+    return numerators
+
+
+def weighted_score(numerators, strategy_weights):
+    """Suma sin normalizar de (numerador / denominador) * peso, regla por regla."""
+    weights = weights_vector(strategy_weights)
+    score = np.zeros(len(numerators), dtype=np.float64)
+    for r in range(len(RULE_KEYS)):
+        score += (numerators[:, r] / RULE_DENOMINATORS[r]) * weights[r]
+    return score
+
+
+def confidence(numerators, strategy_weights):
+    """
+    Convierte numeradores (n x reglas) en confianza (0-100) con los pesos dados.
+    Suma las reglas en el mismo orden que 'rule_registry.rate_combination' para
+    que el resultado sea idéntico bit a bit.
+    """
+    max_score = sum(strategy_weights.values())
+    if max_score == 0:
+        return np.zeros(len(numerators), dtype=np.float64)
+    return (weighted_score(numerators, strategy_weights) / max_score) * 100
+
+
+def build_adicional_tables(analysis, last_draw, rule_windows=None):
+    """Tablas de las reglas del número adicional (listas -> arreglos)."""
+    prepared = rule_registry.prepare_tables(
+        analysis, last_draw, rule_windows, rule_registry.ADICIONAL_RULES
+    )
+    return {
+        key: {
+            name: np.asarray(value) if isinstance(value, list) else value
+            for name, value in table.items()
+        }
+        for key, table in prepared.items()
+    }
+
+
+def _adicional_pairs(idx, table):
+    """Pares principales entre cada candidato a adicional y el boleto (n x 40)."""
+    pairs = table["pairs"]
+    hits = pairs[idx[:, 0]].astype(np.int16)
+    for i in range(1, COMBO_SIZE):
+        hits += pairs[idx[:, i]]
+    return hits
+
+
+_ADICIONAL_VECTOR_FEATURES = {
+    "adicional": lambda idx, table: np.arange(MAX_NUMBER + 1),
+    "adicional_pairs": _adicional_pairs,
+}
+
+
+def six_plus_one_confidence(
+    combos, numerators, adicional_tables, strategy_weights, adicional_weights
+):
+    """
+    Confianza (n x 40) de cada boleto (fila) con cada número como adicional
+    (columna), igual bit a bit que 'rule_registry.rate_six_plus_one'. Las
+    columnas imposibles (el 0 y los números del propio boleto) quedan en -inf.
+    """
+    combos = np.asarray(combos)
+    idx = combos.astype(np.intp)
+    max_score = sum(strategy_weights.values()) + sum(adicional_weights.values())
+    score = weighted_score(numerators, strategy_weights)[:, None]
+    for rule in rule_registry.ADICIONAL_RULES:
+        table = adicional_tables[rule.key]
+        value = _ADICIONAL_VECTOR_FEATURES[rule.feature](idx, table)
+        weight = float(adicional_weights.get(rule.key, 0))
+        score = score + (rule.numerator(value, table) / rule.denominator) * weight
+    conf = np.broadcast_to(score, (len(combos), MAX_NUMBER + 1))
+    if max_score == 0:
+        conf = np.zeros(conf.shape, dtype=np.float64)
+    else:
+        conf = (conf / max_score) * 100
+    conf[:, 0] = -np.inf
+    conf[np.arange(len(combos))[:, None], idx] = -np.inf
+    return conf
+
+
+def top_k(conf, k):
+    """
+    Índices de las k confianzas más altas, de mayor a menor. Los empates se
+    resuelven por índice (orden lexicográfico), igual que el sort estable original.
+    """
+    k = min(k, len(conf))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-conf, k - 1)[:k]
+    # Incluir todos los empates con el k-ésimo valor para desempatar por índice.
+    threshold = conf[candidates].min()
+    candidates = np.flatnonzero(conf >= threshold)
+    order = np.lexsort((candidates, -conf[candidates]))
+    return candidates[order[:k]]
+
+
+def merge_top_k(top_index, top_conf, index, conf, k):
+    """
+    Une un top-K acumulado con candidatos nuevos. Los empates se resuelven por
+    índice de enumeración, como el sort estable sobre la lista completa.
+    """
+    all_index = np.concatenate([top_index, index])
+    all_conf = np.concatenate([top_conf, conf])
+    order = np.lexsort((all_index, -all_conf))[:k]
+    return all_index[order], all_conf[order]
+
+
+def profile_matrix(profiles):
+    """
+    Matriz (reglas x P) que convierte numeradores en confianza para P perfiles de pesos
+    con un solo producto: peso / denominador / suma de pesos * 100.
+    """
+    matrix = np.zeros((len(RULE_KEYS), len(profiles)), dtype=np.float64)
+    for p, strategy_weights in enumerate(profiles):
+        max_score = sum(strategy_weights.values())
+        if max_score:
+            matrix[:, p] = weights_vector(strategy_weights) / RULE_DENOMINATORS
+            matrix[:, p] *= 100 / max_score
+    return matrix
+
+
+class ProfileRanker:
+    """
+    Top-K independiente para P perfiles de pesos en una sola pasada por bloques.
+    Cada bloque se califica para todos los perfiles con (combos x reglas) @
+    (reglas x P). Como el producto no suma igual que 'confidence', se toman
+    como candidatos los que quedan a menos de PROFILE_TOLERANCE del k-ésimo de
+    cada perfil y solo esos se recalifican exactamente antes de unirlos al top.
+    """
+
+    def __init__(self, profiles, k):
+        self.profiles = [dict(p) for p in profiles]
+        self.k = k
+        # El producto se hace en float32 (la mitad de memoria y de tiempo); el
+        # margen PROFILE_TOLERANCE cubre su error de redondeo.
+        self.matrix_t = profile_matrix(self.profiles).T.astype(np.float32)
+        self.top_index = [np.zeros(0, dtype=np.int64) for _ in self.profiles]
+        self.top_conf = [np.zeros(0, dtype=np.float64) for _ in self.profiles]
+
+    def update(self, numerators, offset):
+        """Agrega un bloque de numeradores cuyo primer índice global es 'offset'."""
+        if not self.profiles or len(numerators) == 0:
+            return
+        # (P x bloque): cada perfil queda contiguo en memoria.
+        scores = self.matrix_t @ numerators.T.astype(np.float32)
+        # Umbral por perfil: el k-ésimo del top acumulado o, mientras no esté
+        # lleno, el k-ésimo del propio bloque.
+        threshold = np.array(
+            [c[-1] if len(c) == self.k else -np.inf for c in self.top_conf]
+        )
+        if np.isinf(threshold).any():
+            k = min(self.k, len(numerators))
+            kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+            threshold = np.maximum(threshold, kth)
+        scores -= threshold[:, None] - PROFILE_TOLERANCE
+        # Primero las filas que son candidatas para algún perfil (pocas una vez que
+        # los tops se llenan) y solo sobre ellas el detalle por perfil.
+        candidates = np.flatnonzero(scores.max(axis=0) >= 0)
+        cols, rows = np.nonzero(scores[:, candidates] >= 0)
+        rows = candidates[rows]
+        bounds = np.searchsorted(cols, np.arange(len(self.profiles) + 1))
+        for p, strategy_weights in enumerate(self.profiles):
+            local = rows[bounds[p] : bounds[p + 1]]
+            if len(local) == 0:
+                continue
+            conf = confidence(numerators[local], strategy_weights)
+            self.top_index[p], self.top_conf[p] = merge_top_k(
+                self.top_index[p], self.top_conf[p], local + offset, conf, self.k
+            )
+
+    def results(self):
+        """Lista de (índices, confianzas) del top de cada perfil, en orden."""
+        return list(zip(self.top_index, self.top_conf))
+
+
+def fixed_numbers(fixed):
+    """
+    Valida los números fijos de una completación (de 1 a 5 enteros distintos entre
+    1 y 39) y los devuelve ordenados. Lanza ValueError si no son válidos.
+    """
+    if not isinstance(fixed, (list, tuple)) or any(
+        isinstance(n, bool) or not isinstance(n, (int, np.integer)) for n in fixed
+    ):
+        raise ValueError("'fixed' debe ser una lista de números enteros.")
+    if not 1 <= len(fixed) <= COMBO_SIZE - 1 or len(set(fixed)) != len(fixed):
+        raise ValueError("Se requieren entre 1 y 5 números fijos distintos.")
+    fixed = sorted(int(n) for n in fixed)
+    if fixed[0] < 1 or fixed[-1] > MAX_NUMBER:
+        raise ValueError("Los números deben estar entre 1 y 39.")
+    return fixed
+
+
+def completions(fixed):
+    """
+    Todas las combinaciones (ordenadas, n x 6) que contienen los números de 'fixed',
+    en orden lexicográfico de los números restantes.
+    """
+    m = len(fixed)
+    rest = enumerate_combinations(
+        np.setdiff1d(np.arange(1, MAX_NUMBER + 1), fixed), COMBO_SIZE - m
+    )
+    combos = np.concatenate(
+        [rest, np.broadcast_to(np.array(fixed, dtype=np.uint8), (len(rest), m))],
+        axis=1,
+    )
+    return np.sort(combos, axis=1)
+
+
+def pair_keys(combos):
+    """Clave a * 40 + b de los 15 pares (a < b) de cada combinación, como (15 x n)."""
+    columns = np.asarray(combos).T.astype(np.uint16)
+    first, second = PAIR_POSITIONS
+    return columns[first] * (MAX_NUMBER + 1) + columns[second]
+
+
+def pair_confidence_sums(combos, conf):
+    """
+    Suma de la confianza de las combinaciones que contienen cada par, como matriz
+    (40 x 40) con los pares a < b en el triángulo superior. Un bincount por
+    posición del par sobre el bloque.
+    """
+    side = MAX_NUMBER + 1
+    sums = np.zeros(side * side, dtype=np.float64)
+    for keys in pair_keys(combos):
+        sums += np.bincount(keys, weights=conf, minlength=side * side)
+    return sums.reshape(side, side)
+
+
+def confidence_aggregates(pair_sums, top_combos, top_conf, completion_confidence):
+    """
+    Media, máximo y apariciones en el top de la confianza por número (1..39) y por
+    par (a < b, en orden lexicográfico). 'pair_sums' viene de acumular
+    'pair_confidence_sums' sobre todo el espacio y el top va de mayor a menor.
+
+    La media por número sale de las sumas por par (cada combinación con el número
+    n aporta su confianza a sus 5 pares con n). El máximo es la primera aparición
+    en el top; solo los números o pares que no aparecen en él (su máximo queda por
+    debajo del top) se califican aparte con 'completion_confidence(fijos)'.
+    """
+    side = MAX_NUMBER + 1
+    numbers = np.arange(1, side)
+    first, second = np.triu_indices(MAX_NUMBER, 1)
+    first, second = first + 1, second + 1
+    pair_key = first * side + second
+
+    symmetric = pair_sums + pair_sums.T
+    number_mean = symmetric[1:].sum(axis=1) / (COMBO_SIZE - 1)
+    number_mean /= comb(MAX_NUMBER - 1, COMBO_SIZE - 1)
+    pair_mean = pair_sums[first, second] / comb(MAX_NUMBER - 2, COMBO_SIZE - 2)
+
+    def top_stats(keys, size, key_list, fixed_of):
+        # 'keys' es (top x posiciones): el orden de filas es el del top.
+        flat = keys.ravel()
+        counts = np.bincount(flat, minlength=size)[key_list]
+        seen, first_row = np.unique(flat, return_index=True)
+        best = np.full(size, np.nan)
+        best[seen] = top_conf[first_row // keys.shape[1]]
+        best = best[key_list]
+        for i in np.flatnonzero(counts == 0):
+            best[i] = completion_confidence(fixed_of(i)).max()
+        return counts, best
+
+    number_top, number_max = top_stats(
+        np.asarray(top_combos, dtype=np.intp),
+        side,
+        numbers,
+        lambda i: [int(numbers[i])],
+    )
+    pair_top, pair_max = top_stats(
+        pair_keys(top_combos).T.astype(np.intp),
+        side * side,
+        pair_key,
+        lambda i: [int(first[i]), int(second[i])],
+    )
+    return {
+        "numbers": numbers,
+        "number_mean": number_mean,
+        "number_max": number_max,
+        "number_top": number_top,
+        "pairs": np.column_stack([first, second]),
+        "pair_mean": pair_mean,
+        "pair_max": pair_max,
+        "pair_top": pair_top,
+    }
+
+
+class Scorer:
+    """
+    Estado pre-calculado para responder consultas sobre el espacio completo:
+    numeradores de las 3.26M combinaciones, su confianza con los pesos actuales y
+    el orden global (ranking). Cambiar los pesos solo re-pondera, no re-evalúa.
+    """
+
+    def __init__(self, analysis, last_draw, strategy_weights, rule_windows=None):
+        self.analysis = analysis
+        self.last_draw = last_draw
+        self.rule_windows = dict(rule_windows or {})
+        self.tables = build_tables(analysis, last_draw, self.rule_windows)
+        self.combos = all_combinations()
+        self.numerators = rule_numerators(self.combos, self.tables, slice(None))
+        # Máscara de bits de cada combinación (bit n = contiene el número n).
+        self.masks = np.bitwise_or.reduce(
+            np.left_shift(np.uint64(1), self.combos.astype(np.uint64)), axis=1
+        )
+        self.set_weights(strategy_weights)
+
+    def set_weights(self, strategy_weights):
+        self.strategy_weights = dict(strategy_weights)
+        self.conf = confidence(self.numerators, self.strategy_weights)
+        # Orden global estable: mayor confianza primero, empates por índice.
+        self.order = np.argsort(-self.conf, kind="stable")
+        self.sorted_conf = self.conf[self.order]
+        self.sorted_masks = self.masks[self.order]
+
+    def reweighted(self, strategy_weights):
+        """Copia del scorer con otros pesos; reutiliza los numeradores."""
+        scorer = copy.copy(self)
+        scorer.set_weights(strategy_weights)
+        return scorer
+
+    def rate(self, combos):
+        """Confianza y ranking (1 = mejor) de una matriz de combinaciones."""
+        combos = np.sort(np.asarray(combos, dtype=np.int64).reshape(-1, 6), axis=1)
+        index = combination_index(combos)
+        conf = self.conf[index]
+        return conf, self.rank_of(conf)
+
+    def rank_of(self, conf):
+        """Ranking de una confianza: 1 + número de combinaciones estrictamente mejores."""
+        return np.searchsorted(-self.sorted_conf, -np.asarray(conf), side="left") + 1
+
+    def top(self, k):
+        index = self.order[:k]
+        return self.combos[index], self.conf[index]
+
+    def best_completions(self, fixed, k):
+        """
+        Las k mejores combinaciones que contienen todos los números de 'fixed'
+        (de 1 a 5), con el mismo orden que el ranking global. Si el subespacio de
+        C(39-m, 6-m) completaciones es pequeño se enumera y se califica por índice;
+        si es grande se recorre el ranking global en bloques filtrando por máscara
+        de bits, y casi siempre basta el primer bloque.
+        """
+        fixed = fixed_numbers(fixed)
+        m = len(fixed)
+
+        if comb(MAX_NUMBER - m, COMBO_SIZE - m) <= COMPLETION_ENUMERATION_LIMIT:
+            index = combination_index(completions(fixed))
+            conf = self.conf[index]
+            best = np.lexsort((index, -conf))[:k]
+            return self.combos[index[best]], conf[best]
+
+        fixed_mask = np.uint64(sum(1 << n for n in fixed))
+        found, missing = [np.zeros(0, dtype=np.int64)], k
+        for start in range(0, len(self.order), COMPLETION_SCAN_BLOCK):
+            if missing <= 0:
+                break
+            block = self.sorted_masks[start : start + COMPLETION_SCAN_BLOCK]
+            hits = np.flatnonzero((block & fixed_mask) == fixed_mask)[:missing]
+            found.append(self.order[start + hits])
+            missing -= len(hits)
+        index = np.concatenate(found)
+        return self.combos[index], self.conf[index]
+
+    def generate(self, quantity, min_confidence, rng):
+        """
+        Muestra combinaciones al azar entre las que alcanzan 'min_confidence'. Si
+        ninguna lo alcanza devuelve arreglos vacíos (no se relaja el umbral).
+        """
+        available = int(np.searchsorted(-self.sorted_conf, -min_confidence, "right"))
+        picks = rng.choice(available, size=min(quantity, available), replace=False)
+        index = self.order[np.sort(picks)]
+        return self.combos[index], self.conf[index]
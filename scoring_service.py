@@ -0,0 +1,398 @@
+# Servicio Local de Puntuación
+#
+# Descripción:
+# Servicio residente que carga UNA sola vez el análisis pre-calculado, los pesos y
+# los numeradores de las 9 reglas para las 3.26M combinaciones, y responde
+# consultas de calificación por HTTP local (o socket Unix). Así los demás scripts
+# no pagan la inicialización de Firebase ni la carga del análisis en cada uso.
+#
+# Endpoints (JSON):
+#   GET  /health                                   -> estado y latencias
+#   POST /rate      {"combinations": [[...], ...]} -> confianza y ranking
+#   POST /rank      {"combinations": [[...], ...]} -> ranking (1 = mejor)
+#   POST /top       {"k": 30}                      -> mejores k combinaciones
+#   POST /generate  {"quantity": 10, "minConfidence": 80}
+#   POST /complete  {"fixed": [7, 21], "k": 10}    -> mejores completaciones
+#
+# Micro-batching: las peticiones concurrentes se encolan y un solo hilo de trabajo
+# las agrupa (hasta BATCH_WINDOW_SECONDS o MAX_BATCH_REQUESTS) para resolverlas con
+# una sola operación vectorizada sobre el estado pre-calculado.
+#
+# Recarga en caliente: se escucha 'analysis/latest' y 'config/strategyWeights'. Un
+# cambio en el análisis reconstruye el estado en segundo plano; un cambio de pesos
+# solo re-pondera. El estado nuevo reemplaza al anterior de forma atómica.
+
+import os
+import json
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import brute_force_analyzer as bfa
+import rule_registry
+import scoring_engine as se
+
+# --- CONFIGURACIÓN ---
+SERVICE_HOST = os.environ.get("SCORING_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SCORING_SERVICE_PORT", "8765"))
+# Si se define, el servicio escucha en este socket Unix en lugar de TCP.
+SERVICE_SOCKET = os.environ.get("SCORING_SERVICE_SOCKET")
+
+# Tiempo máximo que se espera para juntar peticiones en un mismo lote.
+BATCH_WINDOW_SECONDS = 0.0005
+MAX_BATCH_REQUESTS = 256
+MAX_COMBINATIONS_PER_REQUEST = 10000
+MAX_TOP_K = 1000
+
+
+class ScoringState:
+    """Estado inmutable que atiende un lote: scorer + número de sorteo objetivo."""
+
+    def __init__(self, scorer, last_draw):
+        self.scorer = scorer
+        self.sorteo_sugerido_para = last_draw["sorteo"] + 1
+        self.loaded_at = time.time()
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones concurrentes. Cada petición es (tipo, payload, Future); el
+    hilo de trabajo resuelve todas las de tipo rate/rank de un lote con una sola
+    consulta vectorizada y reparte los resultados.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.requests = queue.Queue()
+        self.latencies = deque(maxlen=5000)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, kind, payload):
+        future = Future()
+        self.requests.put((kind, payload, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + BATCH_WINDOW_SECONDS
+        while len(batch) < MAX_BATCH_REQUESTS:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self.requests.get(timeout=remaining))
+                else:
+                    batch.append(self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self._process(self.service.state, batch)
+            now = time.perf_counter()
+            self.latencies.extend(now - started for _, _, _, started in batch)
+
+    def _process(self, state, batch):
+        scorer = state.scorer
+        lookups = [item for item in batch if item[0] in ("rate", "rank")]
+        if lookups:
+            try:
+                combos = np.concatenate([payload for _, payload, _, _ in lookups])
+                conf, ranks = scorer.rate(combos)
+            except Exception:
+                # Si la consulta conjunta falla, cada petición se resuelve sola
+                # para que el error quede solo en la que lo provoca.
+                for _, payload, future, _ in lookups:
+                    self._resolve(future, scorer.rate, payload)
+            else:
+                start = 0
+                for _, payload, future, _ in lookups:
+                    end = start + len(payload)
+                    future.set_result((conf[start:end], ranks[start:end]))
+                    start = end
+
+        for kind, payload, future, _ in batch:
+            if kind == "top":
+                self._resolve(future, scorer.top, payload)
+            elif kind == "complete":
+                self._resolve(future, self._complete, scorer, *payload)
+            elif kind == "generate":
+                quantity, min_confidence = payload
+                self._resolve(
+                    future, scorer.generate, quantity, min_confidence, self.service.rng
+                )
+
+    @staticmethod
+    def _complete(scorer, fixed, k):
+        combos, conf = scorer.best_completions(fixed, k)
+        return combos, conf, scorer.rank_of(conf)
+
+    @staticmethod
+    def _resolve(future, function, *args):
+        """Resuelve una sola petición; un error solo afecta a su propio Future."""
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def latency_percentiles(self):
+        if not self.latencies:
+            return {}
+        samples = np.array(self.latencies) * 1000
+        return {
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p99_ms": float(np.percentile(samples, 99)),
+            "samples": len(samples),
+        }
+
+
+class ScoringService:
+    def __init__(self, db):
+        self.db = db
+        self.state = None
+        self.rng = np.random.default_rng()
+        self.reload_lock = threading.Lock()
+        self.load()
+        self.batcher = MicroBatcher(self)
+
+    def load(self):
+        """(Re)carga análisis, último sorteo y pesos, y reemplaza el estado."""
+        with self.reload_lock:
+            start = time.time()
+            bfa.fetch_data(self.db)
+            scorer = se.Scorer(
+                bfa.analysis, bfa.last_draw, bfa.strategy_weights, bfa.rule_windows
+            )
+            self.state = ScoringState(scorer, bfa.last_draw)
+            print(
+                f"✅ Estado de puntuación listo para el sorteo "
+                f"{self.state.sorteo_sugerido_para} ({time.time() - start:.2f}s)."
+            )
+
+    def reweight(self, strategy_weights):
+        """Aplica nuevos pesos sin re-evaluar las reglas."""
+        with self.reload_lock:
+            current = self.state.scorer
+            scorer = current.reweighted(strategy_weights)
+            self.state = ScoringState(scorer, current.last_draw)
+            print("✅ Pesos actualizados en el servicio de puntuación.")
+
+    def watch(self):
+        """Escucha cambios en el análisis y en los pesos para recargar en caliente."""
+        base = f"artifacts/{bfa.APP_ID}/public/data"
+        analysis_ref = self.db.collection(f"{base}/analysis").document("latest")
+        weights_ref = self.db.collection(f"{base}/config").document("strategyWeights")
+        first_event = {"analysis": True, "weights": True}
+
+        def on_analysis(docs, changes, read_time):
+            if first_event.pop("analysis", False):
+                return
+            print("ℹ️  'analysis/latest' cambió. Recargando estado...")
+            threading.Thread(target=self.load, daemon=True).start()
+
+        def on_weights(docs, changes, read_time):
+            if first_event.pop("weights", False):
+                return
+            if docs and docs[0].exists:
+                self.reweight(rule_registry.complete_weights(docs[0].to_dict()))
+
+        self.watches = [
+            analysis_ref.on_snapshot(on_analysis),
+            weights_ref.on_snapshot(on_weights),
+        ]
+
+
+def parse_combinations(body):
+    combos = body.get("combinations")
+    if not isinstance(combos, list) or not combos:
+        raise ValueError("'combinations' debe ser una lista no vacía.")
+    if len(combos) > MAX_COMBINATIONS_PER_REQUEST:
+        raise ValueError(
+            f"Máximo {MAX_COMBINATIONS_PER_REQUEST} combinaciones por petición."
+        )
+    array = np.array(combos, dtype=np.int64)
+    if array.ndim != 2 or array.shape[1] != 6:
+        raise ValueError("Cada combinación debe tener exactamente 6 números.")
+    if array.min() < 1 or array.max() > se.MAX_NUMBER:
+        raise ValueError("Los números deben estar entre 1 y 39.")
+    array = np.sort(array, axis=1)
+    if (np.diff(array, axis=1) == 0).any():
+        raise ValueError("Los números de cada combinación deben ser únicos.")
+    return array
+
+
+def parse_count(body, field, default):
+    """Entero positivo de 'body[field]', limitado a MAX_TOP_K."""
+    value = body.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"'{field}' debe ser un número entero.")
+    if value < 1:
+        raise ValueError(f"'{field}' debe ser mayor que cero.")
+    return min(value, MAX_TOP_K)
+
+
+def parse_confidence(body, field, default):
+    """Confianza mínima de 'body[field]': un número entre 0 y 100."""
+    value = body.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"'{field}' debe ser un número.")
+    if not 0 <= value <= 100:
+        raise ValueError(f"'{field}' debe estar entre 0 y 100.")
+    return float(value)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Respuestas pequeñas: sin Nagle se evita la espera de ~40 ms por ACK.
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self._send(404, {"error": "Ruta no encontrada."})
+                return
+            state = service.state
+            self._send(
+                200,
+                {
+                    "status": "ok",
+                    "sorteo_sugerido_para": state.sorteo_sugerido_para,
+                    "loadedAt": state.loaded_at,
+                    "strategyWeights": state.scorer.strategy_weights,
+                    "latency": service.batcher.latency_percentiles(),
+                },
+            )
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                self._send(200, self._dispatch(body))
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": f"Error interno: {e}"})
+
+        def _dispatch(self, body):
+            if self.path in ("/rate", "/rank"):
+                combos = parse_combinations(body)
+                conf, ranks = service.batcher.submit("rate", combos).result()
+                if self.path == "/rank":
+                    return {"ranks": ranks.tolist()}
+                return {
+                    "results": [
+                        {"combination": c, "confidence": float(v), "rank": int(r)}
+                        for c, v, r in zip(combos.tolist(), conf, ranks)
+                    ]
+                }
+            if self.path == "/top":
+                k = parse_count(body, "k", 30)
+                combos, conf = service.batcher.submit("top", k).result()
+                return _as_results(combos, conf)
+            if self.path == "/complete":
+                fixed = se.fixed_numbers(body.get("fixed"))
+                k = parse_count(body, "k", 10)
+                combos, conf, ranks = service.batcher.submit(
+                    "complete", (fixed, k)
+                ).result()
+                return {
+                    "results": [
+                        {"combination": c, "confidence": float(v), "rank": int(r)}
+                        for c, v, r in zip(combos.tolist(), conf, ranks)
+                    ]
+                }
+            if self.path == "/generate":
+                quantity = parse_count(body, "quantity", 10)
+                min_confidence = parse_confidence(body, "minConfidence", 0)
+                combos, conf = service.batcher.submit(
+                    "generate", (quantity, min_confidence)
+                ).result()
+                if not len(combos):
+                    raise ValueError(
+                        "Ninguna combinación alcanza la confianza pedida "
+                        f"({min_confidence:g}%)."
+                    )
+                return _as_results(combos, conf)
+            raise ValueError(f"Ruta no soportada: {self.path}")
+
+    return Handler
+
+
+def _as_results(combos, conf):
+    return {
+        "results": [
+            {"combination": c, "confidence": float(v)}
+            for c, v in zip(combos.tolist(), conf)
+        ]
+    }
+
+
+class ScoringHTTPServer(ThreadingHTTPServer):
+    # Cola de conexiones amplia para no rechazar ráfagas de clientes concurrentes.
+    request_queue_size = 128
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler espera una tupla (host, puerto).
+        return request, ("unix", 0)
+
+
+def main():
+    db = bfa.get_db_client()
+    try:
+        service = ScoringService(db)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ ERROR: {e}")
+        return
+    service.watch()
+
+    handler = make_handler(service)
+    if SERVICE_SOCKET:
+        if os.path.exists(SERVICE_SOCKET):
+            os.remove(SERVICE_SOCKET)
+        server = ThreadingUnixHTTPServer(SERVICE_SOCKET, handler)
+        print(f"Servicio de puntuación escuchando en unix:{SERVICE_SOCKET}")
+    else:
+        server = ScoringHTTPServer((SERVICE_HOST, SERVICE_PORT), handler)
+        print(
+            f"Servicio de puntuación escuchando en http://{SERVICE_HOST}:{SERVICE_PORT}"
+        )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo el servicio de puntuación...")
+    finally:
+        for watch in getattr(service, "watches", []):
+            watch.unsubscribe()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
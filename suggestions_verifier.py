@@ -0,0 +1,242 @@
+# Verificador Histórico de Sugerencias
+#
+# Descripción:
+# Este script responde a la pregunta "¿qué tan bien le ha ido al Top 30?". Carga
+# TODAS las sugerencias guardadas en 'bruteForceSuggestions' y TODO el historial de
+# resultados, y calcula en una sola pasada vectorizada cuántos números acertó cada
+# sugerencia en el sorteo para el que fue generada (incluyendo el Adicional).
+# Después publica un resumen compacto en 'analysis/suggestionsReview' con la
+# distribución de aciertos por grupo de ranking.
+#
+# Metodología:
+# 1. Lee solo los campos necesarios de sugerencias y resultados (proyección).
+# 2. Convierte todo a arreglos de NumPy: una matriz (sugerencias x 6) y una matriz
+#    one-hot (sorteos x 40) con los números naturales de cada resultado.
+# 3. Los aciertos de todas las sugerencias se obtienen con un solo "gather" sobre la
+#    matriz one-hot; no hay lógica por documento.
+
+import os
+import json
+from math import comb
+
+import numpy as np
+
+# Opcional: el cálculo de aciertos no depende de Firebase, solo la lectura y
+# la publicación del resumen.
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+except ImportError:
+    firebase_admin = None
+
+# --- CONFIGURACIÓN ---
+FIREBASE_DATABASE_URL = os.environ.get(
+    "FIREBASE_DATABASE_URL", "https://analizadormelateretro-default-rtdb.firebaseio.com"
+)
+APP_ID = os.environ.get("APP_ID", "1:852396148354:web:fc430c9d8ffdb19ce1d69b")
+CREDENTIALS_FILE = "analizadormelateretro-firebase-adminsdk-fbsvc-4129f33301.json"
+
+# Grupos de ranking para el resumen: (etiqueta, rank mínimo, rank máximo).
+RANK_BUCKETS = [
+    ("1", 1, 1),
+    ("2-5", 2, 5),
+    ("6-10", 6, 10),
+    ("11-30", 11, 30),
+    ("31+", 31, None),
+]
+
+
+def get_db_client():
+    """Inicializa la app de Firebase y devuelve el cliente de Firestore."""
+    if firebase_admin is None:
+        raise ImportError("firebase_admin no está instalado.")
+    if not firebase_admin._apps:
+        if "FIREBASE_CREDENTIALS" in os.environ:
+            creds_json = json.loads(os.environ["FIREBASE_CREDENTIALS"])
+            cred = credentials.Certificate(creds_json)
+        elif os.path.exists(CREDENTIALS_FILE):
+            cred = credentials.Certificate(CREDENTIALS_FILE)
+        else:
+            raise FileNotFoundError(
+                f"No se encontraron credenciales. Ni el secreto 'FIREBASE_CREDENTIALS' ni el archivo '{CREDENTIALS_FILE}' están disponibles."
+            )
+        firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DATABASE_URL})
+    return firestore.client()
+
+
+def fetch_results(db):
+    """
+    Carga todo el historial como arreglos: números de sorteo ordenados de forma
+    ascendente, matriz (sorteos x 6) de naturales y vector de adicionales (0 si falta).
+    """
+    print("Obteniendo historial completo...")
+    results_ref = db.collection(f"artifacts/{APP_ID}/public/data/results")
+    fields = ["sorteo"] + [f"F{j}" for j in range(1, 8)]
+    rows = [doc.to_dict() for doc in results_ref.select(fields).stream()]
+    rows.sort(key=lambda d: d["sorteo"])
+
+    sorteos = np.array([d["sorteo"] for d in rows], dtype=np.int64)
+    naturals = np.array(
+        [[d.get(f"F{j}", 0) for j in range(1, 7)] for d in rows], dtype=np.int64
+    ).reshape(-1, 6)
+    adicional = np.array([d.get("F7") or 0 for d in rows], dtype=np.int64)
+    print(f"Se cargaron {len(sorteos)} sorteos.")
+    return sorteos, naturals, adicional
+
+
+def fetch_suggestions(db):
+    """
+    Carga todas las sugerencias de fuerza bruta como arreglos: sorteo objetivo,
+    rank y matriz (sugerencias x 6) de combinaciones. Las provisionales (top
+    parcial de una corrida en curso o interrumpida) no cuentan.
+    """
+    print("Obteniendo todas las sugerencias de fuerza bruta...")
+    suggestions_ref = db.collection(
+        f"artifacts/{APP_ID}/public/data/bruteForceSuggestions"
+    )
+    fields = ["sorteo_sugerido_para", "rank", "combination", "provisional"]
+    rows = [doc.to_dict() for doc in suggestions_ref.select(fields).stream()]
+    rows = [d for d in rows if not d.get("provisional", False)]
+
+    targets = np.array([d.get("sorteo_sugerido_para", 0) for d in rows], np.int64)
+    ranks = np.array([d.get("rank", 0) for d in rows], dtype=np.int64)
+    # Las combinaciones se guardan como strings JSON ("[1, 2, ...]"). En lugar de
+    # hacer json.loads por documento, se concatenan y se parsean de una sola vez.
+    raw = ",".join(
+        c if isinstance(c, str) else json.dumps(c)
+        for c in (d.get("combination", "[]") for d in rows)
+    )
+    flat = raw.replace("[", " ").replace("]", " ").replace(",", " ").split()
+    combos = np.array(flat, dtype=np.int64)
+    if combos.size != 6 * len(rows):
+        raise ValueError("Se encontraron sugerencias con un número de elementos != 6.")
+    print(f"Se cargaron {len(rows)} sugerencias.")
+    return targets, ranks, combos.reshape(-1, 6)
+
+
+def compute_hits(targets, combos, sorteos, naturals, adicional):
+    """
+    Calcula, para todas las sugerencias a la vez, los aciertos de naturales y si
+    acertaron el Adicional. Devuelve (evaluable, aciertos, acierto_adicional), donde
+    'evaluable' marca las sugerencias cuyo sorteo objetivo ya tiene resultado.
+    """
+    rows = np.searchsorted(sorteos, targets)
+    rows = np.clip(rows, 0, max(len(sorteos) - 1, 0))
+    evaluable = (len(sorteos) > 0) & (sorteos[rows] == targets)
+
+    one_hot = np.zeros((len(sorteos), 40), dtype=np.bool_)
+    one_hot[np.arange(len(sorteos))[:, None], naturals] = True
+    one_hot[:, 0] = False
+
+    hits = one_hot[rows[:, None], combos].sum(axis=1)
+    adicional_hit = (combos == adicional[rows][:, None]).any(axis=1)
+    adicional_hit &= adicional[rows] > 0
+    return evaluable, hits[evaluable], adicional_hit[evaluable]
+
+
+def random_baseline():
+    """Distribución esperada de aciertos (0-6) de una combinación al azar."""
+    total = comb(39, 6)
+    return [comb(6, k) * comb(33, 6 - k) / total for k in range(7)]
+
+
+def build_summary(targets, ranks, evaluable, hits, adicional_hit):
+    """Arma el documento de resumen con histogramas por grupo de ranking."""
+    ev_targets, ev_ranks = targets[evaluable], ranks[evaluable]
+
+    buckets = []
+    for label, lo, hi in RANK_BUCKETS:
+        mask = ev_ranks >= lo
+        if hi is not None:
+            mask &= ev_ranks <= hi
+        count = int(mask.sum())
+        if count == 0 and hi is None:
+            continue
+        buckets.append(
+            {
+                "bucket": label,
+                "count": count,
+                "hits": np.bincount(hits[mask], minlength=7).tolist(),
+                "hitsWithAdicional": np.bincount(
+                    hits[mask & adicional_hit], minlength=7
+                ).tolist(),
+                "meanHits": float(hits[mask].mean()) if count else 0.0,
+            }
+        )
+
+    # Mejor resultado de cada sorteo evaluado (máximo de aciertos en su Top).
+    draws, draw_idx = np.unique(ev_targets, return_inverse=True)
+    best_per_draw = np.zeros(len(draws), dtype=np.int64)
+    np.maximum.at(best_per_draw, draw_idx, hits)
+
+    summary = {
+        "totalSuggestions": int(len(targets)),
+        "evaluated": int(evaluable.sum()),
+        "pending": int(len(targets) - evaluable.sum()),
+        "drawsEvaluated": int(len(draws)),
+        "firstDraw": int(draws[0]) if len(draws) else None,
+        "lastDraw": int(draws[-1]) if len(draws) else None,
+        "buckets": buckets,
+        "bestHitPerDraw": np.bincount(best_per_draw, minlength=7).tolist(),
+        "randomBaseline": random_baseline(),
+    }
+    if len(hits):
+        best = int(np.argmax(hits))
+        summary["bestHit"] = {
+            "sorteo": int(ev_targets[best]),
+            "rank": int(ev_ranks[best]),
+            "hits": int(hits[best]),
+            "adicional": bool(adicional_hit[best]),
+        }
+    return summary
+
+
+def print_summary(summary):
+    print("\n--- Rendimiento Histórico de las Sugerencias ---")
+    print(
+        f"Sugerencias evaluadas: {summary['evaluated']} de {summary['totalSuggestions']}"
+        f" ({summary['drawsEvaluated']} sorteos, {summary['pending']} pendientes)."
+    )
+    for bucket in summary["buckets"]:
+        dist = " ".join(f"{k}:{c}" for k, c in enumerate(bucket["hits"]))
+        print(
+            f"Rank {bucket['bucket']:>5} | n={bucket['count']:>6} | "
+            f"media={bucket['meanHits']:.3f} | {dist}"
+        )
+    baseline = sum(k * p for k, p in enumerate(summary["randomBaseline"]))
+    print(f"Media esperada al azar: {baseline:.3f} aciertos.")
+
+
+def save_summary(db, summary):
+    summary_ref = db.collection(f"artifacts/{APP_ID}/public/data/analysis").document(
+        "suggestionsReview"
+    )
+    try:
+        summary_ref.set({**summary, "timestamp": firestore.SERVER_TIMESTAMP})
+        print("✅ ¡Éxito! El resumen ha sido guardado en 'analysis/suggestionsReview'.")
+    except Exception as e:
+        print(f"❌ ERROR al guardar el resumen: {e}")
+
+
+def main():
+    try:
+        db = get_db_client()
+    except (FileNotFoundError, ImportError) as e:
+        print(f"❌ ERROR: {e}")
+        return
+    sorteos, naturals, adicional = fetch_results(db)
+    targets, ranks, combos = fetch_suggestions(db)
+    if len(targets) == 0 or len(sorteos) == 0:
+        print("No hay sugerencias o resultados para verificar.")
+        return
+
+    evaluable, hits, adicional_hit = compute_hits(
+        targets, combos, sorteos, naturals, adicional
+    )
+    summary = build_summary(targets, ranks, evaluable, hits, adicional_hit)
+    print_summary(summary)
+    save_summary(db, summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import random
+
+import history_cache
+import ingest_history
+
+
+class FakeDoc:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeCollection:
+    def __init__(self, store):
+        self.store = store
+
+    def document(self, doc_id):
+        return doc_id
+
+    def select(self, fields):
+        return self
+
+    def stream(self):
+        return (FakeDoc(d) for d in list(self.store.values()))
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        if any(data["sorteo"] in self.db.fail_sorteos for _, data in self.writes):
+            raise RuntimeError("lote rechazado")
+        self.db.store.update(self.writes)
+
+
+class FakeDB:
+    def __init__(self):
+        self.store = {}
+        self.fail_sorteos = set()
+
+    def collection(self, path):
+        return FakeCollection(self.store)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def write_csv(path, n):
+    rng = random.Random(7)
+    lines = ["NPRODUCTO,CONCURSO,F1,F2,F3,F4,F5,F6,F7,BOLSA,FECHA"]
+    for sorteo in range(1, n + 1):
+        numbers = rng.sample(range(1, 40), 7)
+        lines.append(f"45,{sorteo},{','.join(map(str, numbers))},1,01/01/2020")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def run_ingest(monkeypatch, db, csv_path):
+    monkeypatch.setattr(ingest_history, "get_db_client", lambda: db)
+    monkeypatch.setattr("sys.argv", ["ingest_history.py", str(csv_path)])
+    ingest_history.main()
+
+
+def test_rerun_completes_failed_chunk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_history, "CHUNK_SIZE", 10)
+    monkeypatch.setattr(ingest_history, "MAX_RETRIES", 1)
+    csv_path = tmp_path / "historial.csv"
+    write_csv(csv_path, 50)
+
+    # Falla el segundo lote (sorteos 11-20); los posteriores sí se guardan.
+    db = FakeDB()
+    db.fail_sorteos = {15}
+    run_ingest(monkeypatch, db, csv_path)
+
+    stored = {d["sorteo"] for d in db.store.values()}
+    assert stored == set(range(1, 51)) - set(range(11, 21))
+    cached = {d["sorteo"] for d in history_cache.load_history()}
+    assert cached == stored
+    assert history_cache.AnalysisState.load().watermark == 10
+
+    # La segunda carga sube el hueco aunque ya existan sorteos posteriores.
+    db.fail_sorteos = set()
+    run_ingest(monkeypatch, db, csv_path)
+
+    assert {d["sorteo"] for d in db.store.values()} == set(range(1, 51))
+    history = history_cache.load_history()
+    assert [d["sorteo"] for d in history] == list(range(50, 0, -1))
+    state = history_cache.AnalysisState.load()
+    assert state.covers(history)
@@ -0,0 +1,123 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+import analysis_codec
+import precompute_analysis
+import rule_registry
+import scoring_backends
+import scoring_engine as se
+
+WEIGHTS = {
+    "suma_rango": 15.3,
+    "dist_par_impar": 11,
+    "mix_frecuencia": 10.7,
+    "mix_atraso": 10,
+    "decenas_distribucion": 10,
+    "pares_frecuentes": 10,
+    "prediccion_markov": 15.1,
+    "consecutivos": 10,
+    "terminaciones": 5,
+}
+RULE_WINDOWS = {
+    "prediccion_markov": "last100",
+    "mix_frecuencia": "decay",
+    "pares_frecuentes": "last500",
+    "suma_rango": "last50",
+    "terminaciones": "last50",
+    "decenas_distribucion": "decay",
+    "dist_par_impar": "last100",
+    "consecutivos": "last50",
+    "mix_atraso": "last50",
+}
+
+
+@pytest.fixture(scope="module")
+def history():
+    rng = random.Random(1)
+    draws = []
+    for sorteo in range(1, 801):
+        numbers = rng.sample(range(1, 40), 7)
+        draw = {"sorteo": sorteo, "FECHA": "01/01/2020", "F7": numbers[6]}
+        draw.update((f"F{j}", n) for j, n in enumerate(sorted(numbers[:6]), start=1))
+        draws.append(draw)
+    return draws[::-1]
+
+
+@pytest.fixture(scope="module")
+def analyses(history):
+    """El mismo análisis como mapas (ida y vuelta por JSON) y empaquetado."""
+    precompute_analysis.full_history = history
+    precompute_analysis.analysis = {}
+    precompute_analysis.perform_full_analysis()
+    sanitized = precompute_analysis.sanitize_for_firestore(precompute_analysis.analysis)
+    packed = analysis_codec.encode_analysis(sanitized)
+    return {
+        "dict": json.loads(json.dumps(sanitized)),
+        "packed": analysis_codec.PackedAnalysis(packed),
+    }
+
+
+@pytest.fixture(scope="module")
+def sample():
+    rng = np.random.default_rng(0)
+    return se.combinations_at(rng.choice(se.TOTAL_COMBINATIONS, 3000, replace=False))
+
+
+@pytest.fixture(scope="module", params=[None, RULE_WINDOWS], ids=["total", "ventanas"])
+def rule_windows(request):
+    return request.param
+
+
+@pytest.fixture(scope="module", params=["dict", "packed"])
+def case(request, analyses, history, rule_windows):
+    analysis = analyses[request.param]
+    scorer = se.Scorer(analysis, history[0], WEIGHTS, rule_windows)
+    tables = rule_registry.prepare_tables(analysis, history[0], rule_windows)
+    return analysis, scorer, tables
+
+
+def scalar_confidence(combos, tables):
+    return np.array(
+        [
+            rule_registry.rate_combination([int(n) for n in c], tables, WEIGHTS)
+            for c in combos
+        ]
+    )
+
+
+def test_rate_matches_scalar(case, sample):
+    _, scorer, tables = case
+    expected = scalar_confidence(sample, tables)
+    conf, ranks = scorer.rate(sample)
+    assert np.array_equal(conf, expected)
+    assert np.array_equal(ranks, scorer.rank_of(expected))
+
+
+def test_top_matches_scalar(case):
+    _, scorer, tables = case
+    combos, conf = scorer.top(50)
+    assert np.array_equal(conf, scalar_confidence(combos, tables))
+    assert np.array_equal(scorer.rank_of(conf[:1]), [1])
+    assert scorer.rank_of(conf[-1]) == 1 + np.count_nonzero(scorer.conf > conf[-1])
+
+
+def test_backends_match_scalar(case, history, rule_windows, sample):
+    analysis, scorer, tables = case
+    available = [scoring_backends.NumpyBackend, scoring_backends.PythonBackend]
+    if scoring_backends.numba is not None:
+        available.append(scoring_backends.NumbaBackend)
+    expected = scalar_confidence(sample, tables)
+    for backend_class in available:
+        backend = backend_class(scorer.tables, tables, WEIGHTS)
+        assert np.array_equal(backend.confidence(sample), expected), backend.name
+
+
+def test_dict_and_packed_agree(analyses, history, rule_windows):
+    tables = [
+        rule_registry.prepare_tables(analysis, history[0], rule_windows)
+        for analysis in analyses.values()
+    ]
+    assert tables[0] == tables[1]
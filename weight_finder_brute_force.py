@@ -8,26 +8,50 @@
 #
 # Metodología:
 # 1. Obtiene el historial completo y separa el último sorteo (el "objetivo").
-# 2. Realiza el análisis estadístico sobre el historial SIN el último sorteo.
+# 2. Realiza el análisis estadístico sobre el historial SIN el último sorteo (el
+#    mismo análisis de 'precompute_analysis.py') y evalúa una sola vez las reglas
+#    del registro ('rule_registry.py') sobre las 3.26M combinaciones con el motor
+#    vectorizado; cada iteración solo re-pondera esos numeradores.
 # 3. Entra en un bucle de iteraciones para probar diferentes pesos:
-#    a. Genera un conjunto de 7 pesos aleatorios que suman 100.
+#    a. Genera un conjunto de pesos aleatorios (uno por regla) que suman 100.
 #    b. Calcula la puntuación de la combinación ganadora real con esos pesos.
-#    c. Genera una muestra grande de combinaciones aleatorias (ej. 100,000).
+#    c. Toma una muestra grande de combinaciones aleatorias (ej. 100,000).
 #    d. Comprueba si la puntuación del ganador es más alta que todas las de la muestra.
 # 4. Si encuentra un conjunto de pesos que cumple la condición, lo declara como
 #    una solución y termina.
 #
+# Modo optimizador (python weight_finder_brute_force.py --optimize):
+# En lugar de buscar al azar, ajusta los pesos con evolución diferencial para
+# maximizar el percentil promedio del ganador real en los últimos sorteos, cada uno
+# calificado con el análisis de los sorteos anteriores (walk-forward). Las filas de
+# numeradores de esos sorteos se calculan una vez (en paralelo) y se comparten con
+# los procesos de trabajo por memoria compartida; cada proceso evalúa candidatos
+# completos. La población se guarda en disco tras cada generación, así que una
+# corrida interrumpida continúa donde se quedó, y con la misma semilla
+# (OPTIMIZER_SEED) el resultado es reproducible.
+#
 # Autor: Gemini (Google AI)
 
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
+import sys
 import json
 import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
 import numpy as np
-import random
-from itertools import combinations
-from collections import Counter
+
+import precompute_analysis
+import rule_registry
+import scoring_engine as se
+
+# Opcional: 'melate.py findweights --offline' usa la caché local del historial.
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+except ImportError:
+    firebase_admin = None
 
 # --- CONFIGURACIÓN ---
 FIREBASE_DATABASE_URL = os.environ.get(
@@ -43,6 +67,25 @@ MAX_ITERATIONS = 50000
 # Un número más alto aumenta la confianza en el resultado, pero ralentiza el proceso.
 COMBINATION_SAMPLE_SIZE = 100000
 
+# --- PARÁMETROS DEL OPTIMIZADOR (modo --optimize) ---
+# Sorteos pasados sobre los que se evalúa cada conjunto de pesos. Cada uno se
+# califica con el análisis de los sorteos anteriores a él (walk-forward).
+OPTIMIZER_DRAWS = 50
+# Evolución diferencial (rand/1/bin) sobre los pesos, uno por regla, en [0, 1].
+OPTIMIZER_POPULATION = 36
+OPTIMIZER_GENERATIONS = 100
+OPTIMIZER_MUTATION = 0.6
+OPTIMIZER_CROSSOVER = 0.9
+OPTIMIZER_SEED = int(os.environ.get("OPTIMIZER_SEED", "20240601"))
+OPTIMIZER_WORKERS = int(os.environ.get("OPTIMIZER_WORKERS", os.cpu_count() or 1))
+# Población y generador aleatorio (para reanudar) y numeradores de cada sorteo.
+OPTIMIZER_STATE_FILE = os.environ.get(
+    "OPTIMIZER_STATE_FILE", "weight_optimizer_state.npz"
+)
+OPTIMIZER_DATA_FILE = os.environ.get("OPTIMIZER_DATA_FILE", "weight_optimizer_data.npz")
+# Combinaciones por bloque al evaluar las reglas de cada sorteo.
+OPTIMIZER_CHUNK_SIZE = 250000
+
 # Globales para almacenar los datos de análisis y pesos
 analysis = {}
 strategy_weights = {}
@@ -51,6 +94,8 @@ training_history = []
 
 def get_db_client():
     """Inicializa la app de Firebase y devuelve el cliente de Firestore."""
+    if firebase_admin is None:
+        raise ImportError("firebase_admin no está instalado; usa el modo --offline.")
     if not firebase_admin._apps:
         try:
             if "FIREBASE_CREDENTIALS" in os.environ:
@@ -76,218 +121,35 @@ def fetch_data(db):
 
 
 def perform_full_analysis(history_for_analysis):
-    """Realiza un análisis estadístico completo sobre el historial proporcionado."""
+    """
+    Realiza sobre el historial proporcionado el mismo análisis estadístico que
+    'precompute_analysis.py' publica para el resto de los scripts.
+    """
     global analysis, training_history
     training_history = history_for_analysis
     print(f"Realizando análisis estadístico sobre {len(training_history)} sorteos...")
-
-    all_numbers = [
-        num
-        for draw in training_history
-        for num in [draw.get(f"F{j}") for j in range(1, 8)]
-        if num is not None
-    ]
-    freq_counts = Counter(all_numbers)
-    analysis["frequencies"] = sorted(
-        [{"number": num, "frequency": freq} for num, freq in freq_counts.items()],
-        key=lambda x: x["frequency"],
-        reverse=True,
-    )
-
-    freq_sorted_numbers = [item["number"] for item in analysis["frequencies"]]
-    third_freq = len(freq_sorted_numbers) // 3
-    analysis["hot_numbers"] = set(
-        freq_sorted_numbers[
-            : third_freq if third_freq > 0 else len(freq_sorted_numbers)
-        ]
-    )
-    analysis["cold_numbers"] = set(
-        freq_sorted_numbers[-third_freq if third_freq > 0 else 0 :]
-    )
-
-    last_draw_num = training_history[0]["sorteo"]
-    lags = {
-        num: last_draw_num
-        - next(
-            (
-                d["sorteo"]
-                for d in training_history
-                if num
-                in [d.get(f"F{j}") for j in range(1, 8) if d.get(f"F{j}") is not None]
-            ),
-            last_draw_num - len(training_history),
-        )
-        for num in range(1, 40)
-    }
-
-    lag_sorted = sorted(lags.items(), key=lambda item: item[1], reverse=True)
-    third_lag = len(lag_sorted) // 3
-    analysis["high_lag"] = set(dict(lag_sorted[:third_lag]).keys())
-    analysis["low_lag"] = set(dict(lag_sorted[-third_lag:]).keys())
-
-    all_pairs = [
-        pair
-        for d in training_history
-        for pair in combinations(
-            sorted([d.get(f"F{j}") for j in range(1, 8) if d.get(f"F{j}") is not None]),
-            2,
-        )
-    ]
-    pair_counts = Counter(all_pairs)
-    analysis["top_pairs_set"] = set(dict(pair_counts.most_common(20)).keys())
-
-    odd_even_counts = Counter(
-        f"{sum(1 for n in [d[f'F{j}'] for j in range(1, 7)] if n % 2 == 0)}P-{sum(1 for n in [d[f'F{j}'] for j in range(1, 7)] if n % 2 != 0)}I"
-        for d in training_history
-    )
-    analysis["top_odd_even"] = [item[0] for item in odd_even_counts.most_common(3)]
-
-    def get_tens_dist_str(combo):
-        tens = [0, 0, 0, 0]
-        for n in combo:
-            if n < 10:
-                tens[0] += 1
-            elif n < 20:
-                tens[1] += 1
-            elif n < 30:
-                tens[2] += 1
-            else:
-                tens[3] += 1
-        return "-".join(map(str, sorted(tens, reverse=True)))
-
-    tens_counts = Counter(
-        get_tens_dist_str([d[f"F{j}"] for j in range(1, 7)]) for d in training_history
-    )
-    analysis["top_tens_distribution"] = [item[0] for item in tens_counts.most_common(3)]
-
-    sums = [sum([d[f"F{j}"] for j in range(1, 7)]) for d in training_history]
-    analysis["sum_analysis"] = {"mean": np.mean(sums), "std": np.std(sums)}
-
-    markov = {}
-    history_reversed = training_history[::-1]
-    for i in range(len(history_reversed) - 1):
-        prev_draw_nums = {
-            history_reversed[i].get(f"F{j}")
-            for j in range(1, 8)
-            if history_reversed[i].get(f"F{j}") is not None
-        }
-        curr_draw_nums = {
-            history_reversed[i + 1].get(f"F{j}")
-            for j in range(1, 8)
-            if history_reversed[i + 1].get(f"F{j}") is not None
-        }
-        for prev_num in prev_draw_nums:
-            markov.setdefault(prev_num, Counter()).update(curr_draw_nums)
-    analysis["markov_transitions"] = markov
-    print("Análisis completado.")
-
-
-def rate_combination(combo):
-    """Califica una combinación basada en la lógica completa y los pesos actuales."""
-    # Esta función es idéntica a la del script mejorado anterior
-    score = 0.0
-    max_score = sum(strategy_weights.values())
-    if max_score == 0:
-        return 0
-    combo = sorted(combo)
-
-    # 1. Suma en Rango
-    mean, std = analysis["sum_analysis"]["mean"], analysis["sum_analysis"]["std"]
-    if abs(sum(combo) - mean) < (0.75 * std):
-        score += strategy_weights.get("suma_rango", 0)
-    elif abs(sum(combo) - mean) < (1.5 * std):
-        score += strategy_weights.get("suma_rango", 0) / 2
-    # ... (el resto de las 7 reglas, portadas 1:1)
-    evens = sum(1 for n in combo if n % 2 == 0)
-    dist_str = f"{evens}P-{6 - evens}I"
-    if dist_str in analysis.get("top_odd_even", []):
-        dist_index = analysis["top_odd_even"].index(dist_str)
-        if dist_index == 0:
-            score += strategy_weights.get("dist_par_impar", 0)
-        else:
-            score += strategy_weights.get("dist_par_impar", 0) * 0.5
-    cold_count = sum(1 for n in combo if n in analysis.get("cold_numbers", set()))
-    hot_count = sum(1 for n in combo if n in analysis.get("hot_numbers", set()))
-    medium_count = 6 - cold_count - hot_count
-    frec_balance_score = (
-        1 - (abs(cold_count - 2) + abs(hot_count - 2) + abs(medium_count - 2)) / 8.0
-    )
-    score += frec_balance_score * strategy_weights.get("mix_frecuencia", 0)
-    if (
-        sum(1 for n in combo if n in analysis.get("high_lag", set())) >= 1
-        and sum(1 for n in combo if n in analysis.get("low_lag", set())) >= 1
-    ):
-        score += strategy_weights.get("mix_atraso", 0)
-
-    def get_tens_dist_str(c):
-        tens = [0, 0, 0, 0]
-        for n in c:
-            if n < 10:
-                tens[0] += 1
-            elif n < 20:
-                tens[1] += 1
-            elif n < 30:
-                tens[2] += 1
-            else:
-                tens[3] += 1
-        return "-".join(map(str, sorted(tens, reverse=True)))
-
-    tens_dist_str = get_tens_dist_str(combo)
-    if tens_dist_str in analysis.get("top_tens_distribution", []):
-        tens_index = analysis["top_tens_distribution"].index(tens_dist_str)
-        if tens_index == 0:
-            score += strategy_weights.get("decenas_distribucion", 0)
-        else:
-            score += strategy_weights.get("decenas_distribucion", 0) * 0.5
-    score += (
-        sum(
-            1
-            for pair in combinations(combo, 2)
-            if pair in analysis.get("top_pairs_set", set())
-        )
-        / 6.0
-    ) * strategy_weights.get("pares_frecuentes", 0)
-    last_draw_nums = {
-        training_history[0].get(f"F{j}")
-        for j in range(1, 8)
-        if training_history[0].get(f"F{j}") is not None
-    }
-    predicted_hits = 0
-    markov_trans = analysis.get("markov_transitions", {})
-    for prev_num in last_draw_nums:
-        if prev_num in markov_trans:
-            top_transitions = {
-                item[0] for item in markov_trans[prev_num].most_common(5)
-            }
-            predicted_hits += sum(1 for n in combo if n in top_transitions)
-    score += (predicted_hits / (6.0 * 5.0)) * strategy_weights.get(
-        "prediccion_markov", 0
-    )
-    return (score / max_score) * 100
+    precompute_analysis.full_history = training_history
+    precompute_analysis.analysis = {}
+    precompute_analysis.perform_full_analysis()
+    analysis = precompute_analysis.analysis
 
 
 def generate_random_weights():
-    """Genera 7 pesos aleatorios que suman 100."""
-    keys = [
-        "suma_rango",
-        "dist_par_impar",
-        "mix_frecuencia",
-        "pares_frecuentes",
-        "mix_atraso",
-        "decenas_distribucion",
-        "prediccion_markov",
-    ]
-    weights = np.random.rand(7)
+    """Genera un peso aleatorio por regla del registro; suman 100."""
+    weights = np.random.rand(len(rule_registry.RULE_KEYS))
     weights_normalized = (weights / np.sum(weights)) * 100
-    return dict(zip(keys, weights_normalized))
+    return dict(zip(rule_registry.RULE_KEYS, weights_normalized))
 
 
-def main_weight_finder():
-    """Función principal para el descubrimiento de pesos."""
+def main_weight_finder(full_history=None):
+    """
+    Función principal para el descubrimiento de pesos. Sin 'full_history' (el
+    más reciente primero) lee el historial desde Firestore.
+    """
     global strategy_weights
 
-    db = get_db_client()
-    full_history = fetch_data(db)
+    if full_history is None:
+        full_history = fetch_data(get_db_client())
 
     if len(full_history) < 2:
         print(
@@ -309,6 +171,15 @@ def main_weight_finder():
 
     perform_full_analysis(history_for_analysis)
 
+    print("Evaluando las reglas sobre todas las combinaciones...")
+    numerators = se.rule_numerators(
+        se.all_combinations(),
+        se.build_tables(analysis, training_history[0]),
+        slice(None),
+    )
+    winner_index = int(se.combination_index(winning_combination)[0])
+    winner_numerators = numerators[winner_index : winner_index + 1]
+
     print(f"\nIniciando búsqueda de pesos... (Máx. {MAX_ITERATIONS} iteraciones)")
     print(
         f"Tamaño de la muestra por iteración: {COMBINATION_SAMPLE_SIZE} combinaciones."
@@ -318,24 +189,16 @@ def main_weight_finder():
     for i in range(MAX_ITERATIONS):
         strategy_weights = generate_random_weights()
 
-        target_score = rate_combination(winning_combination)
+        target_score = se.confidence(winner_numerators, strategy_weights)[0]
 
         # Comprobar si la puntuación del objetivo es la más alta en una muestra
-        is_target_the_best = True
-        # Generar una muestra de combinaciones aleatorias para comparar
-        random_sample = (
-            tuple(sorted(random.sample(range(1, 40), 6)))
-            for _ in range(COMBINATION_SAMPLE_SIZE)
+        # de combinaciones aleatorias (sin contar al propio ganador).
+        random_sample = np.random.randint(
+            0, se.TOTAL_COMBINATIONS, size=COMBINATION_SAMPLE_SIZE
         )
-
-        for sample_combo in random_sample:
-            if sample_combo == winning_combination:
-                continue
-
-            sample_score = rate_combination(sample_combo)
-            if sample_score > target_score:
-                is_target_the_best = False
-                break
+        random_sample = random_sample[random_sample != winner_index]
+        sample_scores = se.confidence(numerators[random_sample], strategy_weights)
+        is_target_the_best = not (sample_scores > target_score).any()
 
         # Reportar progreso
         if (i + 1) % 100 == 0:
@@ -369,5 +232,310 @@ def main_weight_finder():
     print("Prueba a aumentar MAX_ITERATIONS o reducir COMBINATION_SAMPLE_SIZE.")
 
 
+# --- MODO OPTIMIZADOR ---
+# Globales de los procesos de trabajo: historial (para preparar los sorteos) y
+# vistas sobre la memoria compartida (para evaluar pesos).
+_worker_history = []
+_shared = {}
+
+
+def _init_history_worker(history):
+    global _worker_history
+    _worker_history = history
+
+
+def _walk_forward_draw(t):
+    """
+    Numeradores del espacio completo para el sorteo objetivo _worker_history[t],
+    calificado con el análisis de los sorteos anteriores. Como las reglas solo
+    toman unos pocos valores, las 3.26M filas se reducen a las filas distintas
+    con su conteo. Devuelve (filas int8, conteos, fila del ganador).
+    """
+    target, training = _worker_history[t], _worker_history[t + 1 :]
+    # Solo los campos que leen las reglas: sin ventanas ni segundo orden.
+    tables = se.build_tables(precompute_analysis.rule_analysis(training), training[0])
+
+    combos = se.all_combinations()
+    numerators = np.empty((len(combos), len(se.RULE_KEYS)), dtype=np.int8)
+    for start in range(0, len(combos), OPTIMIZER_CHUNK_SIZE):
+        block = slice(start, start + OPTIMIZER_CHUNK_SIZE)
+        numerators[block] = se.rule_numerators(combos[block], tables, block)
+
+    # Cada fila como un entero en base mixta (base = máximo de la columna + 1).
+    radix = numerators.max(axis=0).astype(np.int64) + 1
+    keys = np.zeros(len(numerators), dtype=np.int64)
+    for r in range(len(radix)):
+        keys = keys * radix[r] + numerators[:, r]
+    unique_keys, inverse, counts = np.unique(
+        keys, return_inverse=True, return_counts=True
+    )
+    rows = np.empty((len(unique_keys), len(radix)), dtype=np.int8)
+    rest = unique_keys.copy()
+    for r in reversed(range(len(radix))):
+        rest, rows[:, r] = np.divmod(rest, radix[r])
+
+    winner = sorted(target[f"F{j}"] for j in range(1, 7))
+    winner_row = int(inverse.ravel()[se.combination_index(winner)[0]])
+    return rows, counts.astype(np.int64), winner_row
+
+
+def history_fingerprint(history):
+    payload = json.dumps(
+        [history, OPTIMIZER_DRAWS, se.RULE_KEYS], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_walk_forward_data(history):
+    """
+    Filas distintas de numeradores de los últimos OPTIMIZER_DRAWS sorteos, en
+    paralelo (un sorteo por tarea). Se guardan en OPTIMIZER_DATA_FILE y se
+    reutilizan mientras el historial no cambie.
+    """
+    fingerprint = history_fingerprint(history)
+    if os.path.exists(OPTIMIZER_DATA_FILE):
+        with np.load(OPTIMIZER_DATA_FILE) as data:
+            if str(data["fingerprint"]) == fingerprint:
+                print("ℹ️  Usando los numeradores guardados de los sorteos pasados.")
+                return {name: data[name] for name in data.files}
+
+    draws = min(OPTIMIZER_DRAWS, len(history) - 1)
+    print(f"Calculando los numeradores de {draws} sorteos pasados...")
+    with ProcessPoolExecutor(
+        max_workers=OPTIMIZER_WORKERS,
+        initializer=_init_history_worker,
+        initargs=(history,),
+    ) as executor:
+        results = list(executor.map(_walk_forward_draw, range(draws)))
+
+    sizes = [len(rows) for rows, _, _ in results]
+    data = {
+        "fingerprint": np.array(fingerprint),
+        "sorteos": np.array([history[t]["sorteo"] for t in range(draws)]),
+        "rows": np.concatenate([rows for rows, _, _ in results]),
+        "counts": np.concatenate([counts for _, counts, _ in results]),
+        "offsets": np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+        "winners": np.array([row for _, _, row in results], dtype=np.int64),
+    }
+    np.savez_compressed(OPTIMIZER_DATA_FILE, **data)
+    return data
+
+
+def _init_evaluation_worker(specs, offsets, winners):
+    """Abre la memoria compartida (filas y conteos) en un proceso de trabajo."""
+    global _shared
+    _shared = {"offsets": offsets, "winners": winners, "segments": []}
+    for name, (segment_name, shape, dtype) in specs.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        _shared["segments"].append(segment)
+        _shared[name] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+
+def mean_winner_percentile(vector):
+    """
+    Percentil promedio del ganador en los sorteos pasados con los pesos 'vector'
+    (en el orden de RULE_KEYS): el porcentaje de combinaciones con menor
+    confianza, contando la mitad de los empates.
+    """
+    scale = np.asarray(vector, dtype=np.float64) / se.RULE_DENOMINATORS
+    rows, counts, offsets = _shared["rows"], _shared["counts"], _shared["offsets"]
+    total = 0.0
+    for d, winner in enumerate(_shared["winners"]):
+        block = slice(offsets[d], offsets[d + 1])
+        # Sin normalizar: dividir entre la suma de los pesos no cambia el orden.
+        conf = rows[block] @ scale
+        winner_conf = conf[winner]
+        below = counts[block][conf < winner_conf].sum()
+        ties = counts[block][conf == winner_conf].sum()
+        total += (below + (ties - 1) / 2) / (se.TOTAL_COMBINATIONS - 1)
+    return 100 * total / len(_shared["winners"])
+
+
+def weights_from_vector(vector):
+    """Pesos por regla que suman 100 a partir de un vector de la población."""
+    vector = np.asarray(vector, dtype=np.float64)
+    if vector.sum() == 0:
+        vector = np.ones_like(vector)
+    return dict(zip(se.RULE_KEYS, (vector / vector.sum() * 100).tolist()))
+
+
+class OptimizerState:
+    """
+    Estado de la evolución diferencial: población, aptitud (percentil promedio) y
+    generador aleatorio. Se guarda al terminar cada generación; una corrida con
+    las mismas entradas y semilla continúa donde se quedó y produce exactamente
+    el mismo resultado que una sin interrupciones.
+    """
+
+    def __init__(self, fingerprint, seed):
+        self.fingerprint = fingerprint
+        self.seed = seed
+        self.generation = 0
+        self.rng = np.random.default_rng(seed)
+        self.population = None
+        self.fitness = None
+
+    @classmethod
+    def load(cls, fingerprint, seed, path=OPTIMIZER_STATE_FILE):
+        state = cls(fingerprint, seed)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if (
+                    str(data["fingerprint"]) == fingerprint
+                    and int(data["seed"]) == seed
+                ):
+                    state.generation = int(data["generation"])
+                    state.rng.bit_generator.state = json.loads(str(data["rng"]))
+                    state.population = data["population"]
+                    state.fitness = data["fitness"]
+        return state
+
+    def save(self, path=OPTIMIZER_STATE_FILE):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            fingerprint=self.fingerprint,
+            seed=self.seed,
+            generation=self.generation,
+            rng=json.dumps(self.rng.bit_generator.state),
+            population=self.population,
+            fitness=self.fitness,
+        )
+        os.replace(tmp_path, path)
+
+    def trial_vectors(self):
+        """Un vector de prueba por miembro: mutación rand/1 y cruce binomial."""
+        size, dim = self.population.shape
+        trials = np.empty_like(self.population)
+        for i in range(size):
+            others = [j for j in range(size) if j != i]
+            a, b, c = self.rng.choice(others, 3, replace=False)
+            mutant = self.population[a] + OPTIMIZER_MUTATION * (
+                self.population[b] - self.population[c]
+            )
+            cross = self.rng.random(dim) < OPTIMIZER_CROSSOVER
+            cross[self.rng.integers(dim)] = True
+            trials[i] = np.where(cross, np.clip(mutant, 0, 1), self.population[i])
+        return trials
+
+    def select(self, trials, fitness):
+        """Cada prueba reemplaza a su miembro si es al menos igual de buena."""
+        better = fitness >= self.fitness
+        self.population[better] = trials[better]
+        self.fitness[better] = fitness[better]
+        self.generation += 1
+
+
+def _share(array, specs, segments, name):
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[:] = array
+    specs[name] = (segment.name, array.shape, array.dtype.str)
+    segments.append(segment)
+
+
+def main_optimizer(history=None, current_weights=None):
+    """
+    Ajusta los pesos con evolución diferencial para maximizar el percentil
+    promedio del ganador en los últimos OPTIMIZER_DRAWS sorteos. Sin 'history'
+    lee el historial y los pesos actuales desde Firestore.
+    """
+    print("--- Iniciando Optimizador de Pesos (Evolución Diferencial) ---")
+    if history is None:
+        db = get_db_client()
+        history = fetch_data(db)
+        weights_doc = (
+            db.collection(f"artifacts/{APP_ID}/public/data/config")
+            .document("strategyWeights")
+            .get()
+        )
+        current_weights = weights_doc.to_dict() if weights_doc.exists else None
+    if len(history) < 2:
+        print("❌ Se necesitan al menos 2 sorteos en el historial.")
+        return
+
+    current_weights = rule_registry.complete_weights(
+        current_weights or se.DEFAULT_WEIGHTS
+    )
+
+    start_time = time.time()
+    data = load_walk_forward_data(history)
+    print(
+        f"Sorteos evaluados: {len(data['winners'])} "
+        f"(del {data['sorteos'].min()} al {data['sorteos'].max()}), "
+        f"{len(data['rows'])} filas distintas ({time.time() - start_time:.2f}s)."
+    )
+
+    fingerprint = hashlib.sha256(
+        json.dumps(
+            [
+                str(data["fingerprint"]),
+                current_weights,
+                OPTIMIZER_POPULATION,
+                OPTIMIZER_MUTATION,
+                OPTIMIZER_CROSSOVER,
+            ],
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+    state = OptimizerState.load(fingerprint, OPTIMIZER_SEED)
+
+    specs, segments = {}, []
+    try:
+        _share(data["rows"], specs, segments, "rows")
+        _share(data["counts"], specs, segments, "counts")
+        with ProcessPoolExecutor(
+            max_workers=OPTIMIZER_WORKERS,
+            initializer=_init_evaluation_worker,
+            initargs=(specs, data["offsets"], data["winners"]),
+        ) as executor:
+
+            def evaluate(vectors):
+                return np.array(list(executor.map(mean_winner_percentile, vectors)))
+
+            current_vector = se.weights_vector(current_weights)
+            baseline = evaluate([current_vector])[0]
+            print(f"Percentil promedio con los pesos actuales: {baseline:.4f}")
+
+            if state.population is None:
+                # Población inicial al azar, más los pesos actuales como un miembro.
+                state.population = state.rng.random(
+                    (OPTIMIZER_POPULATION, len(se.RULE_KEYS))
+                )
+                if current_vector.max() > 0:
+                    state.population[0] = current_vector / current_vector.max()
+                state.fitness = evaluate(state.population)
+                state.save()
+            else:
+                print(f"ℹ️  Reanudando desde la generación {state.generation}.")
+
+            while state.generation < OPTIMIZER_GENERATIONS:
+                trials = state.trial_vectors()
+                state.select(trials, evaluate(trials))
+                state.save()
+                print(
+                    f"Generación {state.generation}/{OPTIMIZER_GENERATIONS}: "
+                    f"mejor percentil {state.fitness.max():.4f} "
+                    f"({time.time() - start_time:.2f}s)"
+                )
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    best = int(np.argmax(state.fitness))
+    print("\n" + "=" * 50)
+    print(
+        f"Percentil promedio del ganador: {state.fitness[best]:.4f} "
+        f"(pesos actuales: {baseline:.4f})"
+    )
+    print("Pesos de estrategia encontrados:")
+    for key, value in weights_from_vector(state.population[best]).items():
+        print(f"- {key}: {value:.4f}")
+    print("=" * 50)
+
+
 if __name__ == "__main__":
-    main_weight_finder()
+    if "--optimize" in sys.argv[1:]:
+        main_optimizer()
+    else:
+        main_weight_finder()